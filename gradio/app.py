@@ -1,7 +1,7 @@
 import gradio as gr
 
-from index import get_uploaded_files, delete_files, process_upload
-from query import chat
+from index import FILE_SORTS, delete_files, get_files_page, process_upload
+from query import CHAT_CONCURRENCY, chat, get_scope_choices
 
 ICON_PATH = "assets/favicon.png"
 
@@ -97,9 +97,19 @@ with gr.Blocks(
 
     with gr.Tabs():
         with gr.TabItem("Chat"):
+            scope_files = gr.Dropdown(
+                choices=[],
+                value=[],
+                multiselect=True,
+                label="Search only in these documents (all documents when empty)",
+                render=False,
+            )
             chat_interface = gr.ChatInterface(
                 fn=chat,
                 type="messages",
+                concurrency_limit=CHAT_CONCURRENCY,
+                additional_inputs=[scope_files],
+                additional_inputs_accordion=gr.Accordion("Documents", open=False),
                 save_history=True,
                 fill_height=True,
                 chatbot=gr.Chatbot(
@@ -121,7 +131,7 @@ with gr.Blocks(
                     with gr.Row(scale=1, height=500):
                         file_input = gr.File(
                             file_count="multiple",
-                            file_types=[".csv", ".doc", ".docx", ".html", ".pdf", ".txt", ".xlsx"],
+                            file_types=[".csv", ".doc", ".docx", ".html", ".md", ".pdf", ".txt", ".xlsx"],
                             show_label=False,
                             height=480,
                         )
@@ -131,6 +141,17 @@ with gr.Blocks(
 
                 with gr.Column():
                     gr.Markdown("### Files already indexed")
+                    with gr.Row(scale=0, equal_height=True):
+                        file_sort = gr.Dropdown(
+                            choices=list(FILE_SORTS),
+                            value="Name",
+                            show_label=False,
+                            container=False,
+                        )
+                        prev_btn = gr.Button("Previous", scale=0)
+                        page_label = gr.Markdown("Page 1")
+                        next_btn = gr.Button("Next", scale=0)
+                        file_page = gr.State(1)
                     with gr.Row(scale=1, height=500):
                         file_list = gr.CheckboxGroup(
                             value=[],
@@ -147,9 +168,11 @@ with gr.Blocks(
                 output = gr.Textbox(label="Operation Result", lines=2)
 
             # Initial load of uploaded files
+            file_page_outputs = [file_list, file_page, page_label]
             app.load(
-                fn=lambda: gr.CheckboxGroup(choices=get_uploaded_files()),
-                outputs=file_list,
+                fn=get_files_page,
+                inputs=[file_page, file_sort],
+                outputs=file_page_outputs,
                 queue=False,
             )
 
@@ -157,24 +180,44 @@ with gr.Blocks(
             submit_btn.click(
                 fn=process_upload, inputs=file_input, outputs=[output, file_list]
             ).then(
-                fn=lambda: gr.CheckboxGroup(choices=get_uploaded_files()),
-                outputs=file_list,
+                fn=get_files_page, inputs=[file_page, file_sort], outputs=file_page_outputs
+            ).then(
+                fn=get_scope_choices, outputs=scope_files
             )
 
             refresh_btn.click(
-                fn=lambda: gr.update(choices=get_uploaded_files()), outputs=file_list
+                fn=get_files_page, inputs=[file_page, file_sort], outputs=file_page_outputs
             )
 
             delete_btn.click(
                 fn=delete_files, inputs=file_list, outputs=[output, file_list]
             ).then(
-                fn=lambda: gr.CheckboxGroup(choices=get_uploaded_files()),
-                outputs=file_list,
+                fn=get_files_page, inputs=[file_page, file_sort], outputs=file_page_outputs
+            ).then(
+                fn=get_scope_choices, outputs=scope_files
+            )
+
+            # Pagination and sorting
+            file_sort.change(
+                fn=lambda sort: get_files_page(1, sort), inputs=file_sort, outputs=file_page_outputs
+            )
+            prev_btn.click(
+                fn=lambda page, sort: get_files_page(max(1, page - 1), sort),
+                inputs=[file_page, file_sort],
+                outputs=file_page_outputs,
+            )
+            next_btn.click(
+                fn=lambda page, sort: get_files_page(page + 1, sort),
+                inputs=[file_page, file_sort],
+                outputs=file_page_outputs,
             )
 
         # Update toggle upload tab
         app.load(toggle_upload_tab, None, upload_tab)
 
+        # Documents offered for scoping the chat
+        app.load(get_scope_choices, None, scope_files, queue=False)
+
 if __name__ == "__main__":
     app.launch(
         toggle_upload_tab,
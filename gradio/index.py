@@ -1,97 +1,131 @@
 import os
+import time
+from contextlib import ExitStack
 from pathlib import Path
 from typing import List
 
-import requests
-from qdrant_client import QdrantClient, models
+import gradio as gr
+import httpx
 
 HAYHOOKS_URL = os.getenv("HAYHOOKS_URL", "http://localhost:1416")
-QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 
-INDEX_NAME = "index"
 MODEL_NAME = "query"
 
-qdrant_client = QdrantClient(url=QDRANT_URL)
-
-
-def upload_files(files: List[str]) -> str:
-    """Upload files to Hayhooks server"""
-    file_objs = []  
-    for file_path in files:
-        path = Path(file_path)
-        if not path.exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
-        file_objs.append(("files", (path.name, open(file_path, "rb"))))
-    
-    response = requests.post(
-        f"{HAYHOOKS_URL}/index/run",
-        files=file_objs
-    )
-    
-    for _, (_, file_obj) in file_objs:
-        file_obj.close()
-    
+UPLOAD_TIMEOUT = httpx.Timeout(10, write=None) # large uploads may take a while to send
+POLL_INTERVAL = 1.0
+
+FILES_PAGE_SIZE = 50
+FILE_SORTS = {
+    "Name": ("file_name", "asc"),
+    "Recently indexed": ("indexed_at", "desc"),
+    "Largest": ("size", "desc"),
+    "Most chunks": ("chunk_count", "desc"),
+}
+
+
+def upload_files(files: List[str]) -> dict:
+    """Stream files to Hayhooks and return the queued indexing job"""
+    with ExitStack() as stack:
+        file_objs = []
+        for file_path in files:
+            path = Path(file_path)
+            if not path.exists():
+                raise FileNotFoundError(f"File not found: {file_path}")
+            file_objs.append(("files", (path.name, stack.enter_context(open(file_path, "rb")))))
+
+        # httpx reads the files in chunks while sending the multipart body
+        response = httpx.post(f"{HAYHOOKS_URL}/index/run", files=file_objs, timeout=UPLOAD_TIMEOUT)
+
     if response.status_code != 200:
         raise Exception(f"Request failed with status {response.status_code}: {response.text}")
-    
+
     return response.json()
 
 
-def get_uploaded_files(limit: int = 100) -> List[str]:
-    """Retrieve list of already uploaded files from Qdrant"""
+def get_index_job(job_id: str) -> dict:
+    """Fetch the status and per-file progress of an indexing job"""
+    response = httpx.get(f"{HAYHOOKS_URL}/index/jobs/{job_id}", timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+def format_job_status(job: dict) -> str:
+    lines = [f"Indexing job {job['job_id']}: {job['status']}"]
+    for name, progress in job["files"].items():
+        steps = [step for step in ("converted", "chunked", "embedded", "written") if progress[step]]
+        lines.append(f"- {name}: {progress['status']}" + (f" ({', '.join(steps)})" if steps else ""))
+    if job.get("result"):
+        result = job["result"]
+        lines.append(f"Files: {result['files']}")
+        lines.append(f"Chunks: {result['chunks']}")
+    if job.get("error"):
+        lines.append(f"Error: {job['error']}")
+    return "\n".join(lines)
+
+
+def get_uploaded_files(page: int = 1, sort: str = "Name") -> tuple[List[str], int]:
+    """Retrieve one page of indexed files from the Hayhooks document catalogue"""
+    sort_by, order = FILE_SORTS[sort]
     try:
-        records = qdrant_client.scroll(
-            collection_name=INDEX_NAME,
-            limit=limit,
-            with_payload=True
+        response = httpx.get(
+            f"{HAYHOOKS_URL}/files",
+            params={
+                "offset": (page - 1) * FILES_PAGE_SIZE,
+                "limit": FILES_PAGE_SIZE,
+                "sort_by": sort_by,
+                "order": order,
+            },
+            timeout=10,
         )
-        
-        uploaded_files = set()
-        for record in records[0]:
-            payload = record.payload
-            if payload and 'meta' in payload and 'file_path' in payload['meta']:
-                uploaded_files.add(payload['meta']['file_path'])
-        
-        return sorted(list(uploaded_files))
-        
+        response.raise_for_status()
+        listing = response.json()
+        return [entry["file_name"] for entry in listing["files"]], listing["total"]
+
     except Exception as e:
         print(f"Error fetching uploaded files: {e}")
-        return []
+        return [], 0
+
+
+def get_files_page(page: int, sort: str):
+    """Choices and page label for the indexed files panel, clamping the page number"""
+    file_names, total = get_uploaded_files(page, sort)
+    pages = max(1, -(-total // FILES_PAGE_SIZE))
+    if page > pages:
+        page = pages
+        file_names, total = get_uploaded_files(page, sort)
+    return gr.update(choices=file_names, value=[]), page, f"Page {page} of {pages} ({total} files)"
 
 
 def delete_files(file_names: List[str]) -> tuple[str, list]:
-    """Delete files from Qdrant collection by their names"""
+    """Delete files from the index in one request to Hayhooks"""
     if not file_names:
         return "No files selected for deletion.", []
     try:
-        deleted_count = 0
-        for file_name in file_names:
-            qdrant_client.delete(
-                collection_name=INDEX_NAME,
-                points_selector=models.FilterSelector(
-                    filter=models.Filter(
-                        must=[models.FieldCondition(
-                                key="meta.file_path",
-                                match=models.MatchValue(value=file_name),
-                            ),
-                        ],
-                    )
-                ),
-            )
-            deleted_count += 1
-        return f"Successfully deleted {deleted_count} file(s): {', '.join(file_names)}", []
+        response = httpx.post(f"{HAYHOOKS_URL}/files/delete", json={"file_paths": file_names}, timeout=60)
+        response.raise_for_status()
+        result = response.json()
+        details = ", ".join(f"{name} ({count} chunks)" for name, count in result["deleted"].items())
+        return f"Successfully deleted {len(result['deleted'])} file(s): {details}", []
     except Exception as e:
         return f"Deletion failed: {str(e)}", file_names
 
 
-def process_upload(file_objs) -> tuple[str, list]:
-    """Handle file upload and return results"""
+def process_upload(file_objs):
+    """Upload files, then poll the indexing job and report its progress"""
     if not file_objs:
-        return "No files selected for upload.", []
+        yield "No files selected for upload.", []
+        return
     try:
         file_paths = [file_obj.name for file_obj in file_objs]
-        result = upload_files(file_paths)
-        output_msg = f"Indexing API Response: {result}"
-        return output_msg, []
+        job = upload_files(file_paths)
+        job_id = job["job_id"]
+        yield f"Indexing job {job_id} queued", []
+
+        while True:
+            job = get_index_job(job_id)
+            yield format_job_status(job), []
+            if job["status"] in ("completed", "failed"):
+                return
+            time.sleep(POLL_INTERVAL)
     except Exception as e:
-        return f"Upload failed: {str(e)}", []
+        yield f"Upload failed: {str(e)}", []
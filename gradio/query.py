@@ -1,54 +1,91 @@
 import json
 import os
+import time
 
-import requests
-from qdrant_client import QdrantClient
+import httpx
 
 import gradio as gr
 
 HAYHOOKS_URL = os.getenv("HAYHOOKS_URL", "http://localhost:1416")
-QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 
-INDEX_NAME = "index"
 MODEL_NAME = "query"
 
-qdrant_client = QdrantClient(url=QDRANT_URL)
+CHAT_CONCURRENCY = int(os.getenv("CHAT_CONCURRENCY", "32")) # chats streamed at the same time
+CHAT_TIMEOUT = httpx.Timeout(10, read=120) # the first token may take a while on CPU
+STREAM_INTERVAL = 0.05 # seconds between updates pushed to the browser
+SCOPE_CHOICES_LIMIT = 1000 # indexed files offered in the document picker
 
+# one pooled client for all chats; connections are kept alive and reused between messages
+hayhooks_client = httpx.AsyncClient(
+    base_url=HAYHOOKS_URL,
+    timeout=CHAT_TIMEOUT,
+    limits=httpx.Limits(max_connections=CHAT_CONCURRENCY, max_keepalive_connections=CHAT_CONCURRENCY),
+)
 
-def chat(message, history):
-    """Handle chat messages"""
+
+async def chat(message, history, scope_files, request: gr.Request):
+    """Handle chat messages, searching only the picked documents when there are any"""
     
     if not len(message):
         raise gr.Error("Chat messages cannot be empty")
 
+    # the history and session hash let hayhooks reuse the conversation's retrieved documents
+    messages = [
+        {"role": turn["role"], "content": turn["content"]}
+        for turn in history
+        if isinstance(turn.get("content"), str)
+    ]
     payload = {
         "model": MODEL_NAME,
-        "messages": [{"role": "user", "content": message}],
+        "messages": messages + [{"role": "user", "content": message}],
+        "user": request.session_hash,
         "stream": True,
     }
-    
-    with requests.post(
-        f"{HAYHOOKS_URL}/{MODEL_NAME}/chat",
-        json=payload,
-        stream=True
-    ) as response:
+    if scope_files:
+        # hayhooks turns these into a Qdrant filter, so only the picked documents are searched
+        payload["filters"] = {"file_paths": list(scope_files)}
+
+    # stopping the chat cancels this generator, which closes the stream and so stops the generation upstream
+    async with hayhooks_client.stream("POST", f"/{MODEL_NAME}/chat", json=payload) as response:
         response.raise_for_status()
-        
+
         chunks = []
-        message = ""
-        
-        for line in response.iter_lines():
-            if line:
-                decoded_line = line.decode("utf-8")
-                if decoded_line.startswith("data:"):
-                    chunk = decoded_line[5:].strip()
-                    try:
-                        data = json.loads(chunk)
-                        delta = data["choices"][0]["delta"]
-                        if "content" in delta:
-                            if delta["content"] != "":
-                                chunks.append(delta["content"])
-                                message = "".join(chunks)
-                                yield message
-                    except Exception:
-                        pass
\ No newline at end of file
+        pushed = 0
+        last_push = 0.0
+
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            content = _delta_content(line[5:].strip())
+            if content:
+                chunks.append(content)
+                # the reply is joined only when pushed, at most every STREAM_INTERVAL seconds
+                now = time.monotonic()
+                if now - last_push >= STREAM_INTERVAL:
+                    pushed, last_push = len(chunks), now
+                    yield "".join(chunks)
+
+        if len(chunks) > pushed:
+            yield "".join(chunks)
+
+
+async def get_scope_choices():
+    """Refresh the document picker with the indexed files from the Hayhooks catalogue"""
+    try:
+        response = await hayhooks_client.get(
+            "/files", params={"limit": SCOPE_CHOICES_LIMIT, "sort_by": "file_name"}, timeout=10
+        )
+        response.raise_for_status()
+    except httpx.HTTPError:
+        return gr.update()
+    return gr.update(choices=[entry["file_name"] for entry in response.json()["files"]])
+
+
+def _delta_content(data: str) -> str:
+    """Text of one server-sent chat completion chunk"""
+    if not data.startswith("{"):
+        return ""
+    try:
+        return json.loads(data)["choices"][0]["delta"].get("content") or ""
+    except (ValueError, KeyError, IndexError):
+        return ""
@@ -0,0 +1,114 @@
+from typing import List
+
+import uvicorn
+from components.batching import batching_stats
+from components.catalogue import delete_indexed_files, list_catalogue
+from components.converters import conversion_stats
+from components.jobs import index_jobs
+from components.metrics import metrics_tracer
+from components.models import model_registry
+from components.pipelines import (
+    chunk_embedding_cache,
+    create_document_store,
+    documents_dir,
+    index_files_name,
+    index_state_name,
+    query_embedding_cache,
+    rerank_score_cache,
+)
+from components.reranking import rerank_stats
+from components.scheduling import ollama_scheduler
+from components.store import get_qdrant_client
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+
+from hayhooks import create_app
+from hayhooks.settings import settings
+
+# routes added to the Hayhooks app; the app itself is only created when run as a script, since the
+# forkserver of the conversion workers imports this module too
+router = APIRouter()
+document_store = create_document_store()
+
+
+@router.get("/index/jobs/{job_id}")
+def get_index_job(job_id: str) -> dict:
+    """Status and per-file progress of a background indexing job"""
+    job = index_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Indexing job not found: {job_id}")
+    return job.to_dict()
+
+
+@router.get("/files")
+def list_files(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=1000),
+    sort_by: str = "file_name",
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+) -> dict:
+    """Paginated listing of indexed files from the document catalogue"""
+    try:
+        return list_catalogue(
+            get_qdrant_client(document_store),
+            index_files_name,
+            offset=offset,
+            limit=limit,
+            sort_by=sort_by,
+            descending=order == "desc",
+        )
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+
+class DeleteFilesRequest(BaseModel):
+    file_paths: List[str]
+
+
+@router.post("/files/delete")
+def delete_files(request: DeleteFilesRequest) -> dict:
+    """Delete indexed files with their chunks and stored originals, returning the chunks removed per file"""
+    if not request.file_paths:
+        raise HTTPException(status_code=400, detail="No files provided for deletion")
+    return delete_indexed_files(
+        document_store,
+        request.file_paths,
+        catalogue_name=index_files_name,
+        state_name=index_state_name,
+        documents_dir=documents_dir,
+    )
+
+
+@router.get("/stats")
+def get_stats() -> dict:
+    """Cache and reranking counters of the query and index pipelines"""
+    return {
+        "rerank": rerank_stats.to_dict(),
+        "rerank_score_cache": rerank_score_cache.stats(),
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "chunk_embedding_cache": chunk_embedding_cache.stats(),
+        "conversion": conversion_stats.to_dict(),
+        "ollama": ollama_scheduler.stats(),
+        "micro_batching": batching_stats.to_dict(),
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> PlainTextResponse:
+    """Per-component latency, document, token and error metrics, and Ollama queueing, in the Prometheus text format"""
+    return PlainTextResponse(metrics_tracer.render() + ollama_scheduler.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/ready")
+def get_readiness() -> JSONResponse:
+    """Which models are loaded; responds 503 until all of them are"""
+    status = model_registry.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+if __name__ == "__main__":
+    # Hayhooks app with the pipelines from HAYHOOKS_PIPELINES_DIR plus the routes above
+    hayhooks = create_app()
+    hayhooks.include_router(router)
+    uvicorn.run(hayhooks, host=settings.host, port=settings.port)
@@ -0,0 +1,95 @@
+"""
+Benchmark of the chunkers on the generated corpus: chunks per second, peak memory and chunk sizes.
+
+Needs the NLTK data (for RecursiveDocumentSplitter) and the tiktoken encoding to be cached. Run
+from the hayhooks directory:
+
+    python -m benchmarks.chunking --files 50 --paragraphs 200
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+from haystack import Document
+
+from benchmarks.corpus import generate_corpus
+from components import pipelines
+
+CHUNKERS = ["recursive", "token"]
+
+
+def _create(name: str) -> Any:
+    pipelines.chunker_name = name
+    chunker = pipelines.create_chunker()
+    chunker.warm_up()
+    return chunker
+
+
+def benchmark_chunker(name: str, documents: List[Document], encoder: Any) -> Dict[str, Any]:
+    chunker = _create(name)
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = chunker.run(documents=documents)["documents"]
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tokens = [len(encoder.encode(chunk.content or "", disallowed_special=())) for chunk in chunks]
+    return {
+        "chunks": len(chunks),
+        "seconds": round(seconds, 3),
+        "chunks_per_second": round(len(chunks) / seconds, 1),
+        "documents_per_second": round(len(documents) / seconds, 1),
+        "peak_memory_mb": round(peak / (1024 * 1024), 1),
+        "max_tokens": max(tokens, default=0),
+        "mean_tokens": round(sum(tokens) / len(tokens), 1) if tokens else 0,
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        file_paths = generate_corpus(corpus_dir, args.files, paragraphs=args.paragraphs, seed=args.seed)
+        documents = [
+            Document(content=Path(path).read_text(encoding="utf-8"), meta={"file_path": Path(path).name})
+            for path in file_paths
+        ]
+
+    encoder = _create("token")._encoder
+    results = {name: benchmark_chunker(name, documents, encoder) for name in args.chunkers}
+    return {
+        "config": {
+            "files": args.files,
+            "paragraphs": args.paragraphs,
+            "seed": args.seed,
+            "split_length": pipelines.chunk_split_length,
+            "characters": sum(len(document.content) for document in documents),
+        },
+        "chunkers": results,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50, help="number of generated documents")
+    parser.add_argument("--paragraphs", type=int, default=200, help="paragraphs per generated document")
+    parser.add_argument("--chunkers", nargs="+", choices=CHUNKERS, default=CHUNKERS)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
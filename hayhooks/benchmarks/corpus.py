@@ -0,0 +1,131 @@
+import html
+import os
+import random
+import zipfile
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from openpyxl import Workbook
+
+# topic words keep documents distinguishable for retrieval, filler words pad them to realistic lengths
+_TOPICS = [
+    "solar", "wind", "geothermal", "hydropower", "biomass", "grid", "storage", "tariff", "legislation",
+    "emissions", "climate", "offshore", "transmission", "investment", "subsidy", "efficiency", "battery",
+    "turbine", "drilling", "refinery", "pipeline", "exploration", "reserves", "import", "export",
+]
+_FILLER = [
+    "the", "of", "and", "to", "in", "a", "is", "for", "that", "on", "with", "as", "by", "this", "are",
+    "from", "at", "be", "which", "an", "report", "program", "national", "energy", "policy", "sector",
+    "development", "project", "capacity", "supply", "demand", "market", "government", "regional", "plan",
+]
+
+
+def _sentence(rng: random.Random, topics: List[str]) -> str:
+    words = [rng.choice(topics) if rng.random() < 0.25 else rng.choice(_FILLER) for _ in range(rng.randint(8, 24))]
+    return " ".join(words).capitalize() + "."
+
+
+def _write_txt(path: str, paragraphs: List[str]) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("\n\n".join(paragraphs))
+
+
+def _write_pdf(path: str, paragraphs: List[str]) -> None:
+    """One uncompressed page with a text line per paragraph"""
+    lines = "".join(
+        "({}) Tj T*\n".format(paragraph.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)"))
+        for paragraph in paragraphs
+    )
+    stream = f"BT /F1 10 Tf 12 TL 72 770 Td\n{lines}ET".encode("latin-1")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    data, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as file:
+        file.write(data)
+
+
+def _write_docx(path: str, paragraphs: List[str]) -> None:
+    """The smallest package Word opens: content types, the package relationship and the document"""
+    body = "".join(f"<w:p><w:r><w:t>{html.escape(paragraph)}</w:t></w:r></w:p>" for paragraph in paragraphs)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ))
+        archive.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="word/document.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            '</Relationships>'
+        ))
+        archive.writestr("word/document.xml", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{body}</w:body></w:document>'
+        ))
+
+
+def _write_xlsx(path: str, paragraphs: List[str]) -> None:
+    """A sheet with a row per paragraph"""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["paragraph", "text"])
+    for number, paragraph in enumerate(paragraphs, start=1):
+        sheet.append([number, paragraph])
+    workbook.save(path)
+
+
+# formats the corpus can be written in; txt takes the fast path, xlsx the windowed converter and the rest Tika
+WRITERS: Dict[str, Callable[[str, List[str]], None]] = {
+    "txt": _write_txt,
+    "pdf": _write_pdf,
+    "docx": _write_docx,
+    "xlsx": _write_xlsx,
+}
+
+
+def generate_corpus(
+    directory: str, files: int, paragraphs: int = 20, seed: int = 13, formats: Sequence[str] = ("txt",)
+) -> List[str]:
+    """Write `files` documents to `directory`, cycling through `formats`, and return their paths"""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index in range(files):
+        topics = rng.sample(_TOPICS, 3)
+        texts = [
+            " ".join(_sentence(rng, topics) for _ in range(rng.randint(3, 8)))
+            for _ in range(paragraphs)
+        ]
+        extension = formats[index % len(formats)]
+        path = os.path.join(directory, f"{'-'.join(topics)}-{index:05d}.{extension}")
+        WRITERS[extension](path, texts)
+        paths.append(path)
+    return paths
+
+
+def generate_queries(count: int, seed: int = 13) -> List[Tuple[str, List[str]]]:
+    """Questions about random topic pairs, with the topics they should retrieve"""
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(count):
+        topics = rng.sample(_TOPICS, 2)
+        queries.append((f"What does the report say about {topics[0]} and {topics[1]} policy?", topics))
+    return queries
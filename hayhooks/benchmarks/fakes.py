@@ -0,0 +1,163 @@
+import hashlib
+import html
+import io
+import json
+import math
+import re
+import threading
+import time
+import zipfile
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from haystack.dataclasses import SparseEmbedding
+
+# stand-ins for the Ollama and Tika servers, so the pipelines can be benchmarked without docker-compose
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_PDF_TEXT = re.compile(rb"\(((?:\\.|[^\\)])*)\) Tj")
+_DOCX_PARAGRAPH = re.compile(r"<w:p>(.*?)</w:p>")
+_DOCX_TEXT = re.compile(r"<w:t[^>]*>(.*?)</w:t>")
+
+
+def fake_embedding(text: str, dim: int = 384) -> List[float]:
+    """Deterministic hashed bag-of-words vector, so texts sharing words end up close"""
+    vector = [0.0] * dim
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else vector
+
+
+def fake_sparse_embedding(text: str) -> SparseEmbedding:
+    """Term counts over hashed token ids, standing in for the BM25 model"""
+    counts = Counter(
+        int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+        for token in _TOKEN_PATTERN.findall(text.lower())
+    )
+    indices = sorted(counts)
+    return SparseEmbedding(indices=indices, values=[float(counts[index]) for index in indices])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeOllamaHandler(_Handler):
+    """Answers /api/embed with fake embeddings and /api/chat with a canned reply, streamed as NDJSON"""
+
+    embedding_dim = 384
+    reply = "This is a canned answer from the benchmark stand-in for Ollama, streamed one word at a time."
+    token_delay = 0.0
+
+    def do_POST(self):
+        request = json.loads(self._read_body() or b"{}")
+        if self.path == "/api/embed":
+            inputs = request.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            embeddings = [fake_embedding(text, self.embedding_dim) for text in inputs]
+            body = {"model": request.get("model"), "embeddings": embeddings}
+            self._send(200, json.dumps(body).encode("utf-8"))
+        elif self.path == "/api/chat":
+            self._chat(request)
+        else:
+            self._send(404, b'{"error": "not found"}')
+
+    def _chat(self, request: dict) -> None:
+        model = request.get("model")
+        words = re.findall(r"\S+\s*", self.reply)
+        final = {
+            "model": model,
+            "created_at": "1970-01-01T00:00:00Z",
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": sum(len(message.get("content", "")) // 4 for message in request.get("messages", [])),
+            "eval_count": len(words),
+        }
+        if not request.get("stream", True):
+            time.sleep(self.token_delay * len(words))
+            message = {"role": "assistant", "content": self.reply}
+            self._send(200, json.dumps({**final, "message": message}).encode("utf-8"))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for word in words:
+            time.sleep(self.token_delay)
+            chunk = {
+                "model": model,
+                "created_at": final["created_at"],
+                "message": {"role": "assistant", "content": word},
+                "done": False,
+            }
+            self._write_chunk(json.dumps(chunk).encode("utf-8") + b"\n")
+        self._write_chunk(json.dumps({**final, "message": {"role": "assistant", "content": ""}}).encode("utf-8") + b"\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def extract_text(data: bytes) -> str:
+    """Paragraphs of a pdf or docx written by benchmarks.corpus, or the bytes of any other file as text"""
+    if data.startswith(b"%PDF"):
+        lines = _PDF_TEXT.findall(data)
+        return "\n\n".join(re.sub(rb"\\(.)", rb"\1", line).decode("latin-1") for line in lines)
+    if data.startswith(b"PK"):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            document = archive.read("word/document.xml").decode("utf-8")
+        paragraphs = _DOCX_PARAGRAPH.findall(document)
+        return "\n\n".join(html.unescape("".join(_DOCX_TEXT.findall(paragraph))) for paragraph in paragraphs)
+    return data.decode("utf-8", errors="replace")
+
+
+class StubTikaHandler(_Handler):
+    """Returns the text of the uploaded file as one XHTML page of paragraphs in Tika's /rmeta JSON format"""
+
+    def do_PUT(self):
+        text = extract_text(self._read_body())
+        paragraphs = "".join(f"<p>{html.escape(paragraph)}</p>" for paragraph in text.split("\n\n"))
+        content = f'<html><body><div class="page">{paragraphs}</div></body></html>'
+        body = [{"Content-Type": "text/plain; charset=UTF-8", "X-TIKA:content": content}]
+        self._send(200, json.dumps(body).encode("utf-8"))
+
+
+class FakeServer:
+    """Runs a handler on a free local port in a background thread"""
+
+    def __init__(self, handler: type):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FakeServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
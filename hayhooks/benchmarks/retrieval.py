@@ -0,0 +1,211 @@
+"""
+Evaluation of the retrieval profiles on a labelled query set: recall@k, MRR and search latency.
+
+Every profile gets its own collection, created with the profile's HNSW, quantization and on-disk
+settings, and is searched by the hybrid retriever with the profile's top_k and score threshold.
+Query embeddings are computed once up front, so the latencies only cover the search. Recall and
+MRR are counted per file: a query is answered when a chunk of one of its relevant files comes back.
+
+With --snapshot, the collections are filled from a `tools.snapshot export` of the real index, and
+--queries is a JSONL file of {"query": "...", "relevant_files": ["report.pdf", ...]} lines whose
+file names match meta.file_path. Queries are then embedded with Ollama and the cached BM25 model.
+Without --snapshot, a generated corpus and query set with hashed bag-of-words embeddings is used,
+which needs nothing but this repository.
+
+Qdrant local mode (the default) searches exactly and ignores the HNSW and quantization settings,
+so offline runs only compare top_k and the score threshold. --server evaluates on the Qdrant at
+QDRANT_URL instead, in throwaway `eval-<profile>` collections. Run from the hayhooks directory:
+
+    python -m benchmarks.retrieval --output profiles.json
+    python -m benchmarks.retrieval --snapshot /backups/index --queries labelled.jsonl --server
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from haystack import Document
+from haystack_integrations.components.embedders.fastembed import FastembedSparseTextEmbedder
+from haystack_integrations.components.embedders.ollama import OllamaTextEmbedder
+
+from benchmarks.corpus import generate_corpus, generate_queries
+from benchmarks.fakes import fake_embedding, fake_sparse_embedding
+from benchmarks.run import _percentiles
+from components import pipelines
+from components.profiles import PROFILES, RetrievalProfile
+from components.store import get_qdrant_client
+from tools.snapshot import import_snapshot
+
+K_VALUES = [1, 3, 5, 10]
+
+
+def load_queries(path: str) -> List[Dict[str, Any]]:
+    queries = []
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            query = json.loads(line)
+            if not query.get("query") or not query.get("relevant_files"):
+                raise ValueError(f"{path}:{number}: expected a query and its relevant_files")
+            queries.append(query)
+    return queries
+
+
+def embed_queries(queries: List[Dict[str, Any]]) -> None:
+    """Add the dense and sparse embeddings of every query, with the query pipeline's models"""
+    dense = OllamaTextEmbedder(model=pipelines.dense_embedder_model, url=pipelines.ollama_url)
+    sparse = FastembedSparseTextEmbedder(model=pipelines.sparse_embedder_model, local_files_only=False)
+    sparse.warm_up()
+    for query in queries:
+        query["embedding"] = dense.run(text=query["query"])["embedding"]
+        query["sparse_embedding"] = sparse.run(text=query["query"])["sparse_embedding"]
+
+
+def synthetic_corpus(args: argparse.Namespace) -> Tuple[List[Document], List[Dict[str, Any]]]:
+    """One chunk per paragraph of the generated corpus, and the queries whose two topics a file covers"""
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        file_paths = generate_corpus(corpus_dir, args.files, paragraphs=args.paragraphs, seed=args.seed)
+        documents = []
+        for path in file_paths:
+            for paragraph in Path(path).read_text(encoding="utf-8").split("\n\n"):
+                documents.append(Document(
+                    content=paragraph,
+                    meta={"file_path": Path(path).name},
+                    embedding=fake_embedding(paragraph, pipelines.embedding_dim),
+                    sparse_embedding=fake_sparse_embedding(paragraph),
+                ))
+
+    queries = []
+    for text, topics in generate_queries(args.queries, seed=args.seed):
+        # file names start with the file's three topics
+        relevant = [Path(path).name for path in file_paths if set(topics) <= set(Path(path).name.split("-")[:3])]
+        if relevant:
+            queries.append({
+                "query": text,
+                "relevant_files": relevant,
+                "embedding": fake_embedding(text, pipelines.embedding_dim),
+                "sparse_embedding": fake_sparse_embedding(text),
+            })
+    return documents, queries
+
+
+def evaluate(retriever: Any, queries: List[Dict[str, Any]], k_values: List[int]) -> Dict[str, Any]:
+    # the first search initialises the client and loads the collection
+    retriever.run(query_embedding=queries[0]["embedding"], query_sparse_embedding=queries[0]["sparse_embedding"])
+
+    recall = {k: 0.0 for k in k_values}
+    reciprocal_ranks, latencies, returned = [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        documents = retriever.run(
+            query_embedding=query["embedding"], query_sparse_embedding=query["sparse_embedding"]
+        )["documents"]
+        latencies.append(time.perf_counter() - start)
+        returned.append(len(documents))
+
+        relevant = set(query["relevant_files"])
+        ranked_files = list(dict.fromkeys(document.meta.get("file_path") for document in documents))
+        for k in k_values:
+            recall[k] += len(relevant & set(ranked_files[:k])) / len(relevant)
+        reciprocal_ranks.append(next((1 / rank for rank, file in enumerate(ranked_files, start=1) if file in relevant), 0.0))
+
+    return {
+        **{f"recall@{k}": round(recall[k] / len(queries), 4) for k in k_values},
+        "mrr": round(sum(reciprocal_ranks) / len(queries), 4),
+        "mean_documents": round(sum(returned) / len(queries), 1),
+        **_percentiles(latencies),
+    }
+
+
+def benchmark_profile(
+    profile: RetrievalProfile,
+    queries: List[Dict[str, Any]],
+    args: argparse.Namespace,
+    documents: Optional[List[Document]] = None,
+) -> Dict[str, Any]:
+    index = f"eval-{profile.name}"
+    document_store = pipelines.create_document_store(
+        location=None if args.server else ":memory:", profile=profile, index=index
+    )
+    client = get_qdrant_client(document_store)
+    try:
+        start = time.perf_counter()
+        if args.snapshot:
+            import_snapshot(client, index, args.snapshot)
+        else:
+            document_store.write_documents(documents)
+        load_seconds = time.perf_counter() - start
+        if args.server:
+            # search the finished HNSW graph and quantized vectors, not a collection still being optimised
+            while client.get_collection(index).status != "green":
+                time.sleep(0.5)
+
+        results = evaluate(pipelines.create_retriever(document_store, profile), queries, args.k)
+        results["load_seconds"] = round(load_seconds, 2)
+        return results
+    finally:
+        client.delete_collection(index)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.snapshot:
+        if not args.queries_file:
+            raise SystemExit("--snapshot needs a labelled --queries file")
+        documents, queries = None, load_queries(args.queries_file)
+        embed_queries(queries)
+    else:
+        documents, queries = synthetic_corpus(args)
+    if not queries:
+        raise SystemExit("No labelled queries to evaluate")
+
+    return {
+        "config": {
+            "source": args.snapshot or "generated",
+            "queries": len(queries),
+            "qdrant": pipelines.qdrant_url if args.server else "local (exact search)",
+        },
+        "profiles": {
+            name: {
+                "settings": {
+                    "hnsw": PROFILES[name].hnsw_config(),
+                    "quantization": PROFILES[name].quantization_config(),
+                    "on_disk": PROFILES[name].on_disk,
+                    "top_k": PROFILES[name].top_k,
+                    "score_threshold": PROFILES[name].score_threshold,
+                },
+                **benchmark_profile(PROFILES[name], queries, args, documents),
+            }
+            for name in args.profiles
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument("--snapshot", help="snapshot directory to load instead of the generated corpus")
+    parser.add_argument("--queries", dest="queries_file", help="labelled JSONL query set for --snapshot")
+    parser.add_argument("--server", action="store_true", help="evaluate on the Qdrant server at QDRANT_URL")
+    parser.add_argument("--k", type=int, nargs="+", default=K_VALUES, help="cut-offs to report recall at")
+    parser.add_argument("--files", type=int, default=200, help="number of generated documents")
+    parser.add_argument("--paragraphs", type=int, default=20, help="paragraphs per generated document")
+    parser.add_argument("--generated-queries", dest="queries", type=int, default=100, help="number of generated queries")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
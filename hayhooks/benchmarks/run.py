@@ -0,0 +1,296 @@
+"""
+Offline benchmark of the index and query pipelines.
+
+Ollama and Tika are replaced by local stand-ins and Qdrant runs in local in-memory mode, so only
+the FastEmbed models and NLTK data need to be cached. The generated corpus mixes txt, pdf, docx
+and xlsx files, so every converter is timed, and queries go through the async retrieval and
+generation pipelines the query wrapper serves. Run from the hayhooks directory:
+
+    python -m benchmarks.run --files 200 --queries 100 --output results.json
+    python -m benchmarks.run --files 200 --queries 100 --compare results.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from hayhooks import async_streaming_generator
+from haystack import tracing
+from haystack.dataclasses import StreamingChunk
+from haystack.tracing import Span, Tracer
+
+from benchmarks.corpus import WRITERS, generate_corpus, generate_queries
+from benchmarks.fakes import FakeOllamaHandler, FakeServer, StubTikaHandler
+from components.incremental import hash_file
+from components.staged import make_batches
+
+# metric -> whether higher values are better, used when comparing two result files
+COMPARED_METRICS = {
+    "index.files_per_second": True,
+    "index.chunks_per_second": True,
+    "index.peak_rss_mb": False,
+    "query.p50_ms": False,
+    "query.p95_ms": False,
+    "query.p99_ms": False,
+    "query.retrieval_p50_ms": False,
+    "query.first_token_p50_ms": False,
+    "query.peak_rss_mb": False,
+}
+
+
+class _TimingSpan(Span):
+    def __init__(self, tags: Optional[Dict[str, Any]]):
+        self.tags = dict(tags or {})
+
+    def set_tag(self, key: str, value: Any) -> None:
+        self.tags[key] = value
+
+
+class ComponentTimer(Tracer):
+    """Haystack tracer that only records how long every component run took"""
+
+    def __init__(self):
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self._current: contextvars.ContextVar = contextvars.ContextVar("benchmark_span", default=None)
+
+    @contextlib.contextmanager
+    def trace(
+        self, operation_name: str, tags: Optional[Dict[str, Any]] = None, parent_span: Optional[Span] = None
+    ) -> Iterator[Span]:
+        span = _TimingSpan(tags)
+        token = self._current.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            self._current.reset(token)
+            if operation_name == "haystack.component.run":
+                self.timings[span.tags.get("haystack.component.name", "unknown")].append(time.perf_counter() - start)
+
+    def current_span(self) -> Optional[Span]:
+        return self._current.get()
+
+    def collect(self) -> Dict[str, Dict[str, float]]:
+        """Summarise and reset the recorded timings"""
+        summary = {
+            name: {
+                "calls": len(seconds),
+                "total_ms": round(sum(seconds) * 1000, 2),
+                "mean_ms": round(sum(seconds) / len(seconds) * 1000, 2),
+            }
+            for name, seconds in sorted(self.timings.items())
+        }
+        self.timings.clear()
+        return summary
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _percentiles(samples: List[float], prefix: str = "") -> Dict[str, float]:
+    if not samples:
+        return {}
+    milliseconds = np.asarray(samples) * 1000
+    return {
+        f"{prefix}p50_ms": round(float(np.percentile(milliseconds, 50)), 2),
+        f"{prefix}p95_ms": round(float(np.percentile(milliseconds, 95)), 2),
+        f"{prefix}p99_ms": round(float(np.percentile(milliseconds, 99)), 2),
+        f"{prefix}mean_ms": round(float(milliseconds.mean()), 2),
+    }
+
+
+def benchmark_indexing(
+    pipelines: Any, document_store: Any, file_paths: List[str], indexer: str, timer: ComponentTimer
+) -> Dict[str, Any]:
+    file_hashes = {os.path.basename(path): hash_file(path) for path in file_paths}
+    start = time.perf_counter()
+    if indexer == "staged":
+        staged = pipelines.create_staged_indexer(document_store)
+        setup_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        result = staged.run(make_batches(file_paths, file_hashes, pipelines.index_batch_size))
+        failed = sum(len(failure["files"]) for failure in result["failed"])
+    else:
+        pipeline = pipelines.create_index_pipeline(document_store)
+        setup_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        pipeline.run({"router": {"sources": file_paths}, "incremental_filter": {"file_hashes": file_hashes}})
+        failed = 0
+    seconds = time.perf_counter() - start
+
+    chunks = document_store.count_documents()
+    return {
+        "files": len(file_paths),
+        "failed_files": failed,
+        "chunks": chunks,
+        "setup_seconds": round(setup_seconds, 2),
+        "seconds": round(seconds, 2),
+        "files_per_second": round(len(file_paths) / seconds, 2),
+        "chunks_per_second": round(chunks / seconds, 2),
+        "peak_rss_mb": _peak_rss_mb(),
+        "components": timer.collect(),
+    }
+
+
+async def _time_queries(
+    pipelines: Any, retrieval: Any, generation: Any, queries: List[str]
+) -> Tuple[List[float], List[float], List[float]]:
+    """Answer the queries one after another the way the query wrapper does, timing each phase"""
+    latencies, retrievals, first_tokens = [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = await retrieval.run_async(pipelines.retrieval_pipeline_inputs(query))
+        retrievals.append(time.perf_counter() - start)
+
+        first_token = None
+        chunks = async_streaming_generator(
+            pipeline=generation,
+            pipeline_run_args=pipelines.generation_pipeline_inputs(query, result["meta_ranker"]["documents"]),
+        )
+        async for chunk in chunks:
+            if first_token is None and isinstance(chunk, StreamingChunk):
+                first_token = time.perf_counter()
+        latencies.append(time.perf_counter() - start)
+        if first_token is not None:
+            first_tokens.append(first_token - start)
+    return latencies, retrievals, first_tokens
+
+
+def benchmark_queries(pipelines: Any, document_store: Any, queries: List[str], timer: ComponentTimer) -> Dict[str, Any]:
+    start = time.perf_counter()
+    retrieval = pipelines.create_async_retrieval_pipeline(document_store)
+    generation = pipelines.create_async_generation_pipeline()
+    setup_seconds = time.perf_counter() - start
+
+    latencies, retrievals, first_tokens = asyncio.run(_time_queries(pipelines, retrieval, generation, queries))
+
+    return {
+        "count": len(queries),
+        "setup_seconds": round(setup_seconds, 2),
+        **_percentiles(latencies),
+        **_percentiles(retrievals, prefix="retrieval_"),
+        **_percentiles(first_tokens, prefix="first_token_"),
+        "peak_rss_mb": _peak_rss_mb(),
+        "query_embedding_cache": pipelines.query_embedding_cache.stats(),
+        "components": timer.collect(),
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    FakeOllamaHandler.token_delay = args.token_delay_ms / 1000
+    with (
+        FakeServer(FakeOllamaHandler) as ollama,
+        FakeServer(StubTikaHandler) as tika,
+        tempfile.TemporaryDirectory() as corpus_dir,
+    ):
+        # the pipelines and tika read their endpoints from the environment when imported
+        os.environ["OLLAMA_URL"] = ollama.url
+        os.environ["TIKA_URL"] = f"{tika.url}/tika"
+        os.environ["TIKA_CLIENT_ONLY"] = "true"
+        from components import pipelines
+
+        timer = ComponentTimer()
+        tracing.enable_tracing(timer)
+
+        file_paths = generate_corpus(
+            corpus_dir, args.files, paragraphs=args.paragraphs, seed=args.seed, formats=args.formats
+        )
+        document_store = pipelines.create_document_store(location=":memory:")
+        index = benchmark_indexing(pipelines, document_store, file_paths, args.indexer, timer)
+        queries = [question for question, _ in generate_queries(args.queries, seed=args.seed)]
+        query = benchmark_queries(pipelines, document_store, queries, timer)
+
+    return {
+        "config": {
+            "files": args.files,
+            "paragraphs": args.paragraphs,
+            "formats": args.formats,
+            "queries": args.queries,
+            "indexer": args.indexer,
+            "seed": args.seed,
+            "token_delay_ms": args.token_delay_ms,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "index": index,
+        "query": query,
+    }
+
+
+def _metric(results: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = results
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(baseline: Dict[str, Any], results: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print the change of every compared metric and return the ones that regressed beyond `tolerance`"""
+    regressions = []
+    print(f"{'metric':32} {'baseline':>12} {'current':>12} {'change':>9}")
+    for path, higher_is_better in COMPARED_METRICS.items():
+        before, after = _metric(baseline, path), _metric(results, path)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        regressed = -change > tolerance if higher_is_better else change > tolerance
+        print(f"{path:32} {before:12.2f} {after:12.2f} {change:+8.1%}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(path)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100, help="number of generated documents")
+    parser.add_argument("--paragraphs", type=int, default=20, help="paragraphs per generated document")
+    parser.add_argument(
+        "--formats", nargs="+", choices=list(WRITERS), default=list(WRITERS),
+        help="file formats the generated documents cycle through",
+    )
+    parser.add_argument("--queries", type=int, default=50, help="number of queries to time")
+    parser.add_argument(
+        "--indexer", choices=["pipeline", "staged"], default="pipeline",
+        help="index with create_index_pipeline or create_staged_indexer",
+    )
+    parser.add_argument(
+        "--token-delay-ms", type=float, default=0.0, help="delay between streamed tokens of the fake generator"
+    )
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if compare(baseline, results, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from haystack import Document
+
+from components.models import SharedComponent
+
+
+class BatchingStats:
+    """Batches run and their sizes per micro-batcher name, shared by every MicroBatcher of the process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"batches": 0, "items": 0, "max_batch_size": 0, "wait_seconds": 0.0, "run_seconds": 0.0}
+        )
+
+    def record(self, name: str, size: int, wait_seconds: float, run_seconds: float) -> None:
+        with self._lock:
+            counters = self._counters[name]
+            counters["batches"] += 1
+            counters["items"] += size
+            counters["max_batch_size"] = max(counters["max_batch_size"], size)
+            counters["wait_seconds"] += wait_seconds
+            counters["run_seconds"] += run_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {
+                    "batches": counters["batches"],
+                    "items": counters["items"],
+                    "mean_batch_size": round(counters["items"] / counters["batches"], 2),
+                    "max_batch_size": counters["max_batch_size"],
+                    "mean_wait_ms": round(counters["wait_seconds"] / counters["items"] * 1000, 2),
+                    "mean_run_ms": round(counters["run_seconds"] / counters["batches"] * 1000, 2),
+                }
+                for name, counters in sorted(self._counters.items())
+            }
+
+
+batching_stats = BatchingStats()
+
+
+class MicroBatcher:
+    """
+    Runs concurrent calls with one item each as a single call of `function` on a list of items.
+
+    The first item of a batch waits at most `window` seconds for others to join, and a batch
+    closes early at `max_batch_size` items. At most `concurrency` batches run at once; items
+    arriving while they all run queue up and go out together as the next batch, so batches grow
+    with the load while a lone call only pays the window. `function` returns one result per item,
+    in order. Sync callers block on __call__, async ones await run_async without blocking the loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        function: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 16,
+        window: float = 0.005,
+        concurrency: int = 1,
+        stats: Optional[BatchingStats] = None,
+    ):
+        self.name = name
+        self.function = function
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self.concurrency = concurrency
+        self.stats = stats or batching_stats
+        self._condition = threading.Condition()
+        self._pending: List[Tuple[Any, Future, float]] = []
+        self._slots = threading.Semaphore(concurrency)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, item: Any) -> Future:
+        future = Future()
+        with self._condition:
+            if self._executor is None:
+                # started on first use, so building a pipeline does not start threads
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"batch-{self.name}")
+                threading.Thread(target=self._collect, name=f"batch-{self.name}-collector", daemon=True).start()
+            self._pending.append((item, future, time.perf_counter()))
+            self._condition.notify()
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        return self.submit(item).result()
+
+    async def run_async(self, item: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(item))
+
+    def _collect(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+            # while every slot is busy, later items keep joining the next batch
+            self._slots.acquire()
+            with self._condition:
+                deadline = self._pending[0][2] + self.window
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+            self._executor.submit(self._run, batch)
+
+    def _run(self, batch: List[Tuple[Any, Future, float]]) -> None:
+        start = time.perf_counter()
+        try:
+            results = self.function([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name} returned {len(results)} results for a batch of {len(batch)}")
+        except BaseException as error:
+            for _, future, _ in batch:
+                future.set_exception(error)
+        else:
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+        finally:
+            self._slots.release()
+            self.stats.record(
+                self.name,
+                len(batch),
+                sum(start - enqueued for _, _, enqueued in batch),
+                time.perf_counter() - start,
+            )
+
+
+# neither integration can run a batch of queries through its public run(); the functions below use
+# their private members, which tests/test_batching.py checks against the versions in requirements.txt
+
+
+def ollama_embed_batch(embedder: Any) -> Callable[[List[str]], List[Dict[str, Any]]]:
+    """Embed many texts in one Ollama request, with the outputs of OllamaTextEmbedder.run"""
+
+    def embed(texts: List[str]) -> List[Dict[str, Any]]:
+        result = embedder._client.embed(
+            model=embedder.model,
+            input=texts,
+            options=embedder.generation_kwargs,
+            keep_alive=embedder.keep_alive,
+            dimensions=embedder.dimensions,
+        )
+        return [{"embedding": embedding, "meta": {"model": embedder.model}} for embedding in result["embeddings"]]
+
+    return embed
+
+
+def fastembed_sparse_embed_batch(shared: SharedComponent) -> Callable[[List[str]], List[Dict[str, Any]]]:
+    """Embed many texts in one ONNX pass, with the outputs of FastembedSparseTextEmbedder.run"""
+    embedder = shared.component
+
+    def embed(texts: List[str]) -> List[Dict[str, Any]]:
+        # waits for the registry's warm-up rather than loading the model a second time
+        shared.warm_up()
+        embeddings = embedder.embedding_backend.embed(texts, progress_bar=False, parallel=embedder.parallel)
+        return [{"sparse_embedding": embedding} for embedding in embeddings]
+
+    return embed
+
+
+def fastembed_rank_batch(shared: SharedComponent) -> Callable[[List[Tuple[str, List[Document]]]], List[List[float]]]:
+    """Score the (query, documents) of many requests in one cross-encoder pass, one score list per request"""
+    ranker = shared.component
+
+    def score(requests: List[Tuple[str, List[Document]]]) -> List[List[float]]:
+        shared.warm_up()
+        pairs = [
+            (query, text) for query, documents in requests for text in ranker._prepare_fastembed_input_docs(documents)
+        ]
+        scores = list(ranker._model.rerank_pairs(pairs, batch_size=ranker.batch_size, parallel=ranker.parallel))
+        if ranker.score_threshold is not None:
+            # the ranker drops documents under its threshold; a -inf score ranks them last instead
+            scores = [value if value >= ranker.score_threshold else float("-inf") for value in scores]
+
+        results, first = [], 0
+        for _, documents in requests:
+            results.append(scores[first:first + len(documents)])
+            first += len(documents)
+        return results
+
+    return score
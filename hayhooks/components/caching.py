@@ -0,0 +1,336 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from haystack import Document, component
+from haystack.dataclasses import SparseEmbedding
+
+from components.batching import MicroBatcher
+from components.incremental import hash_content
+
+
+def normalize_text(text: str) -> str:
+    """Fold case, unicode forms and whitespace so trivially different queries share an entry"""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, SparseEmbedding):
+        return {"__sparse_embedding__": value.to_dict()}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "__sparse_embedding__" in value:
+            return SparseEmbedding.from_dict(value["__sparse_embedding__"])
+        return {key: _decode(item) for key, item in value.items()}
+    return value
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache with a time-to-live and an optional SQLite backing store.
+
+    Entries live in memory up to `max_size`; with a `path` every entry is also written to disk, so
+    a restarted container starts warm. The disk keeps the `max_size` most recently written entries
+    within the ttl. Values must be JSON-serialisable apart from SparseEmbedding.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+        self._db = None
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+            self._prune_db()
+            self._db.commit()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = (_decode(json.loads(row[0])), row[1])
+                    self._store(key, entry)
+
+            if entry is None or now - entry[1] > self.ttl:
+                self._entries.pop(key, None)
+                self._counters["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def put(self, key: str, value: Any) -> None:
+        self.put_many([(key, value)])
+
+    def put_many(self, items: List[Tuple[str, Any]]) -> None:
+        """Store several entries, written to disk in a single transaction"""
+        created = time.time()
+        with self._lock:
+            for key, value in items:
+                self._store(key, (value, created))
+            if self._db is not None and items:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO entries (key, value, created) VALUES (?, ?, ?)",
+                    [(key, json.dumps(_encode(value)), created) for key, value in items],
+                )
+                self._prune_db()
+                self._db.commit()
+
+    def _prune_db(self) -> None:
+        """Drop expired rows and the oldest rows beyond max_size, in the caller's transaction"""
+        self._db.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl,))
+        self._db.execute(
+            "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_size,),
+        )
+
+    def _store(self, key: str, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "size": len(self._entries)}
+
+
+@component
+class CachedTextEmbedder:
+    """
+    Wraps a text embedder and returns its cached output for queries it has already embedded.
+
+    The cache key is the normalised query text plus the model name, so one cache can sit in front
+    of several embedders. Outputs mirror the wrapped embedder. With a `batcher`, misses of
+    concurrent queries are embedded together in one call.
+    """
+
+    def __init__(self, embedder: Any, model: str, cache: EmbeddingCache, batcher: Optional[MicroBatcher] = None):
+        self.embedder = embedder
+        self.model = model
+        self.cache = cache
+        self.batcher = batcher
+        component.set_output_types(
+            self, **{name: socket.type for name, socket in embedder.__haystack_output__._sockets_dict.items()}
+        )
+
+    def warm_up(self) -> None:
+        if hasattr(self.embedder, "warm_up"):
+            self.embedder.warm_up()
+
+    def run(self, text: str) -> Dict[str, Any]:
+        key = self.cache.make_key(self.model, normalize_text(text))
+        result = self.cache.get(key)
+        if result is None:
+            result = self.batcher(text) if self.batcher else self.embedder.run(text=text)
+            self.cache.put(key, result)
+        return result
+
+    async def run_async(self, text: str) -> Dict[str, Any]:
+        key = self.cache.make_key(self.model, normalize_text(text))
+        result = self.cache.get(key)
+        if result is None:
+            if self.batcher:
+                result = await self.batcher.run_async(text)
+            elif hasattr(self.embedder, "run_async"):
+                result = await self.embedder.run_async(text=text)
+            else:
+                result = await asyncio.to_thread(self.embedder.run, text=text)
+            self.cache.put(key, result)
+        return result
+
+
+@component
+class CachedDocumentEmbedder:
+    """
+    Wraps a document embedder and only embeds chunks whose content it has not embedded before.
+
+    Embeddings are cached per model and content hash, so repeated boilerplate and the unchanged
+    chunks of a revised file are looked up instead of computed. The rest is sent to the wrapped
+    embedder in batches of `batch_size`, up to `concurrency` batches at a time.
+    """
+
+    def __init__(
+        self,
+        embedder: Any,
+        model: str,
+        cache: EmbeddingCache,
+        field: str = "embedding",
+        batch_size: int = 32,
+        concurrency: int = 1,
+    ):
+        self.embedder = embedder
+        self.model = model
+        self.cache = cache
+        self.field = field # the Document attribute the embedder fills
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed") if concurrency > 1 else None
+        component.set_output_types(
+            self, **{name: socket.type for name, socket in embedder.__haystack_output__._sockets_dict.items()}
+        )
+
+    def warm_up(self) -> None:
+        if hasattr(self.embedder, "warm_up"):
+            self.embedder.warm_up()
+
+    def run(self, documents: List[Document]) -> Dict[str, Any]:
+        embedded: List[Optional[Document]] = [None] * len(documents)
+        missing = []
+        for index, document in enumerate(documents):
+            content_hash = document.meta.get("content_hash") or hash_content(document.content or "")
+            key = self.cache.make_key(self.model, content_hash)
+            value = self.cache.get(key)
+            if value is None:
+                missing.append((index, key))
+            else:
+                embedded[index] = replace(document, **{self.field: value})
+
+        batches = [missing[start:start + self.batch_size] for start in range(0, len(missing), self.batch_size)]
+
+        def embed(batch: List[Tuple[int, str]]) -> List[Document]:
+            return self.embedder.run(documents=[documents[index] for index, _ in batch])["documents"]
+
+        results = self._executor.map(embed, batches) if self._executor is not None else map(embed, batches)
+        for batch, batch_documents in zip(batches, results):
+            for (index, _), document in zip(batch, batch_documents):
+                embedded[index] = document
+            self.cache.put_many([(key, getattr(document, self.field)) for (_, key), document in zip(batch, batch_documents)])
+
+        return {"documents": embedded}
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers.
+
+    A stored answer is returned when a new query embedding lies within `max_distance` cosine
+    distance of a cached one. Each answer is tagged with the index version it was generated
+    against and is never served once the version has changed, nor for a query with another
+    retrieval `scope`.
+    """
+
+    def __init__(self, max_distance: float = 0.05, max_size: int = 512, ttl: float = 86400.0):
+        self.max_distance = max_distance
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def lookup(self, embedding: List[float], version: int, scope: str = "") -> Optional[str]:
+        query = _unit(embedding)
+        now = time.time()
+        with self._lock:
+            best_id, best_similarity = None, 1.0 - self.max_distance
+            for entry_id, (vector, answer, entry_version, created, entry_scope) in list(self._entries.items()):
+                if entry_version != version or now - created > self.ttl:
+                    del self._entries[entry_id]
+                    continue
+                if entry_scope != scope:
+                    continue
+                similarity = float(np.dot(query, vector))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self._counters["hits"] += 1
+            return self._entries[best_id][1]
+
+    def put(self, embedding: List[float], answer: str, version: int, scope: str = "") -> None:
+        if not answer:
+            return
+        with self._lock:
+            self._entries[self._next_id] = (_unit(embedding), answer, version, time.time(), scope)
+            self._next_id += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "size": len(self._entries)}
+
+
+class SessionContextCache:
+    """
+    Retrieved documents of each conversation, reused while follow-up questions stay on topic.
+
+    A follow-up reuses the session's documents when its query embedding has at least
+    `min_similarity` cosine similarity to the previous turn's query, and the index version has
+    not changed since they were retrieved.
+    """
+
+    def __init__(self, min_similarity: float = 0.75, max_sessions: int = 1000, ttl: float = 1800.0):
+        self.min_similarity = min_similarity
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"reused": 0, "retrieved": 0, "evictions": 0}
+
+    def lookup(self, session: str, embedding: List[float], version: int) -> Optional[List[Any]]:
+        with self._lock:
+            entry = self._entries.get(session)
+            if entry is None or entry[2] != version or time.time() - entry[3] > self.ttl:
+                self._entries.pop(session, None)
+                self._counters["retrieved"] += 1
+                return None
+            if float(np.dot(_unit(embedding), entry[0])) < self.min_similarity:
+                self._counters["retrieved"] += 1
+                return None
+            self._entries.move_to_end(session)
+            self._counters["reused"] += 1
+            return entry[1]
+
+    def put(self, session: str, embedding: List[float], documents: List[Any], version: int) -> None:
+        """Remember the documents used for this turn, compared against the next turn's query"""
+        with self._lock:
+            self._entries[session] = (_unit(embedding), documents, version, time.time())
+            self._entries.move_to_end(session)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "size": len(self._entries)}
+
+
+def _unit(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
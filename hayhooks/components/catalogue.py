@@ -0,0 +1,256 @@
+import os
+import time
+import uuid
+from typing import Any, Dict, Iterable, List
+
+from haystack_integrations.document_stores.qdrant import QdrantDocumentStore
+from qdrant_client import QdrantClient, models
+
+from components.store import bump_index_version, count_points_per_file, file_path_filter, file_type, get_qdrant_client
+
+# one payload-only point per indexed file, so listing files never touches chunk points
+SORT_FIELDS = ("file_name", "chunk_count", "size", "indexed_at")
+# Qdrant orders pages by these through their range indexes; it cannot order by keywords like file_name
+ORDERED_FIELDS = {
+    "chunk_count": models.PayloadSchemaType.INTEGER,
+    "size": models.PayloadSchemaType.INTEGER,
+    "indexed_at": models.PayloadSchemaType.FLOAT,
+}
+_SCROLL_PAGE_SIZE = 1000
+
+
+def catalogue_point_id(file_name: str) -> str:
+    """Stable point id for a file, also derived by Gradio when deleting files"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, file_name))
+
+
+def _ensure_catalogue_collection(client: QdrantClient, collection_name: str) -> None:
+    if not client.collection_exists(collection_name):
+        client.create_collection(collection_name, vectors_config={})
+        ensure_catalogue_indexes(client, collection_name)
+
+
+def ensure_catalogue_indexes(client: QdrantClient, collection_name: str) -> None:
+    """Create the payload indexes the catalogue is sorted by, also on a catalogue that predates them"""
+    if not client.collection_exists(collection_name):
+        return
+    indexed = client.get_collection(collection_name).payload_schema
+    for field_name, field_schema in ORDERED_FIELDS.items():
+        if field_name not in indexed:
+            client.create_payload_index(collection_name, field_name=field_name, field_schema=field_schema)
+
+
+def update_catalogue(client: QdrantClient, collection_name: str, entries: Iterable[Dict[str, Any]]) -> None:
+    """Insert or replace the catalogue entries of indexed files"""
+    points = [
+        models.PointStruct(id=catalogue_point_id(entry["file_name"]), vector={}, payload=entry)
+        for entry in entries
+    ]
+    if not points:
+        return
+    _ensure_catalogue_collection(client, collection_name)
+    client.upsert(collection_name, points=points)
+
+
+def remove_from_catalogue(client: QdrantClient, collection_name: str, file_names: Iterable[str]) -> None:
+    point_ids = [catalogue_point_id(file_name) for file_name in file_names]
+    if point_ids and client.collection_exists(collection_name):
+        client.delete(collection_name, points_selector=models.PointIdsList(points=point_ids))
+
+
+def catalogue_entry(client: QdrantClient, index_name: str, file_name: str, file_hash: str, size: int) -> Dict[str, Any]:
+    """Describe a file that was just written to the index"""
+    chunk_count = client.count(index_name, count_filter=file_path_filter([file_name]), exact=True).count
+    return {
+        "file_name": file_name,
+        "file_hash": file_hash,
+        "chunk_count": chunk_count,
+        "size": size,
+        "indexed_at": time.time(),
+    }
+
+
+def _field_filter(field: str, present: bool) -> models.Filter:
+    empty = models.IsEmptyCondition(is_empty=models.PayloadField(key=field))
+    return models.Filter(must_not=[empty]) if present else models.Filter(must=[empty])
+
+
+def _sorted_ids(client: QdrantClient, collection_name: str, sort_by: str, descending: bool, count: int) -> List[str]:
+    """Point ids of the first `count` entries that have a `sort_by` value, in order"""
+    if count <= 0:
+        return []
+    if sort_by in ORDERED_FIELDS:
+        records, _ = client.scroll(
+            collection_name,
+            scroll_filter=_field_filter(sort_by, present=True),
+            limit=count,
+            order_by=models.OrderBy(key=sort_by, direction=models.Direction.DESC if descending else models.Direction.ASC),
+            with_payload=False,
+            with_vectors=False,
+        )
+        return [record.id for record in records]
+
+    # names are sorted here, reading only the names
+    file_names: List[str] = []
+    next_offset = None
+    while True:
+        records, next_offset = client.scroll(
+            collection_name,
+            limit=_SCROLL_PAGE_SIZE,
+            offset=next_offset,
+            with_payload=[sort_by],
+            with_vectors=False,
+        )
+        file_names.extend(record.payload[sort_by] for record in records if record.payload.get(sort_by) is not None)
+        if next_offset is None:
+            break
+    file_names.sort(reverse=descending)
+    return [catalogue_point_id(file_name) for file_name in file_names[:count]]
+
+
+def list_catalogue(
+    client: QdrantClient,
+    collection_name: str,
+    offset: int = 0,
+    limit: int = 50,
+    sort_by: str = "file_name",
+    descending: bool = False,
+) -> Dict[str, Any]:
+    """One page of the catalogue plus the total number of indexed files"""
+    if sort_by not in SORT_FIELDS:
+        raise ValueError(f"Cannot sort files by '{sort_by}', expected one of {', '.join(SORT_FIELDS)}")
+    if not client.collection_exists(collection_name):
+        return {"files": [], "total": 0, "offset": offset, "limit": limit}
+
+    total = client.count(collection_name, exact=True).count
+    present = client.count(collection_name, count_filter=_field_filter(sort_by, present=True), exact=True).count
+    end = min(offset + limit, total)
+    point_ids = _sorted_ids(client, collection_name, sort_by, descending, min(end, present))[offset:]
+    if end > present:
+        # backfilled entries may lack a size or time, they are listed last in either order
+        records, _ = client.scroll(
+            collection_name,
+            scroll_filter=_field_filter(sort_by, present=False),
+            limit=end - present,
+            with_payload=False,
+            with_vectors=False,
+        )
+        point_ids += [record.id for record in records][max(offset - present, 0):]
+
+    # only the entries of this page are read in full
+    records = client.retrieve(collection_name, ids=point_ids, with_payload=True) if point_ids else []
+    entries = {record.id: record.payload for record in records}
+    files = [entries[point_id] for point_id in point_ids if point_id in entries]
+    return {"files": files, "total": total, "offset": offset, "limit": limit}
+
+
+def backfill_catalogue(client: QdrantClient, index_name: str, collection_name: str) -> int:
+    """Build the catalogue from chunk payloads for an index created before the catalogue existed"""
+    if client.collection_exists(collection_name) or not client.collection_exists(index_name):
+        return 0
+
+    files: Dict[str, Dict[str, Any]] = {}
+    next_offset = None
+    while True:
+        # only the two meta fields are read, never chunk text or vectors
+        records, next_offset = client.scroll(
+            index_name,
+            limit=_SCROLL_PAGE_SIZE,
+            offset=next_offset,
+            with_payload=["meta.file_path", "meta.file_hash"],
+            with_vectors=False,
+        )
+        for record in records:
+            meta = (record.payload or {}).get("meta", {})
+            file_name = meta.get("file_path")
+            if file_name is None:
+                continue
+            entry = files.setdefault(file_name, {
+                "file_name": file_name,
+                "file_hash": meta.get("file_hash"),
+                "chunk_count": 0,
+                "size": None,
+                "indexed_at": None,
+            })
+            entry["chunk_count"] += 1
+        if next_offset is None:
+            break
+
+    _ensure_catalogue_collection(client, collection_name)
+    update_catalogue(client, collection_name, files.values())
+    return len(files)
+
+
+def backfill_file_metadata(client: QdrantClient, index_name: str, collection_name: str) -> int:
+    """Stamp the file type and indexing time on chunks written before the scope filters existed"""
+    if not client.collection_exists(index_name):
+        return 0
+
+    missing = models.Filter(must=[models.IsEmptyCondition(is_empty=models.PayloadField(key="meta.file_type"))])
+    file_names = set()
+    next_offset = None
+    while True:
+        records, next_offset = client.scroll(
+            index_name,
+            scroll_filter=missing,
+            limit=_SCROLL_PAGE_SIZE,
+            offset=next_offset,
+            with_payload=["meta.file_path"],
+            with_vectors=False,
+        )
+        file_names.update((record.payload or {}).get("meta", {}).get("file_path") for record in records)
+        if next_offset is None:
+            break
+    file_names.discard(None)
+    if not file_names:
+        return 0
+
+    # the catalogue knows when files indexed since it existed were written
+    indexed_at = {}
+    if client.collection_exists(collection_name):
+        records = client.retrieve(
+            collection_name, ids=[catalogue_point_id(file_name) for file_name in file_names], with_payload=True
+        )
+        indexed_at = {record.payload["file_name"]: record.payload.get("indexed_at") for record in records}
+
+    for file_name in file_names:
+        payload = {"file_type": file_type(file_name)}
+        if indexed_at.get(file_name) is not None:
+            payload["indexed_at"] = indexed_at[file_name]
+        client.set_payload(index_name, payload=payload, points=file_path_filter([file_name]), key="meta")
+    return len(file_names)
+
+
+def delete_indexed_files(
+    document_store: QdrantDocumentStore,
+    file_names: List[str],
+    catalogue_name: str,
+    state_name: str,
+    documents_dir: str,
+) -> Dict[str, Any]:
+    """Remove the chunks, catalogue entries and stored originals of many files at once"""
+    client = get_qdrant_client(document_store)
+    file_names = list(dict.fromkeys(os.path.basename(file_name) for file_name in file_names))
+    point_counts = count_points_per_file(client, document_store.index, file_names)
+
+    # one filtered delete for every file, resolved through the meta.file_path keyword index
+    if any(point_counts.values()):
+        client.delete(
+            document_store.index,
+            points_selector=models.FilterSelector(filter=file_path_filter(file_names)),
+        )
+    remove_from_catalogue(client, catalogue_name, file_names)
+
+    removed_files = []
+    for file_name in file_names:
+        file_path = os.path.join(documents_dir, file_name)
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+            removed_files.append(file_name)
+
+    bump_index_version(client, state_name)
+    return {
+        "deleted": point_counts,
+        "points": sum(point_counts.values()),
+        "removed_files": removed_files,
+    }
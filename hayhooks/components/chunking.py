@@ -0,0 +1,121 @@
+import re
+from copy import deepcopy
+from typing import Any, Dict, List
+
+import numpy as np
+import tiktoken
+from haystack import Document, component
+
+# split point preference, from best to worst, mirroring the separators ["\n\n", "sentence", "\n", " "]
+_BOUNDARIES = [
+    (4, re.compile(r"\n[^\S\n]*\n\s*")), # paragraph
+    (3, re.compile(r"(?<=[.!?])[\"')\]]*\s+")), # sentence
+    (2, re.compile(r"\n\s*")), # line
+    (1, re.compile(r"\s+")), # word
+]
+_LEVELS = 4
+
+
+@component
+class TokenChunker:
+    """
+    Splits documents into chunks of at most `split_length` tokens, encoding each document once.
+
+    Split points are the token starts that fall on a paragraph, sentence, line or word boundary.
+    Like RecursiveDocumentSplitter, a chunk ends at the last paragraph boundary that fits, falling
+    back to sentences, lines, words and finally a hard cut. Boundaries are found with regular
+    expressions in one pass over the text instead of NLTK.
+    """
+
+    def __init__(self, split_length: int = 1000, split_overlap: int = 0, encoding: str = "o200k_base"):
+        if split_overlap >= split_length:
+            raise ValueError("split_overlap must be smaller than split_length")
+        self.split_length = split_length
+        self.split_overlap = split_overlap
+        self.encoding = encoding
+        self._encoder = None
+
+    def warm_up(self) -> None:
+        if self._encoder is None:
+            encoder = tiktoken.get_encoding(self.encoding)
+            # byte length of every token, to compute token offsets without decoding token by token
+            lengths = np.zeros(encoder.n_vocab, dtype=np.int64)
+            for token in range(encoder.n_vocab):
+                try:
+                    lengths[token] = len(encoder.decode_single_token_bytes(token))
+                except KeyError:
+                    pass
+            self._token_lengths = lengths
+            self._encoder = encoder
+
+    @component.output_types(documents=List[Document])
+    def run(self, documents: List[Document]) -> Dict[str, Any]:
+        self.warm_up()
+        chunks = []
+        for document in documents:
+            if document.content:
+                chunks += self._split(document)
+        return {"documents": chunks}
+
+    def _offsets(self, text: str, tokens: List[int]) -> np.ndarray:
+        """Character offset at which every token starts; a token starting inside a character maps to it"""
+        data = np.frombuffer(text.encode("utf-8", errors="surrogatepass"), dtype=np.uint8)
+        character = np.cumsum((data & 0xC0) != 0x80) - 1 # character each byte belongs to
+        ends = np.cumsum(self._token_lengths[np.asarray(tokens, dtype=np.int64)])
+        return character[ends - self._token_lengths[tokens]]
+
+    def _split(self, document: Document) -> List[Document]:
+        text = document.content
+        tokens = self._encoder.encode(text, disallowed_special=())
+        if not tokens:
+            return []
+        offsets = self._offsets(text, tokens)
+        split_points = self._split_points(text, offsets)
+
+        chunks, start, previous_end, count = [], 0, 0, len(tokens)
+        while start < count:
+            end = self._chunk_end(split_points, start, previous_end, count)
+            first, last = int(offsets[start]), int(offsets[end]) if end < count else len(text)
+            content = text[first:last]
+            if content.strip():
+                meta = deepcopy(document.meta)
+                meta["parent_id"] = document.id
+                meta["split_id"] = len(chunks)
+                meta["split_idx_start"] = first
+                meta["page_number"] = text.count("\f", 0, first) + 1
+                chunks.append(Document(content=content, meta=meta))
+            if end >= count:
+                break
+            start, previous_end = max(end - self.split_overlap, start + 1), end
+        return chunks
+
+    @staticmethod
+    def _split_points(text: str, offsets: np.ndarray) -> List[np.ndarray]:
+        """For each boundary level, the sorted token indices starting at a boundary of that level or better"""
+        levels = np.zeros(len(offsets), dtype=np.int8)
+        for level, pattern in _BOUNDARIES:
+            spans = np.array([match.span() for match in pattern.finditer(text)], dtype=np.int64).reshape(-1, 2)
+            # a token starting anywhere in the separator, or right after it, is a split point
+            first = np.searchsorted(offsets, spans[:, 0], side="left")
+            last = np.searchsorted(offsets, spans[:, 1], side="right")
+            marks = np.zeros(len(offsets) + 1, dtype=np.int64)
+            np.add.at(marks, first, 1)
+            np.add.at(marks, last, -1)
+            inside = np.cumsum(marks[:-1]) > 0
+            levels[inside] = np.maximum(levels[inside], level)
+
+        levels[0] = 0 # a chunk cannot end before its first token
+        return [np.flatnonzero(levels >= level) for level in range(_LEVELS + 1)]
+
+    def _chunk_end(self, split_points: List[np.ndarray], start: int, previous_end: int, count: int) -> int:
+        limit = start + self.split_length
+        if limit >= count:
+            return count
+        # with an overlap, every chunk must still end past the previous one
+        floor = max(start, previous_end)
+        for level in range(_LEVELS, 0, -1):
+            points = split_points[level]
+            position = int(np.searchsorted(points, limit, side="right")) - 1
+            if position >= 0 and points[position] > floor:
+                return int(points[position])
+        return limit
@@ -0,0 +1,111 @@
+import re
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import tiktoken
+from haystack import Document, component
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+_WORD = re.compile(r"\w+")
+_STOPWORDS = {
+    "the", "and", "for", "are", "was", "were", "what", "which", "who", "how", "why", "when", "where",
+    "does", "did", "about", "with", "from", "that", "this", "these", "those", "into", "there", "their",
+    "give", "tell", "can", "you", "is", "of", "to", "in", "on", "a", "an", "me",
+}
+
+
+def _query_terms(query: str) -> Set[str]:
+    return {word for word in _WORD.findall(query.lower()) if len(word) > 2 and word not in _STOPWORDS}
+
+
+@component
+class ContextPacker:
+    """
+    Fits the ranked documents into the token budget left by the prompt template and the answer.
+
+    Documents are taken in ranked order. One that no longer fits whole is cut down to its most
+    query-relevant sentences, kept in their original order, when at least `min_span_tokens`
+    remain. Tokens are counted with tiktoken, the same encoding the chunker uses.
+    """
+
+    def __init__(
+        self,
+        context_window: int = 1024,
+        answer_tokens: int = 256,
+        template: str = "",
+        encoding: str = "o200k_base",
+        min_span_tokens: int = 48,
+    ):
+        self.context_window = context_window
+        self.answer_tokens = answer_tokens
+        self.template = template
+        self.encoding = encoding
+        self.min_span_tokens = min_span_tokens
+        self._encoder = None
+        self._template_tokens = 0
+
+    def warm_up(self) -> None:
+        if self._encoder is None:
+            self._encoder = tiktoken.get_encoding(self.encoding)
+            self._template_tokens = self._count(self.template)
+
+    def _count(self, text: str) -> int:
+        return len(self._encoder.encode(text, disallowed_special=()))
+
+    @component.output_types(documents=List[Document], context_tokens=int)
+    def run(self, documents: List[Document], query: Optional[str] = None) -> Dict[str, Any]:
+        self.warm_up()
+        query = query or ""
+        budget = self.context_window - self.answer_tokens - self._template_tokens - self._count(query)
+        terms = _query_terms(query)
+
+        packed, used = [], 0
+        for document in documents:
+            content = document.content or ""
+            # the template repeats the filename and labels for every document
+            overhead = self._count(f"Filename: {document.meta.get('file_path', '')} \nContent: \n\n")
+            remaining = budget - used - overhead
+            if remaining <= 0:
+                continue
+
+            tokens = self._count(content)
+            if tokens <= remaining:
+                packed.append(document)
+                used += overhead + tokens
+            elif remaining >= self.min_span_tokens:
+                spans, span_tokens = self._relevant_spans(content, terms, remaining)
+                if spans:
+                    meta = {**document.meta, "packed_from_tokens": tokens}
+                    packed.append(replace(document, content=spans, meta=meta))
+                    used += overhead + span_tokens
+
+        return {"documents": packed, "context_tokens": used}
+
+    def _relevant_spans(self, content: str, terms: Set[str], budget: int) -> Tuple[str, int]:
+        """The best matching sentences of `content` that fit into `budget` tokens, in document order"""
+        sentences = [sentence.strip() for sentence in _SENTENCE_BOUNDARY.split(content) if sentence.strip()]
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda index: (-len(terms & set(_WORD.findall(sentences[index].lower()))), index),
+        )
+
+        chosen, used = [], 0
+        for index in ranked:
+            # the separator between non-adjacent spans costs a token or two
+            tokens = self._count(sentences[index]) + 2
+            if used + tokens <= budget:
+                chosen.append(index)
+                used += tokens
+
+        if not chosen and sentences:
+            # even the best sentence is too long: keep its beginning
+            encoded = self._encoder.encode(sentences[ranked[0]], disallowed_special=())[:budget]
+            return self._encoder.decode(encoded), len(encoded)
+
+        spans, previous = [], None
+        for index in sorted(chosen):
+            if previous is not None:
+                spans.append(" " if index == previous + 1 else " ... ")
+            spans.append(sentences[index])
+            previous = index
+        return "".join(spans), used
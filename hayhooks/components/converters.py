@@ -0,0 +1,339 @@
+import csv
+import datetime
+import io
+import logging
+import mimetypes
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import openpyxl
+from haystack import Document, component
+from haystack.dataclasses import ByteStream
+
+logger = logging.getLogger(__name__)
+
+# plain formats converted in-process instead of by Tika, by mime type
+FAST_PATH_FORMATS = {
+    "text/plain": "text",
+    "text/csv": "csv",
+    "text/html": "html",
+    "text/markdown": "markdown",
+}
+
+_MARKDOWN_RULES = [
+    (re.compile(r"^```.*$", re.MULTILINE), ""), # code fences, keeping the code
+    (re.compile(r"!\[([^\]]*)\]\([^)]*\)"), r"\1"), # images become their alt text
+    (re.compile(r"\[([^\]]+)\]\([^)]*\)"), r"\1"), # links become their text
+    (re.compile(r"^\s{0,3}(#{1,6}|>+|[-*+]|\d+[.)])\s+", re.MULTILINE), ""), # headings, quotes, list markers
+    (re.compile(r"^\s*([-*_]\s*){3,}$", re.MULTILINE), ""), # horizontal rules
+    (re.compile(r"(\*\*|__|~~|`)(.+?)\1"), r"\2"), # bold, strikethrough, inline code
+    (re.compile(r"(?<!\w)[*_](\S(?:.*?\S)?)[*_](?!\w)"), r"\1"), # emphasis
+    (re.compile(r"<[^>]+>"), ""), # inline html
+]
+
+
+class ConversionStats:
+    """Files converted and time spent per converter and file extension, shared by the index pipelines"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._seconds: Dict[Tuple[str, str], float] = defaultdict(float)
+
+    def record(self, converter: str, extension: str, seconds: float, files: int = 1) -> None:
+        with self._lock:
+            self._files[(converter, extension)] += files
+            self._seconds[(converter, extension)] += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        stats: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        with self._lock:
+            for (converter, extension), files in sorted(self._files.items()):
+                seconds = self._seconds[(converter, extension)]
+                stats[converter][extension] = {
+                    "files": files,
+                    "seconds": round(seconds, 3),
+                    "mean_ms": round(seconds / files * 1000, 2),
+                }
+        return dict(stats)
+
+
+conversion_stats = ConversionStats()
+
+
+def _extension(source: Union[str, Path, ByteStream]) -> str:
+    file_path = source.meta.get("file_path", "") if isinstance(source, ByteStream) else str(source)
+    return os.path.splitext(file_path)[1].lower() or "unknown"
+
+
+class _HTMLText(HTMLParser):
+    """Collects the visible text of a page, with a line break after every block element"""
+
+    _SKIPPED = {"script", "style", "head", "template", "noscript"}
+    _BLOCKS = {"p", "div", "br", "li", "tr", "table", "section", "article", "h1", "h2", "h3", "h4", "h5", "h6", "pre"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag in self._SKIPPED:
+            self._skipping += 1
+        elif tag in self._BLOCKS:
+            self.parts.append("\n")
+        elif tag in ("td", "th"):
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._SKIPPED:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in self._BLOCKS:
+            self.parts.append("\n\n" if tag not in ("br", "li", "tr") else "\n")
+
+    def handle_data(self, data: str) -> None:
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def _html_text(text: str) -> str:
+    parser = _HTMLText()
+    parser.feed(text)
+    parser.close()
+    lines = (" ".join(line.split()) for line in "".join(parser.parts).split("\n"))
+    return "\n".join(lines)
+
+
+def _csv_text(text: str) -> str:
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    rows = csv.reader(io.StringIO(text), dialect)
+    return "\n".join(" | ".join(cell.strip() for cell in row) for row in rows if any(cell.strip() for cell in row))
+
+
+def _markdown_text(text: str) -> str:
+    for pattern, replacement in _MARKDOWN_RULES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def convert_bytes(kind: str, data: bytes) -> Tuple[str, float]:
+    """Text of a plain file and the seconds it took; runs in the converter's worker processes"""
+    start = time.perf_counter()
+    text = data.decode("utf-8-sig", errors="replace").replace("\r\n", "\n")
+    if kind == "csv":
+        text = _csv_text(text)
+    elif kind == "html":
+        text = _html_text(text)
+    elif kind == "markdown":
+        text = _markdown_text(text)
+    # whitespace is left to the DocumentCleaner that also cleans Tika's output
+    return text, time.perf_counter() - start
+
+
+def convert_file(kind: str, file_path: str) -> Tuple[str, float]:
+    """Read a plain file and convert it like convert_bytes, in the worker processes"""
+    with open(file_path, "rb") as file:
+        data = file.read()
+    return convert_bytes(kind, data)
+
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> Executor:
+    """Process pool shared by every FastPathConverter of the process, started on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # not fork: this runs on an indexing thread, and a child forked while another thread spawns a
+            # subprocess inherits that thread's pipes and locks; the forkserver starts the workers from a
+            # clean single-threaded process instead, which imports the main module once (app.py guards it)
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("forkserver"))
+        return _executor
+
+
+def _reset_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = None
+
+
+@component
+class FastPathConverter:
+    """
+    Converts plain text, CSV, HTML and Markdown files without a round trip to Tika.
+
+    Files are read and parsed with the standard library in a pool of `workers` processes, or
+    in-process when `workers` is 0. Output documents carry the same `file_path` metadata as
+    Tika's, and go through the same DocumentCleaner.
+    """
+
+    def __init__(self, workers: int = 2, stats: Optional[ConversionStats] = None):
+        self.workers = workers
+        self.stats = stats or conversion_stats
+
+    @component.output_types(documents=List[Document])
+    def run(self, sources: List[Union[str, Path, ByteStream]]) -> Dict[str, Any]:
+        # the workers read files themselves, so only paths are sent to them; streams are already in memory
+        jobs = []
+        for source in sources:
+            if isinstance(source, ByteStream):
+                function, payload, meta = convert_bytes, source.data, dict(source.meta)
+                mime_type = source.mime_type or mimetypes.guess_type(meta.get("file_path", ""))[0]
+            else:
+                function, payload, meta = convert_file, str(source), {"file_path": os.path.basename(str(source))}
+                mime_type = mimetypes.guess_type(str(source))[0]
+            jobs.append((source, function, FAST_PATH_FORMATS.get(mime_type, "text"), payload, meta))
+
+        results = None
+        if self.workers > 0 and jobs:
+            try:
+                executor = _get_executor(self.workers)
+                futures = [executor.submit(function, kind, payload) for _, function, kind, payload, _ in jobs]
+                results = [_read_result(source, future.result) for (source, *_), future in zip(jobs, futures)]
+            except BrokenProcessPool:
+                logger.warning("Conversion worker died, converting in-process and restarting the pool")
+                _reset_executor()
+        if results is None:
+            results = [
+                _read_result(source, lambda: function(kind, payload)) for source, function, kind, payload, _ in jobs
+            ]
+
+        documents = []
+        for (source, _, _, _, meta), result in zip(jobs, results):
+            if result is None:
+                continue
+            text, seconds = result
+            self.stats.record("fast", _extension(source), seconds)
+            documents.append(Document(content=text, meta=meta))
+        return {"documents": documents}
+
+
+def _read_result(source: Union[str, Path, ByteStream], result: Callable[[], Tuple[str, float]]) -> Optional[Tuple[str, float]]:
+    try:
+        return result()
+    except OSError as error:
+        logger.warning("Could not read %s. Skipping it. Error: %s", source, error)
+        return None
+
+
+def _cell_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time.min:
+        return value.date().isoformat() # dates are read back as datetimes at midnight
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return " ".join(str(value).split())
+
+
+@component
+class WindowedXLSXToDocument:
+    """
+    Converts spreadsheets into one document per window of rows.
+
+    Workbooks are parsed in openpyxl's read-only mode, row by row as plain values, without the
+    DataFrame or full workbook model XLSXToDocument builds. `run` returns the documents of whole
+    workbooks; `iter_documents` yields one window at a time, so a large workbook can be indexed
+    without holding all of it. A window holds at most `window_rows` rows and `window_chars`
+    characters, sized to stay below the chunk length so chunks end on row boundaries. Every window
+    starts with the sheet's header row, its first non-empty row. The sheet name is kept in the
+    `xlsx` metadata, as XLSXToDocument does.
+    """
+
+    def __init__(self, window_rows: int = 50, window_chars: int = 3000):
+        self.window_rows = window_rows
+        self.window_chars = window_chars
+
+    @component.output_types(documents=List[Document])
+    def run(self, sources: List[Union[str, Path, ByteStream]]) -> Dict[str, Any]:
+        documents = []
+        for source in sources:
+            try:
+                # all or nothing, so a workbook that breaks halfway does not replace its chunks with a part of them
+                documents += list(self.iter_documents(source))
+            except Exception as error:
+                logger.warning("Could not convert %s, skipping. Error: %s", source, error)
+        return {"documents": documents}
+
+    def iter_documents(self, source: Union[str, Path, ByteStream]) -> Iterator[Document]:
+        """Windows of a workbook in order, read as they are consumed; raises if the workbook cannot be read"""
+        if isinstance(source, ByteStream):
+            file, meta = io.BytesIO(source.data), dict(source.meta)
+        else:
+            file, meta = str(source), {"file_path": os.path.basename(str(source))}
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                yield from self._sheet_documents(sheet, meta)
+        finally:
+            workbook.close()
+
+    def _sheet_documents(self, sheet: Any, meta: Dict[str, Any]) -> Iterator[Document]:
+        header, window, size = None, [], 0
+        for row in sheet.iter_rows(values_only=True):
+            cells = [_cell_text(value) for value in row]
+            while cells and not cells[-1]:
+                cells.pop()
+            if not cells:
+                continue
+            line = _csv_line(cells)
+            if header is None:
+                header = line
+                continue
+
+            if window and (len(window) >= self.window_rows or size + len(line) > self.window_chars):
+                yield _window_document(sheet.title, header, window, meta)
+                window, size = [], 0
+            window.append(line)
+            size += len(line) + 1
+
+        # a sheet with only a header row still gets indexed
+        if header is not None:
+            yield _window_document(sheet.title, header, window, meta)
+
+
+def _window_document(sheet_name: str, header: str, window: List[str], meta: Dict[str, Any]) -> Document:
+    return Document(content="\n".join([header] + window), meta={**meta, "xlsx": {"sheet_name": sheet_name}})
+
+
+def _csv_line(cells: List[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(cells)
+    return buffer.getvalue()
+
+
+@component
+class TimedConverter:
+    """Runs a converter one source at a time, recording how long each file took per extension"""
+
+    def __init__(self, converter: Any, name: str, stats: Optional[ConversionStats] = None):
+        self.converter = converter
+        self.name = name
+        self.stats = stats or conversion_stats
+
+    @component.output_types(documents=List[Document])
+    def run(self, sources: List[Union[str, Path, ByteStream]]) -> Dict[str, Any]:
+        documents = []
+        for source in sources:
+            start = time.perf_counter()
+            documents += self.converter.run(sources=[source])["documents"]
+            self.stats.record(self.name, _extension(source), time.perf_counter() - start)
+        return {"documents": documents}
@@ -0,0 +1,210 @@
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from haystack import Document, component
+from haystack_integrations.document_stores.qdrant import QdrantDocumentStore
+from qdrant_client import models
+
+from components.store import get_qdrant_client
+
+SHINGLE_WORDS = 3
+PERMUTATIONS = 128
+BANDS = 16 # of 8 rows each: pairs above ~0.8 similarity share a band with high probability, pairs below ~0.5 rarely
+MODES = ("off", "link", "skip")
+
+_WORDS = re.compile(r"\w+")
+# fixed seeds, so band keys stay comparable across processes and restarts
+_SEEDS = np.random.RandomState(20240601).randint(0, 1 << 32, size=(PERMUTATIONS, 2)).astype(np.uint64)
+_SEEDS = (_SEEDS[:, 0] << np.uint64(32)) | _SEEDS[:, 1]
+
+# scroll requests match this many band keys at once
+_KEYS_PER_REQUEST = 1024
+
+
+def shingles(text: str) -> Set[int]:
+    """Hashes of the overlapping word 3-grams of a text, ignoring case, punctuation and whitespace"""
+    words = _WORDS.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {
+        zlib.crc32(" ".join(words[index:index + SHINGLE_WORDS]).encode("utf-8"))
+        for index in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def jaccard(first: Set[int], second: Set[int]) -> float:
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, one independent permutation per seed; the multiplications wrap around"""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def minhash_bands(shingle_set: Set[int]) -> List[str]:
+    """LSH band keys of a shingle set's MinHash signature; near-duplicates share at least one key"""
+    if not shingle_set:
+        return []
+    hashes = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+    signature = _mix(hashes[:, None] ^ _SEEDS).min(axis=0)
+    rows = signature.reshape(BANDS, -1)
+    return [f"{band}:{hashlib.blake2b(row.tobytes(), digest_size=8).hexdigest()}" for band, row in enumerate(rows)]
+
+
+class _Candidates:
+    """In-memory LSH index of chunks: band key to (document id, shingles, id of the chunk it duplicates)"""
+
+    def __init__(self):
+        self._bands: Dict[str, List[Tuple[str, Set[int], str]]] = defaultdict(list)
+
+    def add(self, document_id: str, shingle_set: Set[int], root: str, bands: List[str]) -> None:
+        entry = (document_id, shingle_set, root)
+        for band in bands:
+            self._bands[band].append(entry)
+
+    def best_match(self, document_id: str, shingle_set: Set[int], bands: List[str], threshold: float) -> Optional[str]:
+        """Root id of the most similar indexed chunk at or above the threshold"""
+        best, best_similarity, seen = None, threshold, set()
+        for band in bands:
+            for candidate_id, candidate_shingles, root in self._bands.get(band, ()):
+                if candidate_id == document_id or candidate_id in seen:
+                    continue
+                seen.add(candidate_id)
+                similarity = jaccard(shingle_set, candidate_shingles)
+                if similarity >= best_similarity:
+                    best, best_similarity = root, similarity
+        return best
+
+
+@component
+class NearDuplicateFilter:
+    """
+    Detects chunks that are near-duplicates of stored chunks or of earlier chunks in the batch.
+
+    Every chunk is MinHashed over its word 3-grams, and the signature's LSH band keys are stored
+    in `meta.minhash_bands`, a keyword-indexed payload field, so candidates across all files come
+    from one filtered scroll. Candidates are confirmed with the exact Jaccard similarity of the
+    shingles. In "link" mode a duplicate is kept with `meta.duplicate_of` set to the id of the
+    chunk it copies; in "skip" mode it is dropped before embedding. "off" passes chunks through.
+    Stored chunks listed in `excluded_ids`, the stale chunks about to be replaced, are not matched,
+    nor are stored chunks of the files in `replaced_files` that do not carry the file's new hash.
+    """
+
+    def __init__(self, document_store: QdrantDocumentStore, mode: str = "link", threshold: float = 0.85):
+        if mode not in MODES:
+            raise ValueError(f"Unknown near-duplicate mode '{mode}', expected one of {', '.join(MODES)}")
+        self.document_store = document_store
+        self.mode = mode
+        self.threshold = threshold
+
+    @component.output_types(documents=List[Document], stats=Dict[str, int])
+    def run(
+        self,
+        documents: List[Document],
+        excluded_ids: Optional[List[str]] = None,
+        replaced_files: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        stats = {"duplicates": 0}
+        if self.mode == "off" or not documents:
+            return {"documents": documents, "stats": stats}
+
+        prepared = []
+        for document in documents:
+            shingle_set = shingles(document.content or "")
+            prepared.append((document, shingle_set, minhash_bands(shingle_set)))
+        candidates = self._stored_candidates(
+            {band for _, _, bands in prepared for band in bands}, set(excluded_ids or ()), replaced_files or {}
+        )
+
+        kept = []
+        for document, shingle_set, bands in prepared:
+            root = candidates.best_match(document.id, shingle_set, bands, self.threshold)
+            if root is not None:
+                stats["duplicates"] += 1
+                if self.mode == "skip":
+                    continue
+            # a copy, so the documents passed in are left as they were
+            meta = {key: value for key, value in document.meta.items() if key != "duplicate_of"}
+            if root is not None:
+                meta["duplicate_of"] = root
+            if bands:
+                meta["minhash_bands"] = bands
+            candidates.add(document.id, shingle_set, root or document.id, bands)
+            kept.append(replace(document, meta=meta))
+        return {"documents": kept, "stats": stats}
+
+    def _stored_candidates(self, bands: Set[str], excluded_ids: Set[str], replaced_files: Dict[str, str]) -> _Candidates:
+        """Index of the stored chunks sharing a band key with the batch"""
+        client = get_qdrant_client(self.document_store)
+        candidates = _Candidates()
+        keys = sorted(bands)
+        seen = set(excluded_ids)
+
+        for first in range(0, len(keys), _KEYS_PER_REQUEST):
+            band_filter = models.Filter(must=[models.FieldCondition(
+                key="meta.minhash_bands",
+                match=models.MatchAny(any=keys[first:first + _KEYS_PER_REQUEST]),
+            )])
+            offset = None
+            while True:
+                records, offset = client.scroll(
+                    self.document_store.index,
+                    scroll_filter=band_filter,
+                    limit=1000,
+                    offset=offset,
+                    with_payload=["id", "content", "meta.minhash_bands", "meta.duplicate_of", "meta.file_path", "meta.file_hash"],
+                    with_vectors=False,
+                )
+                for record in records:
+                    payload = record.payload or {}
+                    document_id = payload.get("id")
+                    if document_id is None or document_id in seen:
+                        continue
+                    seen.add(document_id)
+                    meta = payload.get("meta", {})
+                    if meta.get("file_path") in replaced_files and meta.get("file_hash") != replaced_files[meta["file_path"]]:
+                        continue
+                    candidates.add(
+                        document_id,
+                        shingles(payload.get("content") or ""),
+                        meta.get("duplicate_of") or document_id,
+                        [band for band in meta.get("minhash_bands", []) if band in bands],
+                    )
+                if offset is None:
+                    break
+        return candidates
+
+
+@component
+class DiversityFilter:
+    """
+    Collapses near-duplicates in retrieved documents, keeping the best-ranked copy of each.
+
+    Documents are duplicates when they were linked at index time (same `meta.duplicate_of` root)
+    or when the Jaccard similarity of their word 3-grams reaches `threshold`. Runs before the
+    reranker, so the cross-encoder and the prompt only see distinct passages.
+    """
+
+    def __init__(self, threshold: float = 0.85):
+        self.threshold = threshold
+
+    @component.output_types(documents=List[Document])
+    def run(self, documents: List[Document]) -> Dict[str, Any]:
+        kept, seen = [], []
+        for document in documents:
+            root = document.meta.get("duplicate_of") or document.id
+            shingle_set = shingles(document.content or "")
+            if any(root == kept_root or jaccard(shingle_set, kept_shingles) >= self.threshold for kept_root, kept_shingles in seen):
+                continue
+            seen.append((root, shingle_set))
+            kept.append(document)
+        return {"documents": kept}
@@ -0,0 +1,219 @@
+import hashlib
+import time
+from collections import defaultdict
+from dataclasses import replace
+from typing import Any, Dict, List, Optional
+
+from haystack import Document, component
+from haystack_integrations.document_stores.qdrant import QdrantDocumentStore
+from haystack_integrations.document_stores.qdrant.converters import convert_id
+from qdrant_client import QdrantClient, models
+
+from components.catalogue import catalogue_point_id
+from components.store import file_path_filter, file_type, get_qdrant_client
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path: str) -> str:
+    """Hash a file on disk without loading it into memory"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_content(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def is_file_unchanged(
+    document_store: QdrantDocumentStore, file_path: str, file_hash: str, catalogue_name: Optional[str] = None
+) -> bool:
+    """True if the file is already indexed and every chunk carries the given file hash"""
+    client = get_qdrant_client(document_store)
+    path_filter = file_path_filter([file_path])
+
+    indexed = client.count(document_store.index, count_filter=path_filter, exact=True).count
+    if not indexed:
+        # a file can be indexed without chunks, e.g. when all of them were skipped as near-duplicates
+        return catalogue_name is not None and _catalogue_hash(client, catalogue_name, file_path) == file_hash
+
+    outdated = client.count(
+        document_store.index,
+        count_filter=models.Filter(
+            must=path_filter.must,
+            must_not=[models.FieldCondition(key="meta.file_hash", match=models.MatchValue(value=file_hash))],
+        ),
+        exact=True,
+    ).count
+    return outdated == 0
+
+
+def _catalogue_hash(client: QdrantClient, catalogue_name: str, file_path: str) -> Optional[str]:
+    if not client.collection_exists(catalogue_name):
+        return None
+    records = client.retrieve(catalogue_name, ids=[catalogue_point_id(file_path)], with_payload=["file_hash"])
+    return records[0].payload.get("file_hash") if records else None
+
+
+def mark_file_indexed(document_store: QdrantDocumentStore, file_path: str, file_hash: str) -> None:
+    """Stamp the file hash, type and indexing time on every chunk once all of the file's chunks were written"""
+    client = get_qdrant_client(document_store)
+    client.set_payload(
+        document_store.index,
+        payload={"file_hash": file_hash, "file_type": file_type(file_path), "indexed_at": time.time()},
+        points=file_path_filter([file_path]),
+        key="meta",
+    )
+
+
+def stamp_file_hash(document_store: QdrantDocumentStore, document_ids: List[str], file_hash: str) -> None:
+    """Give stored chunks a new file hash, for the unchanged chunks a part of a streamed file keeps"""
+    if document_ids:
+        get_qdrant_client(document_store).set_payload(
+            document_store.index,
+            payload={"file_hash": file_hash},
+            points=[convert_id(document_id) for document_id in document_ids],
+            key="meta",
+        )
+
+
+def remove_outdated_chunks(document_store: QdrantDocumentStore, file_path: str, file_hash: str) -> int:
+    """Delete the chunks of a file that do not carry the given hash, once every part of a streamed file is written"""
+    client = get_qdrant_client(document_store)
+    outdated = models.Filter(
+        must=file_path_filter([file_path]).must,
+        must_not=[models.FieldCondition(key="meta.file_hash", match=models.MatchValue(value=file_hash))],
+    )
+    deleted = client.count(document_store.index, count_filter=outdated, exact=True).count
+    if deleted:
+        client.delete(document_store.index, points_selector=models.FilterSelector(filter=outdated))
+    return deleted
+
+
+@component
+class IncrementalChunkFilter:
+    """
+    Drops chunks whose content is already stored for the same file and finds the stale ones.
+
+    `file_hashes` is keyed by `meta.file_path` as the converters store it; chunks of files that
+    are not listed pass through untouched. Chunks get a deterministic id derived from their file path and content hash, so an unchanged
+    chunk maps onto the point that already exists and only new content reaches the embedders.
+    Stored chunks whose content is gone are returned as `stale_ids` rather than deleted, so a file
+    keeps its old chunks until StaleChunkRemover runs after the new ones were written.
+
+    With `partial`, the documents are one part of each file: only stored chunks with the same
+    content are looked up, no stale chunks are reported, and the stored chunks the part keeps are
+    returned as `kept_ids` so they can be stamped with the new file hash.
+    """
+
+    def __init__(self, document_store: QdrantDocumentStore):
+        self.document_store = document_store
+
+    @component.output_types(documents=List[Document], stale_ids=List[str], kept_ids=List[str], stats=Dict[str, int])
+    def run(
+        self, documents: List[Document], file_hashes: Optional[Dict[str, str]] = None, partial: bool = False
+    ) -> Dict[str, Any]:
+        file_hashes = file_hashes or {}
+        stats = {"skipped": 0, "updated": 0, "deleted": 0}
+        indexed_at = time.time()
+
+        by_file = defaultdict(list)
+        changed, stale_ids, kept_ids = [], [], []
+        for document in documents:
+            file_path = document.meta.get("file_path")
+            if file_path in file_hashes:
+                by_file[file_path].append(document)
+            else:
+                changed.append(document)
+
+        # files without any chunks left still need their stale chunks removed
+        for file_path, file_hash in file_hashes.items():
+            chunks = by_file.get(file_path, [])
+            if partial and not chunks:
+                continue
+            content_hashes = [hash_content(chunk.content or "") for chunk in chunks] if partial else None
+            existing = self._existing_chunks(file_path, content_hashes)
+            seen = set()
+
+            for chunk in chunks:
+                content_hash = hash_content(chunk.content or "")
+                if content_hash in seen:
+                    stats["skipped"] += 1
+                    continue
+                seen.add(content_hash)
+
+                # a copy, so the chunker's output is left as it was
+                chunk = replace(
+                    chunk,
+                    id=hash_content(f"{file_path}\x00{content_hash}"),
+                    meta={
+                        **chunk.meta,
+                        "file_hash": file_hash,
+                        "content_hash": content_hash,
+                        # the scope filters of the query endpoints match on these
+                        "file_type": file_type(file_path),
+                        "indexed_at": indexed_at,
+                    },
+                )
+
+                if content_hash in existing:
+                    stats["skipped"] += 1
+                    if partial:
+                        kept_ids += existing[content_hash]
+                else:
+                    stats["updated"] += 1
+                    changed.append(chunk)
+
+            if partial:
+                continue
+            stale = [
+                document_id
+                for content_hash, document_ids in existing.items() if content_hash not in seen
+                for document_id in document_ids
+            ]
+            stale_ids += stale
+            stats["deleted"] += len(stale)
+
+        return {"documents": changed, "stale_ids": stale_ids, "kept_ids": kept_ids, "stats": stats}
+
+    def _existing_chunks(self, file_path: str, content_hashes: Optional[List[str]] = None) -> Dict[str, List[str]]:
+        """Map the content hash of every stored chunk of a file, or of those with the given hashes, to its document ids"""
+        client = get_qdrant_client(self.document_store)
+        existing = defaultdict(list)
+        offset = None
+        scroll_filter = file_path_filter([file_path])
+        if content_hashes is not None:
+            scroll_filter.must.append(models.FieldCondition(key="meta.content_hash", match=models.MatchAny(any=content_hashes)))
+
+        while True:
+            records, offset = client.scroll(
+                self.document_store.index,
+                scroll_filter=scroll_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=["id", "meta.content_hash"],
+                with_vectors=False,
+            )
+            for record in records:
+                payload = record.payload or {}
+                existing[payload.get("meta", {}).get("content_hash")].append(payload.get("id"))
+            if offset is None:
+                return existing
+
+
+@component
+class StaleChunkRemover:
+    """Deletes the stale chunks found by IncrementalChunkFilter once the writer has stored the new ones"""
+
+    def __init__(self, document_store: QdrantDocumentStore):
+        self.document_store = document_store
+
+    @component.output_types(deleted=int)
+    def run(self, documents_written: int, stale_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        # documents_written is only taken so the pipeline runs this after the writer
+        if stale_ids:
+            self.document_store.delete_documents(stale_ids)
+        return {"deleted": len(stale_ids or [])}
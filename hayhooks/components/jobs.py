@@ -0,0 +1,104 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# index stage -> progress flag it sets on every file of the batch
+STAGE_PROGRESS = {
+    "convert": "converted",
+    "chunk": "chunked",
+    "embed": "embedded",
+    "write": "written",
+}
+
+
+class IndexJob:
+    """Progress of one background indexing request"""
+
+    def __init__(self, file_names: List[str]):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.files = {
+            name: {"status": "pending", **{flag: False for flag in STAGE_PROGRESS.values()}}
+            for name in file_names
+        }
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def mark(self, file_names: List[str], stage: str) -> None:
+        with self._lock:
+            for name in file_names:
+                if name in self.files:
+                    self.files[name][STAGE_PROGRESS[stage]] = True
+                    self.files[name]["status"] = "done" if stage == "write" else "indexing"
+
+    def set_file_status(self, file_name: str, status: str) -> None:
+        with self._lock:
+            if file_name in self.files:
+                self.files[file_name]["status"] = status
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "files": {name: dict(progress) for name, progress in self.files.items()},
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobQueue:
+    """Runs indexing jobs in the background and keeps the most recent ones for status polling"""
+
+    def __init__(self, workers: int = 1, max_history: int = 100):
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="index-job")
+        self._jobs: "OrderedDict[str, IndexJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, file_names: List[str], run: Callable[[IndexJob], Dict[str, Any]]) -> IndexJob:
+        job = IndexJob(file_names)
+        with self._lock:
+            self._jobs[job.id] = job
+            # forget the oldest finished jobs once the history is full
+            for job_id in [job_id for job_id, old in self._jobs.items() if old.finished_at is not None]:
+                if len(self._jobs) <= self.max_history:
+                    break
+                del self._jobs[job_id]
+        self._executor.submit(self._run, job, run)
+        return job
+
+    def get(self, job_id: str) -> Optional[IndexJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @staticmethod
+    def _run(job: IndexJob, run: Callable[[IndexJob], Dict[str, Any]]) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = run(job)
+            job.status = "completed"
+        except Exception as error:
+            logger.exception("Indexing job %s failed", job.id)
+            job.error = str(error)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+
+index_jobs = JobQueue(workers=int(os.getenv("INDEX_JOB_WORKERS", "1")))
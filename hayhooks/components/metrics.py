@@ -0,0 +1,165 @@
+import contextlib
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from haystack import Document
+from haystack.dataclasses import ChatMessage
+from haystack.tracing import Span, Tracer
+
+logger = logging.getLogger(__name__)
+
+# upper bounds in seconds, wide enough for slow generations on CPU
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+CONTENT_LOG_LIMIT = 2000 # characters of each sampled input or output that are logged
+
+_COMPONENT_RUN = "haystack.component.run"
+_COMPONENT_NAME = "haystack.component.name"
+_COMPONENT_TYPE = "haystack.component.type"
+
+
+class MetricsSpan(Span):
+    """Keeps only what the metrics need; content is inspected for counts and logged when sampled"""
+
+    def __init__(self, operation_name: str, tags: Optional[Dict[str, Any]], sampled: bool):
+        self.operation_name = operation_name
+        self.tags = dict(tags or {})
+        self.sampled = sampled
+        self.documents: Dict[str, int] = {}
+        self.tokens: Dict[str, int] = {}
+        self.content: Dict[str, Any] = {}
+
+    def set_tag(self, key: str, value: Any) -> None:
+        self.tags[key] = value
+
+    def set_content_tag(self, key: str, value: Any) -> None:
+        if key.endswith(".output") and isinstance(value, dict):
+            self._count_output(value)
+        if self.sampled:
+            self.content[key] = value
+
+    def _count_output(self, outputs: Dict[str, Any]) -> None:
+        for socket, value in outputs.items():
+            if isinstance(value, list) and value and isinstance(value[0], Document):
+                self.documents[socket] = len(value)
+            elif isinstance(value, list) and value and isinstance(value[0], ChatMessage):
+                for message in value:
+                    for kind, count in (message.meta.get("usage") or {}).items():
+                        if kind in ("prompt_tokens", "completion_tokens") and isinstance(count, int):
+                            self.tokens[kind] = self.tokens.get(kind, 0) + count
+
+
+class MetricsTracer(Tracer):
+    """
+    Haystack tracer recording per-component latency histograms and document, token and error counts.
+
+    Content tracing is sampled per pipeline run: with probability `content_sample_rate` the inputs
+    and outputs of every component of that run are logged, otherwise no content is kept.
+    """
+
+    def __init__(self, content_sample_rate: float = 0.0):
+        self.content_sample_rate = content_sample_rate
+        self._current: contextvars.ContextVar = contextvars.ContextVar("metrics_span", default=None)
+        self._lock = threading.Lock()
+        self._latency: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+        self._latency_sum: Dict[Tuple[str, str], float] = defaultdict(float)
+        self._documents: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self._tokens: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self._errors: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    @contextlib.contextmanager
+    def trace(
+        self, operation_name: str, tags: Optional[Dict[str, Any]] = None, parent_span: Optional[Span] = None
+    ) -> Iterator[Span]:
+        parent = parent_span if isinstance(parent_span, MetricsSpan) else self._current.get()
+        # the sampling decision is taken once per pipeline run and inherited by its components
+        sampled = parent.sampled if parent is not None else random.random() < self.content_sample_rate
+        span = MetricsSpan(operation_name, tags, sampled)
+        token = self._current.set(span)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield span
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._current.reset(token)
+            if operation_name == _COMPONENT_RUN:
+                self._record(span, time.perf_counter() - start, failed)
+
+    def current_span(self) -> Optional[Span]:
+        return self._current.get()
+
+    def _record(self, span: MetricsSpan, seconds: float, failed: bool) -> None:
+        labels = (span.tags.get(_COMPONENT_NAME, "unknown"), span.tags.get(_COMPONENT_TYPE, "unknown"))
+        with self._lock:
+            self._latency[labels][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self._latency_sum[labels] += seconds
+            for socket, count in span.documents.items():
+                self._documents[labels + (socket,)] += count
+            for kind, count in span.tokens.items():
+                self._tokens[labels + (kind.replace("_tokens", ""),)] += count
+            if failed:
+                self._errors[labels] += 1
+
+        if span.sampled and span.content:
+            logger.info(
+                "Component %s took %.3fs: %s",
+                labels[0],
+                seconds,
+                {key: repr(value)[:CONTENT_LOG_LIMIT] for key, value in span.content.items()},
+            )
+
+    def render(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP haystack_component_duration_seconds Time spent in a component run.",
+            "# TYPE haystack_component_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (name, kind), buckets in sorted(self._latency.items()):
+                labels = f'component="{name}",type="{kind}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), buckets):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'haystack_component_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                total = self._latency_sum[(name, kind)]
+                lines.append(f"haystack_component_duration_seconds_sum{{{labels}}} {total:.6f}")
+                lines.append(f"haystack_component_duration_seconds_count{{{labels}}} {cumulative}")
+
+            lines += [
+                "# HELP haystack_component_documents_total Documents returned by a component, per output socket.",
+                "# TYPE haystack_component_documents_total counter",
+            ]
+            for (name, kind, socket), count in sorted(self._documents.items()):
+                labels = f'component="{name}",type="{kind}",output="{socket}"'
+                lines.append(f"haystack_component_documents_total{{{labels}}} {count}")
+
+            lines += [
+                "# HELP haystack_component_tokens_total Prompt and completion tokens reported by a generator.",
+                "# TYPE haystack_component_tokens_total counter",
+            ]
+            for (name, kind, token_kind), count in sorted(self._tokens.items()):
+                labels = f'component="{name}",type="{kind}",kind="{token_kind}"'
+                lines.append(f"haystack_component_tokens_total{{{labels}}} {count}")
+
+            lines += [
+                "# HELP haystack_component_errors_total Component runs that raised an error.",
+                "# TYPE haystack_component_errors_total counter",
+            ]
+            for (name, kind), count in sorted(self._errors.items()):
+                lines.append(f'haystack_component_errors_total{{component="{name}",type="{kind}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+
+# one tracer per process, shared by both pipeline wrappers and served by the /metrics route
+metrics_tracer = MetricsTracer(content_sample_rate=float(os.getenv("CONTENT_TRACE_SAMPLE_RATE", "0")))
@@ -0,0 +1,101 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Creates each FastEmbed component once per process and warms it up in a background thread.
+
+    Pipelines get a SharedComponent for a key rather than their own component, so they all use
+    the same model weights, and building the pipelines does not block on loading them. A
+    pipeline that runs while its model is still loading waits for it.
+    """
+
+    def __init__(self, workers: int = 1):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="model-warm-up")
+        self._futures: Dict[str, Future] = {}
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._shared: Dict[str, "SharedComponent"] = {}
+        self._lock = threading.Lock()
+
+    def register(self, key: str, loader: Callable[[], Any]) -> None:
+        """Start loading a model, unless a model with the same key is already registered"""
+        with self._lock:
+            if key in self._futures:
+                return
+            self._loaders[key] = loader
+            self._submit(key)
+
+    def _submit(self, key: str) -> None:
+        self._status[key] = {"status": "loading", "seconds": None, "error": None}
+        self._futures[key] = self._executor.submit(self._load, key, self._loaders[key])
+
+    def _load(self, key: str, loader: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            model = loader()
+        except Exception as error:
+            logger.exception("Failed to load model %s", key)
+            with self._lock:
+                self._status[key].update(status="failed", error=str(error))
+            raise
+        seconds = time.perf_counter() - start
+        logger.info("Loaded model %s in %.1fs", key, seconds)
+        with self._lock:
+            self._status[key].update(status="ready", seconds=round(seconds, 2))
+        return model
+
+    def get(self, key: str, timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            if key not in self._futures:
+                raise KeyError(f"Model not registered: {key}")
+            # a failed load (e.g. model files not downloaded yet) is retried by the next caller
+            if self._futures[key].done() and self._futures[key].exception() is not None:
+                self._submit(key)
+            future = self._futures[key]
+        return future.result(timeout=timeout)
+
+    def share(self, key: str, create: Callable[[], Any]) -> "SharedComponent":
+        """The component shared under `key`, created with `create` and warmed up in the background the first time"""
+        with self._lock:
+            if key not in self._shared:
+                self._shared[key] = SharedComponent(self, key, create())
+            shared = self._shared[key]
+        self.register(key, shared.component.warm_up)
+        return shared
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {key: dict(status) for key, status in self._status.items()}
+        return {"ready": all(model["status"] == "ready" for model in models.values()), "models": models}
+
+
+class SharedComponent:
+    """
+    A component shared through the registry, for the Cached* wrappers to wrap.
+
+    warm_up() waits for the registry's background warm-up instead of starting a second one, and
+    run() calls the shared `component`, whose output sockets the wrappers mirror.
+    """
+
+    def __init__(self, registry: ModelRegistry, key: str, component: Any):
+        self.registry = registry
+        self.key = key
+        self.component = component
+        self.__haystack_output__ = component.__haystack_output__
+
+    def warm_up(self) -> None:
+        self.registry.get(self.key)
+
+    def run(self, *args, **kwargs) -> Dict[str, Any]:
+        return self.component.run(*args, **kwargs)
+
+
+# FastEmbed models shared by the index and query pipelines of this process
+model_registry = ModelRegistry()
@@ -1,10 +1,12 @@
+import logging
 import os
+import time
 from pathlib import Path
+from typing import Callable, Generator, Iterator, List, Optional, Union
 
-from haystack import Pipeline
+from haystack import AsyncPipeline, Document, Pipeline
 from haystack.components.builders import ChatPromptBuilder
 from haystack.components.converters import TikaDocumentConverter
-from haystack.components.converters.xlsx import XLSXToDocument
 from haystack.components.joiners import DocumentJoiner
 from haystack.components.preprocessors import DocumentCleaner, RecursiveDocumentSplitter
 from haystack.components.rankers import MetaFieldRanker
@@ -28,6 +30,41 @@ from haystack_integrations.components.retrievers.qdrant import (
     QdrantHybridRetriever,
 )
 from haystack_integrations.document_stores.qdrant import QdrantDocumentStore
+from qdrant_client import models
+
+from components.batching import (
+    MicroBatcher,
+    fastembed_rank_batch,
+    fastembed_sparse_embed_batch,
+    ollama_embed_batch,
+)
+from components.caching import (
+    AnswerCache,
+    CachedDocumentEmbedder,
+    CachedTextEmbedder,
+    EmbeddingCache,
+    SessionContextCache,
+)
+from components.catalogue import catalogue_entry, update_catalogue
+from components.chunking import TokenChunker
+from components.context import ContextPacker
+from components.converters import FastPathConverter, WindowedXLSXToDocument, TimedConverter, conversion_stats
+from components.dedup import DiversityFilter, NearDuplicateFilter
+from components.incremental import (
+    IncrementalChunkFilter,
+    StaleChunkRemover,
+    mark_file_indexed,
+    remove_outdated_chunks,
+    stamp_file_hash,
+)
+from components.models import model_registry
+from components.profiles import RetrievalProfile, get_profile
+from components.reranking import CachedRanker
+from components.scheduling import BULK, INTERACTIVE, ollama_scheduler
+from components.staged import IndexBatch, Stage, StagedIndexer, StreamedFile
+from components.store import get_qdrant_client
+
+logger = logging.getLogger(__name__)
 
 ###################################################################################################
 
@@ -37,6 +74,9 @@ qdrant_url = os.getenv("QDRANT_URL", "http://localhost:6333")
 tika_url = os.getenv("TIKA_URL", "http://localhost:9998/tika")
 
 embedding_name = "index"
+index_state_name = "index_state" # payload-only collection holding the index version
+index_files_name = "index_files" # payload-only catalogue with one entry per indexed file
+documents_dir = "documents" # uploaded originals, relative to the hayhooks directory
 embedding_dim = 384
 
 dense_embedder_model = "granite-embedding:30m"
@@ -44,41 +84,191 @@ sparse_embedder_model = "Qdrant/bm25"
 
 ranker_model = "jinaai/jina-reranker-v1-turbo-en"
 generator_model = "qwen3:0.6b"
+generator_context_length = int(os.getenv("GENERATOR_CONTEXT_LENGTH", "1024"))
+context_answer_tokens = int(os.getenv("CONTEXT_ANSWER_TOKENS", "256")) # kept free for the answer when packing context
+
+# bulk indexing: files per batch, batches waiting between stages, and worker threads per stage
+index_batch_size = int(os.getenv("INDEX_BATCH_SIZE", "8"))
+index_queue_size = int(os.getenv("INDEX_QUEUE_SIZE", "2"))
+index_stage_workers = {
+    "convert": int(os.getenv("INDEX_CONVERT_WORKERS", "2")),
+    "chunk": int(os.getenv("INDEX_CHUNK_WORKERS", "1")),
+    "embed": int(os.getenv("INDEX_EMBED_WORKERS", "1")),
+    "write": int(os.getenv("INDEX_WRITE_WORKERS", "1")),
+}
+
+# "recursive" for RecursiveDocumentSplitter, or "token" for the single-pass TokenChunker
+chunker_name = os.getenv("CHUNKER", "recursive")
+chunk_split_length = 1000 # tokens
+
+# plain formats converted without Tika, in a pool of worker processes (0 converts in-process)
+fast_convert_workers = int(os.getenv("FAST_CONVERT_WORKERS", "2"))
+fast_path_mime_types = r"text/(plain|csv|html|markdown)"
+
+# spreadsheets are split into windows of rows, sized to stay below the chunk length
+xlsx_window_rows = int(os.getenv("XLSX_WINDOW_ROWS", "50"))
+xlsx_window_chars = int(os.getenv("XLSX_WINDOW_CHARS", "3000"))
+# larger workbooks go through the staged indexer in batches of this many windows, never held whole
+xlsx_batch_windows = int(os.getenv("XLSX_BATCH_WINDOWS", "200"))
+
+# near-duplicate chunks across files: "off", "link" (kept, with meta.duplicate_of) or "skip" (not indexed)
+dedup_mode = os.getenv("DEDUP_MODE", "off")
+dedup_threshold = float(os.getenv("DEDUP_THRESHOLD", "0.85")) # Jaccard similarity of word 3-grams
+
+# collapses near-duplicate retrieval results before reranking
+diversity_filter_enabled = os.getenv("DIVERSITY_FILTER_ENABLED", "true").lower() == "true"
+diversity_threshold = float(os.getenv("DIVERSITY_THRESHOLD", "0.85"))
+
+# HNSW, quantization and on-disk settings of the collection, and the retriever's top_k and threshold:
+# "latency", "balanced" or "recall"
+retrieval_profile = get_profile(os.getenv("RETRIEVAL_PROFILE", "balanced"))
+
+# chunk embeddings cache shared by the dense and sparse document embedders, and concurrent Ollama batches
+chunk_cache_size = int(os.getenv("CHUNK_CACHE_SIZE", "20000"))
+chunk_cache_ttl = float(os.getenv("CHUNK_CACHE_TTL", str(30 * 86400)))
+chunk_cache_path = os.getenv("CHUNK_CACHE_PATH") # persists the cache across restarts when set
+embed_batch_size = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+embed_concurrency = int(os.getenv("EMBED_CONCURRENCY", "4")) # Ollama batches in flight at once
+
+# query embeddings cache shared by the dense and sparse query embedders
+query_cache_size = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+query_cache_ttl = float(os.getenv("QUERY_CACHE_TTL", "86400"))
+query_cache_path = os.getenv("QUERY_CACHE_PATH") # persists the cache across restarts when set
+
+# semantic answer cache, invalidated whenever the index version changes
+answer_cache_enabled = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+answer_cache_max_distance = float(os.getenv("ANSWER_CACHE_MAX_DISTANCE", "0.05"))
+answer_cache_size = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+answer_cache_ttl = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+
+# reuse of a conversation's retrieved documents for follow-up questions on the same topic
+session_reuse_enabled = os.getenv("SESSION_REUSE_ENABLED", "false").lower() == "true"
+session_min_similarity = float(os.getenv("SESSION_MIN_SIMILARITY", "0.75"))
+session_cache_size = int(os.getenv("SESSION_CACHE_SIZE", "1000"))
+session_cache_ttl = float(os.getenv("SESSION_CACHE_TTL", "1800"))
+
+# concurrent queries are embedded and reranked together: a batch waits up to the window for more queries
+micro_batch_enabled = os.getenv("MICRO_BATCH_ENABLED", "true").lower() == "true"
+micro_batch_window = float(os.getenv("MICRO_BATCH_WINDOW_MS", "5")) / 1000
+micro_batch_max_size = int(os.getenv("MICRO_BATCH_MAX_SIZE", "16"))
+
+# cross-encoder scores cache, and "adaptive" reranking of only the uncertain retrieval results
+rerank_mode = os.getenv("RERANK_MODE", "always")
+rerank_band = float(os.getenv("RERANK_BAND", "0.1")) # fraction of the top dense similarity
+rerank_cache_size = int(os.getenv("RERANK_CACHE_SIZE", "4096"))
+rerank_cache_ttl = float(os.getenv("RERANK_CACHE_TTL", "86400"))
 
 
 ###################################################################################################
 
 
-def create_document_store() -> QdrantDocumentStore:
+query_embedding_cache = EmbeddingCache(max_size=query_cache_size, ttl=query_cache_ttl, path=query_cache_path)
+rerank_score_cache = EmbeddingCache(max_size=rerank_cache_size, ttl=rerank_cache_ttl)
+chunk_embedding_cache = EmbeddingCache(max_size=chunk_cache_size, ttl=chunk_cache_ttl, path=chunk_cache_path)
+
+
+def create_answer_cache() -> Optional[AnswerCache]:
+    if not answer_cache_enabled:
+        return None
+    return AnswerCache(max_distance=answer_cache_max_distance, max_size=answer_cache_size, ttl=answer_cache_ttl)
+
+
+def create_session_cache() -> Optional[SessionContextCache]:
+    if not session_reuse_enabled:
+        return None
+    return SessionContextCache(min_similarity=session_min_similarity, max_sessions=session_cache_size, ttl=session_cache_ttl)
+
+
+def create_document_store(
+    location: Optional[str] = None, profile: Optional[RetrievalProfile] = None, index: str = embedding_name
+) -> QdrantDocumentStore:
+    """Store on the Qdrant server, or on `location` (e.g. ":memory:" or a path) in Qdrant local mode"""
+    profile = profile or retrieval_profile
     return QdrantDocumentStore(
-        url=qdrant_url,
-        index=embedding_name,
+        url=None if location else qdrant_url,
+        location=location,
+        index=index,
         embedding_dim=embedding_dim,
         recreate_index=False, # when true, discards existing collection and makes new one
         use_sparse_embeddings=True,
         sparse_idf=True,
-        on_disk=True,
+        # only applied when the collection is created; see store.apply_collection_config for existing ones
+        on_disk=profile.on_disk,
+        hnsw_config=profile.hnsw_config(),
+        quantization_config=profile.quantization_config(),
+        # filters, counts and deletes by file use this index instead of scanning the collection
+        payload_fields_to_index=[
+            {"field_name": "meta.file_path", "field_schema": models.PayloadSchemaType.KEYWORD},
+            # near-duplicate candidates are looked up by their MinHash band keys
+            {"field_name": "meta.minhash_bands", "field_schema": models.PayloadSchemaType.KEYWORD},
+            # the parts of a streamed workbook look up their stored chunks by content
+            {"field_name": "meta.content_hash", "field_schema": models.PayloadSchemaType.KEYWORD},
+            # scoped queries filter on these, so a search only touches the matching chunks
+            {"field_name": "meta.file_type", "field_schema": models.PayloadSchemaType.KEYWORD},
+            {"field_name": "meta.indexed_at", "field_schema": models.PayloadSchemaType.FLOAT},
+        ],
     )
 
 
-def create_index_pipeline() -> Pipeline:
-    document_store = create_document_store()
+def create_retriever(document_store: QdrantDocumentStore, profile: Optional[RetrievalProfile] = None) -> QdrantHybridRetriever:
+    profile = profile or retrieval_profile
+    return QdrantHybridRetriever(
+        document_store=document_store,
+        top_k=profile.top_k,
+        score_threshold=profile.score_threshold,
+        # adaptive reranking tells confident results apart by their dense similarity to the query
+        return_embedding=rerank_mode == "adaptive",
+    )
+
 
-    # file type router to separate xlsx
+def add_conversion_stage(pipeline: Pipeline) -> None:
+    # file type router to separate xlsx and the plain formats
     router = FileTypeRouter(
-        mime_types=["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"],
-        additional_mimetypes={"application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": ".xlsx"},
+        mime_types=["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", fast_path_mime_types],
+        additional_mimetypes={
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": ".xlsx",
+            "text/markdown": ".md",
+        },
     )
 
-    # converters for different xlsx/others
-    tika_converter = TikaDocumentConverter(tika_url=tika_url)
-    xlsx_converter = XLSXToDocument()
+    # converters for different xlsx/plain/others, timed per file extension
+    tika_converter = TimedConverter(TikaDocumentConverter(tika_url=tika_url), name="tika")
+    xlsx_converter = TimedConverter(
+        WindowedXLSXToDocument(window_rows=xlsx_window_rows, window_chars=xlsx_window_chars),
+        name="xlsx",
+    )
+    fast_converter = FastPathConverter(workers=fast_convert_workers)
 
+    # both text converters get the same clean-up, so a file's chunks do not depend on which one read it
     cleaner = DocumentCleaner(remove_repeated_substrings=True)
+    fast_cleaner = DocumentCleaner(remove_repeated_substrings=True)
     joiner = DocumentJoiner()
 
-    chunker = RecursiveDocumentSplitter(
-        split_length=1000,
+    pipeline.add_component("router", router)
+    pipeline.add_component("tika_converter", tika_converter)
+    pipeline.add_component("xlsx_converter", xlsx_converter)
+    pipeline.add_component("fast_converter", fast_converter)
+    pipeline.add_component("cleaner", cleaner)
+    pipeline.add_component("fast_cleaner", fast_cleaner)
+    pipeline.add_component("joiner", joiner)
+
+    # connect the router to converters
+    pipeline.connect("router.application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx_converter.sources")
+    pipeline.connect(f"router.{fast_path_mime_types}", "fast_converter.sources")
+    pipeline.connect("router.unclassified", "tika_converter.sources")
+    pipeline.connect("tika_converter.documents", "cleaner.documents")
+    pipeline.connect("cleaner.documents", "joiner.documents")
+    pipeline.connect("xlsx_converter.documents", "joiner.documents")
+    pipeline.connect("fast_converter.documents", "fast_cleaner.documents")
+    pipeline.connect("fast_cleaner.documents", "joiner.documents")
+
+
+def create_chunker() -> Union[RecursiveDocumentSplitter, TokenChunker]:
+    if chunker_name == "token":
+        # encodes each document once and splits on precomputed boundaries, without NLTK
+        return TokenChunker(split_length=chunk_split_length, split_overlap=0)
+    return RecursiveDocumentSplitter(
+        split_length=chunk_split_length,
         split_overlap=0,
         split_unit="token",
         separators=["\n\n", "sentence", "\n", " "],
@@ -88,86 +278,327 @@ def create_index_pipeline() -> Pipeline:
             "keep_white_spaces": True,
         },
     )
+
+
+def add_chunking_stage(pipeline: Pipeline, document_store: QdrantDocumentStore) -> None:
+    chunker = create_chunker()
     chunker.warm_up()
 
-    dense_doc_embedder = OllamaDocumentEmbedder(
+    # skips chunks that are already stored for the same file and finds the stale ones
+    incremental_filter = IncrementalChunkFilter(document_store=document_store)
+
+    # links or drops new chunks that nearly copy a stored chunk of any file
+    near_duplicate_filter = NearDuplicateFilter(document_store=document_store, mode=dedup_mode, threshold=dedup_threshold)
+
+    pipeline.add_component("chunker", chunker)
+    pipeline.add_component("incremental_filter", incremental_filter)
+    pipeline.add_component("near_duplicate_filter", near_duplicate_filter)
+    pipeline.connect("chunker.documents", "incremental_filter.documents")
+    pipeline.connect("incremental_filter.documents", "near_duplicate_filter.documents")
+    # a new chunk must not be linked to, or dropped as a copy of, a chunk it replaces
+    pipeline.connect("incremental_filter.stale_ids", "near_duplicate_filter.excluded_ids")
+
+
+def add_embedding_stage(pipeline: Pipeline) -> None:
+    # only chunks not embedded before reach Ollama, as concurrent requests of one batch each
+    dense_doc_embedder = CachedDocumentEmbedder(
+        # bulk requests, which give way to queries when Ollama is busy
+        ollama_scheduler.schedule(
+            OllamaDocumentEmbedder(
+                model=dense_embedder_model,
+                url=ollama_url,
+                batch_size=embed_batch_size,
+                progress_bar=False,
+            ),
+            BULK,
+        ),
         model=dense_embedder_model,
-        url=ollama_url,
+        cache=chunk_embedding_cache,
+        batch_size=embed_batch_size,
+        concurrency=embed_concurrency,
     )
     
-    sparse_doc_embedder = FastembedSparseDocumentEmbedder(
+    # warmed up once per process in the background. It is shared under its own key, yet loads the
+    # same model as the sparse query embedder: FastEmbed's backend factory caches backends by their
+    # parameters, which match, and the registry warms up one model at a time
+    sparse_backend = model_registry.share(
+        f"sparse-documents:{sparse_embedder_model}",
+        lambda: FastembedSparseDocumentEmbedder(
+            model=sparse_embedder_model,
+            local_files_only=False, # uses cached models (for offline)
+        ),
+    )
+    sparse_doc_embedder = CachedDocumentEmbedder(
+        sparse_backend,
         model=sparse_embedder_model,
-        local_files_only=False, # uses cached models (for offline)
+        cache=chunk_embedding_cache,
+        field="sparse_embedding",
+        batch_size=embed_batch_size,
     )
-    sparse_doc_embedder.warm_up()
 
+    pipeline.add_component("dense_embedder", dense_doc_embedder)
+    pipeline.add_component("sparse_embedder", sparse_doc_embedder)
+    pipeline.connect("dense_embedder.documents", "sparse_embedder.documents")
+
+
+def add_writing_stage(pipeline: Pipeline, document_store: QdrantDocumentStore) -> None:
     writer = DocumentWriter(
         document_store=document_store, 
         policy=DuplicatePolicy.OVERWRITE,
     )
 
+    # stale chunks are only deleted once the new ones are stored, so a failed batch keeps the old ones
+    stale_remover = StaleChunkRemover(document_store=document_store)
+
+    pipeline.add_component("writer", writer)
+    pipeline.add_component("stale_remover", stale_remover)
+    pipeline.connect("writer.documents_written", "stale_remover.documents_written")
+
+
+def create_index_pipeline(document_store: Optional[QdrantDocumentStore] = None) -> Pipeline:
+    document_store = document_store or create_document_store()
+
     indexing_pipeline = Pipeline()
-    indexing_pipeline.add_component("router", router)
-    indexing_pipeline.add_component("tika_converter", tika_converter)
-    indexing_pipeline.add_component("xlsx_converter", xlsx_converter)
-    indexing_pipeline.add_component("cleaner", cleaner)
-    indexing_pipeline.add_component("joiner", joiner)
-    indexing_pipeline.add_component("chunker", chunker)
-    indexing_pipeline.add_component("dense_embedder", dense_doc_embedder)
-    indexing_pipeline.add_component("sparse_embedder", sparse_doc_embedder)
-    indexing_pipeline.add_component("writer", writer)
+    add_conversion_stage(indexing_pipeline)
+    add_chunking_stage(indexing_pipeline, document_store)
+    add_embedding_stage(indexing_pipeline)
+    add_writing_stage(indexing_pipeline, document_store)
 
-    # connect the router to converters
-    indexing_pipeline.connect("router.application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx_converter.sources")
-    indexing_pipeline.connect("router.unclassified", "tika_converter.sources")
-    indexing_pipeline.connect("tika_converter.documents", "cleaner.documents")
-    
-    # continue pipeline
-    indexing_pipeline.connect("cleaner.documents", "joiner.documents")
-    indexing_pipeline.connect("xlsx_converter.documents", "joiner.documents")
+    # connect the stages
     indexing_pipeline.connect("joiner.documents", "chunker.documents")
-    indexing_pipeline.connect("chunker.documents", "dense_embedder.documents")
-    indexing_pipeline.connect("dense_embedder.documents", "sparse_embedder.documents")
+    indexing_pipeline.connect("near_duplicate_filter.documents", "dense_embedder.documents")
     indexing_pipeline.connect("sparse_embedder.documents", "writer.documents")
+    indexing_pipeline.connect("incremental_filter.stale_ids", "stale_remover.stale_ids")
 
     return indexing_pipeline
 
 
-def create_query_pipeline() -> Pipeline:
-    document_store = create_document_store()
+def create_staged_indexer(document_store: Optional[QdrantDocumentStore] = None) -> StagedIndexer:
+    """Same components as create_index_pipeline, split into stages that run concurrently on batches of files"""
+    document_store = document_store or create_document_store()
+
+    # every worker thread builds its own pipelines, since neither Pipeline.run nor the components are thread-safe
+
+    def conversion_stage() -> Callable[[IndexBatch], Iterator[IndexBatch]]:
+        conversion_pipeline = Pipeline()
+        add_conversion_stage(conversion_pipeline)
+        xlsx_converter = WindowedXLSXToDocument(window_rows=xlsx_window_rows, window_chars=xlsx_window_chars)
+
+        def stream_workbook(file_path: str, file_hash: str) -> Generator[IndexBatch, None, Optional[List[Document]]]:
+            """Yield a large workbook in parts; returns the windows of a smaller one, or None once streamed"""
+            stream = StreamedFile(file_name=os.path.basename(file_path), file_hash=file_hash)
+            windows, parts, seconds = [], 0, 0.0
+            start = time.perf_counter()
+            try:
+                for window in xlsx_converter.iter_documents(file_path):
+                    if len(windows) == xlsx_batch_windows:
+                        seconds += time.perf_counter() - start
+                        yield IndexBatch(
+                            file_paths=[file_path],
+                            file_hashes={stream.file_name: stream.pending_hash},
+                            documents=windows,
+                            stream=stream,
+                        )
+                        start = time.perf_counter()
+                        windows, parts = [], parts + 1
+                    windows.append(window)
+            finally:
+                conversion_stats.record("xlsx", ".xlsx", seconds + time.perf_counter() - start)
+            if not parts:
+                return windows
+            stream.parts = parts + 1
+            yield IndexBatch(
+                file_paths=[file_path],
+                file_hashes={stream.file_name: stream.pending_hash},
+                documents=windows,
+                stream=stream,
+            )
+            return None
+
+        def convert(batch: IndexBatch) -> Iterator[IndexBatch]:
+            # workbooks larger than one batch go ahead in parts of their own, everything else is converted together
+            file_paths, documents, sources, failed = [], [], [], set()
+            for file_path in batch.file_paths:
+                if not file_path.lower().endswith(".xlsx"):
+                    file_paths.append(file_path)
+                    sources.append(file_path)
+                    continue
+                try:
+                    windows = yield from stream_workbook(file_path, batch.file_hashes[os.path.basename(file_path)])
+                except Exception as error:
+                    logger.warning("Could not convert %s, skipping. Error: %s", file_path, error)
+                    failed.add(os.path.basename(file_path))
+                    windows = []
+                if windows is not None:
+                    file_paths.append(file_path)
+                    documents += windows
+            if sources:
+                converted = conversion_pipeline.run({"router": {"sources": sources}})["joiner"]["documents"]
+                # Tika and the fast path return a document for every file they could read, even an empty one
+                names = {document.meta.get("file_path") for document in converted}
+                failed.update(os.path.basename(path) for path in sources if os.path.basename(path) not in names)
+                documents = converted + documents
+            # a file that failed to convert must not lose its existing chunks, one that converted to nothing does
+            names = {os.path.basename(file_path) for file_path in file_paths}
+            if file_paths:
+                yield IndexBatch(
+                    file_paths=file_paths,
+                    file_hashes={
+                        name: file_hash for name, file_hash in batch.file_hashes.items() if name in names - failed
+                    },
+                    documents=documents,
+                )
+
+        return convert
+
+    def chunking_stage() -> Callable[[IndexBatch], IndexBatch]:
+        chunking_pipeline = Pipeline()
+        add_chunking_stage(chunking_pipeline, document_store)
+
+        def chunk(batch: IndexBatch) -> IndexBatch:
+            # stale_ids also feed the near-duplicate filter, so they are only returned when asked for
+            partial = batch.stream is not None
+            result = chunking_pipeline.run(
+                {
+                    "chunker": {"documents": batch.documents},
+                    "incremental_filter": {"file_hashes": batch.file_hashes, "partial": partial},
+                    # the file's previous chunks are only removed after its last part, so they must not match
+                    "near_duplicate_filter": {"replaced_files": batch.file_hashes if partial else None},
+                },
+                include_outputs_from={"incremental_filter"},
+            )
+            batch.documents = result["near_duplicate_filter"]["documents"]
+            batch.stale_ids = result["incremental_filter"]["stale_ids"]
+            batch.kept_ids = result["incremental_filter"]["kept_ids"]
+            batch.stats = {**result["incremental_filter"]["stats"], **result["near_duplicate_filter"]["stats"]}
+            return batch
+
+        return chunk
+
+    def embedding_stage() -> Callable[[IndexBatch], IndexBatch]:
+        embedding_pipeline = Pipeline()
+        add_embedding_stage(embedding_pipeline)
+
+        def embed(batch: IndexBatch) -> IndexBatch:
+            if batch.documents:
+                result = embedding_pipeline.run({"dense_embedder": {"documents": batch.documents}})
+                batch.documents = result["sparse_embedder"]["documents"]
+            return batch
+
+        return embed
+
+    def writing_stage() -> Callable[[IndexBatch], IndexBatch]:
+        writing_pipeline = Pipeline()
+        add_writing_stage(writing_pipeline, document_store)
+
+        def write(batch: IndexBatch) -> IndexBatch:
+            if batch.documents or batch.stale_ids:
+                writing_pipeline.run({
+                    "writer": {"documents": batch.documents},
+                    "stale_remover": {"stale_ids": batch.stale_ids},
+                })
+            file_hashes = batch.file_hashes
+            if batch.stream is not None:
+                stamp_file_hash(document_store, batch.kept_ids, batch.stream.pending_hash)
+                if not batch.stream.part_written():
+                    batch.documents, batch.kept_ids = [], []
+                    return batch
+                # the last part to be written finishes the file: chunks without the pending hash are stale
+                deleted = remove_outdated_chunks(document_store, batch.stream.file_name, batch.stream.pending_hash)
+                batch.stats["deleted"] = batch.stats.get("deleted", 0) + deleted
+                file_hashes = {batch.stream.file_name: batch.stream.file_hash}
+
+            for file_path, file_hash in file_hashes.items():
+                mark_file_indexed(document_store, file_path, file_hash)
+
+            client = get_qdrant_client(document_store)
+            sizes = {os.path.basename(file_path): os.path.getsize(file_path) for file_path in batch.file_paths}
+            entries = [
+                catalogue_entry(client, embedding_name, file_name, file_hash, sizes.get(file_name))
+                for file_name, file_hash in file_hashes.items()
+            ]
+            update_catalogue(client, index_files_name, entries)
+            batch.chunk_counts = {entry["file_name"]: entry["chunk_count"] for entry in entries}
+            batch.documents, batch.stale_ids, batch.kept_ids = [], [], []
+            return batch
+
+        return write
+
+    return StagedIndexer(
+        stages=[
+            Stage("convert", workers=index_stage_workers["convert"], factory=conversion_stage),
+            Stage("chunk", workers=index_stage_workers["chunk"], factory=chunking_stage),
+            Stage("embed", workers=index_stage_workers["embed"], factory=embedding_stage),
+            Stage("write", workers=index_stage_workers["write"], factory=writing_stage),
+        ],
+        queue_size=index_queue_size,
+    )
 
-    try:
-        script_dir = Path(__file__).parent
-        prompt_path = script_dir / "rag_prompt.txt"
-        prompt_template = [ChatMessage.from_user(prompt_path.read_text(encoding="utf-8"))]
-    except FileNotFoundError:
-        raise RuntimeError("Prompt template file 'rag_prompt.txt' not found")
 
-    prompt_builder = ChatPromptBuilder(template=prompt_template, required_variables=["context", "query"])
+def create_batcher(name: str, function: Callable[[list], list], concurrency: int = 1) -> Optional[MicroBatcher]:
+    if not micro_batch_enabled:
+        return None
+    return MicroBatcher(
+        name,
+        function,
+        max_batch_size=micro_batch_max_size,
+        window=micro_batch_window,
+        concurrency=concurrency,
+    )
+
 
-    dense_query_embedder = OllamaTextEmbedder(
+def add_retrieval_components(pipeline: Union[Pipeline, AsyncPipeline], document_store: QdrantDocumentStore) -> None:
+    dense_text_embedder = ollama_scheduler.schedule(
+        OllamaTextEmbedder(
+            model=dense_embedder_model,
+            url=ollama_url,
+        ),
+        INTERACTIVE,
+    )
+    dense_query_embedder = CachedTextEmbedder(
+        dense_text_embedder,
         model=dense_embedder_model,
-        url=ollama_url,
+        cache=query_embedding_cache,
+        # two batches in flight, so a slow Ollama request does not hold back the next batch
+        batcher=create_batcher("dense_query_embedder", ollama_embed_batch(dense_text_embedder), concurrency=2),
     )
 
-    sparse_query_embedder = FastembedSparseTextEmbedder(
+    sparse_text_embedder = model_registry.share(
+        f"sparse-queries:{sparse_embedder_model}",
+        lambda: FastembedSparseTextEmbedder(
+            model=sparse_embedder_model,
+            local_files_only=False, # uses cached models (for offline)
+        ),
+    )
+
+    sparse_query_embedder = CachedTextEmbedder(
+        sparse_text_embedder,
         model=sparse_embedder_model,
-        local_files_only=False, # uses cached models (for offline)
+        cache=query_embedding_cache,
+        batcher=create_batcher("sparse_query_embedder", fastembed_sparse_embed_batch(sparse_text_embedder)),
     )
-    sparse_query_embedder.warm_up()
     
-    retriever = QdrantHybridRetriever(
-        document_store=document_store,
-        top_k=10,
-        score_threshold=0.5,
+    retriever = create_retriever(document_store)
+
+    # one cross-encoder per process, shared by every query pipeline
+    cross_encoder = model_registry.share(
+        f"ranker:{ranker_model}",
+        lambda: FastembedRanker(
+            model_name=ranker_model,
+            top_k=5,
+            local_files_only=False, # uses cached models (for offline)
+        ),
     )
 
-    ranker = FastembedRanker(
-        model_name=ranker_model,
+    ranker = CachedRanker(
+        cross_encoder,
+        model=ranker_model,
+        cache=rerank_score_cache,
         top_k=5,
-        local_files_only=False, # uses cached models (for offline)
+        mode=rerank_mode,
+        band=rerank_band,
+        batcher=create_batcher("ranker", fastembed_rank_batch(cross_encoder)),
     )
-    ranker.warm_up()
 
     # reranks based on filename relevance to query
     meta_ranker = MetaFieldRanker(
@@ -176,32 +607,114 @@ def create_query_pipeline() -> Pipeline:
         top_k=3,
     )
 
+    pipeline.add_component("dense_query_embedder", dense_query_embedder)
+    pipeline.add_component("sparse_query_embedder", sparse_query_embedder)
+    pipeline.add_component("retriever", retriever)
+    pipeline.add_component("ranker", ranker)
+    pipeline.add_component("meta_ranker", meta_ranker)
+
+    pipeline.connect("dense_query_embedder.embedding", "retriever.query_embedding")
+    pipeline.connect("sparse_query_embedder.sparse_embedding", "retriever.query_sparse_embedding")
+    pipeline.connect("dense_query_embedder.embedding", "ranker.query_embedding")
+    if diversity_filter_enabled:
+        # near-copies of a passage would otherwise take several reranker and prompt slots
+        pipeline.add_component("diversity_filter", DiversityFilter(threshold=diversity_threshold))
+        pipeline.connect("retriever.documents", "diversity_filter.documents")
+        pipeline.connect("diversity_filter.documents", "ranker.documents")
+    else:
+        pipeline.connect("retriever.documents", "ranker.documents")
+    pipeline.connect("ranker.documents", "meta_ranker.documents")
+
+
+def add_generation_components(pipeline: Union[Pipeline, AsyncPipeline]) -> None:
+    try:
+        script_dir = Path(__file__).parent
+        prompt_path = script_dir / "rag_prompt.txt"
+        prompt_text = prompt_path.read_text(encoding="utf-8")
+        prompt_template = [ChatMessage.from_user(prompt_text)]
+    except FileNotFoundError:
+        raise RuntimeError("Prompt template file 'rag_prompt.txt' not found")
+
+    prompt_builder = ChatPromptBuilder(template=prompt_template, required_variables=["context", "query"])
+
+    # trims the ranked documents to what fits in the generator's context window
+    context_packer = ContextPacker(
+        context_window=generator_context_length,
+        answer_tokens=context_answer_tokens,
+        template=prompt_text,
+    )
+
     generator = OllamaChatGenerator(
         model=generator_model,
         url=ollama_url,
         timeout=300, # 5 minute timeout since inference is slow
         generation_kwargs={
-            "num_predict": -1,
+            # the answer budget the context packer keeps free, so a long answer cannot overflow num_ctx
+            "num_predict": context_answer_tokens,
             "temperature": 0.5,
-            "n_ctx": 1024,
+            "num_ctx": generator_context_length,
         },
         # think=True, # enable only if model supports thinking (e.g. deepseek-r1) 
     )
+    ollama_scheduler.schedule(generator, INTERACTIVE)
 
+    pipeline.add_component("context_packer", context_packer)
+    pipeline.add_component("prompt_builder", prompt_builder)
+    pipeline.add_component("generator", generator)
+
+    pipeline.connect("context_packer.documents", "prompt_builder.context")
+    pipeline.connect("prompt_builder.prompt", "generator.messages")
+
+
+def add_query_components(pipeline: Union[Pipeline, AsyncPipeline], document_store: QdrantDocumentStore) -> None:
+    add_retrieval_components(pipeline, document_store)
+    add_generation_components(pipeline)
+    pipeline.connect("meta_ranker.documents", "context_packer.documents")
+
+
+def retrieval_pipeline_inputs(query: str, filters: Optional[models.Filter] = None) -> dict:
+    inputs = {
+        "dense_query_embedder": {"text": query},
+        "sparse_query_embedder": {"text": query},
+        "ranker": {"query": query},
+    }
+    if filters is not None:
+        inputs["retriever"] = {"filters": filters}
+    return inputs
+
+
+def generation_pipeline_inputs(query: str, documents: Optional[List[Document]] = None) -> dict:
+    packer_inputs = {"query": query} if documents is None else {"query": query, "documents": documents}
+    return {
+        "context_packer": packer_inputs,
+        "prompt_builder": {"query": query},
+    }
+
+
+def query_pipeline_inputs(query: str) -> dict:
+    return {**retrieval_pipeline_inputs(query), **generation_pipeline_inputs(query)}
+
+
+def create_query_pipeline(document_store: Optional[QdrantDocumentStore] = None) -> Pipeline:
     query_pipeline = Pipeline()
-    query_pipeline.add_component("dense_query_embedder", dense_query_embedder)
-    query_pipeline.add_component("sparse_query_embedder", sparse_query_embedder)
-    query_pipeline.add_component("retriever", retriever)
-    query_pipeline.add_component("ranker", ranker)
-    query_pipeline.add_component("meta_ranker", meta_ranker)
-    query_pipeline.add_component("prompt_builder", prompt_builder)
-    query_pipeline.add_component("generator", generator)
-
-    query_pipeline.connect("dense_query_embedder.embedding", "retriever.query_embedding")
-    query_pipeline.connect("sparse_query_embedder.sparse_embedding", "retriever.query_sparse_embedding")
-    query_pipeline.connect("retriever.documents", "ranker.documents")
-    query_pipeline.connect("ranker.documents", "meta_ranker.documents")
-    query_pipeline.connect("meta_ranker.documents", "prompt_builder.context")
-    query_pipeline.connect("prompt_builder.prompt", "generator.messages")
+    add_query_components(query_pipeline, document_store or create_document_store())
+    return query_pipeline
+
 
+def create_async_query_pipeline(document_store: Optional[QdrantDocumentStore] = None) -> AsyncPipeline:
+    # components run as soon as their inputs are ready, so the dense and sparse query embedders run concurrently
+    query_pipeline = AsyncPipeline()
+    add_query_components(query_pipeline, document_store or create_document_store())
     return query_pipeline
+
+
+def create_async_retrieval_pipeline(document_store: Optional[QdrantDocumentStore] = None) -> AsyncPipeline:
+    retrieval_pipeline = AsyncPipeline()
+    add_retrieval_components(retrieval_pipeline, document_store or create_document_store())
+    return retrieval_pipeline
+
+
+def create_async_generation_pipeline() -> AsyncPipeline:
+    generation_pipeline = AsyncPipeline()
+    add_generation_components(generation_pipeline)
+    return generation_pipeline
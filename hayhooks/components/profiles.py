@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+@dataclass(frozen=True)
+class RetrievalProfile:
+    """
+    Index and retriever settings traded off between search latency and recall.
+
+    `hnsw_m` and `hnsw_ef_construct` shape the dense HNSW graph; Qdrant also searches with
+    ef = ef_construct, since the hybrid retriever sets no per-query search parameters. With
+    `quantization`, int8 copies of the dense vectors are kept in RAM for the graph search and
+    the candidates are rescored with the originals, which stay on disk when `on_disk` is set.
+    """
+
+    name: str
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    quantization: bool = False
+    quantile: float = 0.99
+    on_disk: bool = True
+    top_k: int = 10
+    score_threshold: Optional[float] = 0.5
+
+    def hnsw_config(self) -> Dict[str, Any]:
+        return {"m": self.hnsw_m, "ef_construct": self.hnsw_ef_construct}
+
+    def quantization_config(self) -> Optional[Dict[str, Any]]:
+        if not self.quantization:
+            return None
+        return {"scalar": {"type": "int8", "quantile": self.quantile, "always_ram": True}}
+
+
+PROFILES = {
+    # quantized vectors in RAM, a narrow search beam and fewer candidates for the reranker
+    "latency": RetrievalProfile(
+        name="latency",
+        hnsw_m=16,
+        hnsw_ef_construct=64,
+        quantization=True,
+        on_disk=True,
+        top_k=8,
+        score_threshold=0.5,
+    ),
+    # the settings the app has always used
+    "balanced": RetrievalProfile(name="balanced"),
+    # a denser graph and wider beam, full-precision vectors in RAM, and more and weaker candidates
+    "recall": RetrievalProfile(
+        name="recall",
+        hnsw_m=32,
+        hnsw_ef_construct=256,
+        quantization=False,
+        on_disk=False,
+        top_k=20,
+        score_threshold=0.3,
+    ),
+}
+
+
+def get_profile(name: str) -> RetrievalProfile:
+    if name not in PROFILES:
+        raise ValueError(f"Unknown retrieval profile '{name}', expected one of {', '.join(PROFILES)}")
+    return PROFILES[name]
@@ -0,0 +1,202 @@
+import threading
+import time
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from haystack import Document, component
+
+from components.batching import MicroBatcher
+from components.caching import EmbeddingCache, normalize_text
+from components.incremental import hash_content
+
+
+class RerankStats:
+    """Counters of how queries were reranked, shared by every CachedRanker of the process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {
+            "queries": 0,
+            "skipped": 0, # retrieval scores separated clearly, nothing reranked
+            "partial": 0, # only the uncertain middle band was reranked
+            "full": 0,
+            "documents": 0,
+            "documents_scored": 0,
+            "score_cache_hits": 0,
+        }
+        self._seconds_scoring = 0.0
+        self._seconds_saved = 0.0
+        self._seconds_per_document: Optional[float] = None
+
+    def record(self, mode: str, documents: int, scored: int, cache_hits: int, seconds: float) -> None:
+        with self._lock:
+            self._counters["queries"] += 1
+            self._counters[mode] += 1
+            self._counters["documents"] += documents
+            self._counters["documents_scored"] += scored
+            self._counters["score_cache_hits"] += cache_hits
+            self._seconds_scoring += seconds
+            if scored:
+                # moving average of the cross-encoder cost, used to estimate the time saved
+                per_document = seconds / scored
+                self._seconds_per_document = (
+                    per_document if self._seconds_per_document is None
+                    else 0.9 * self._seconds_per_document + 0.1 * per_document
+                )
+            if self._seconds_per_document is not None:
+                self._seconds_saved += (documents - scored) * self._seconds_per_document
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "seconds_scoring": round(self._seconds_scoring, 3),
+                "estimated_seconds_saved": round(self._seconds_saved, 3),
+            }
+
+
+rerank_stats = RerankStats()
+
+
+@component
+class CachedRanker:
+    """
+    Wraps a cross-encoder ranker, caching its scores per query and document content.
+
+    In "adaptive" mode, documents whose dense similarity to `query_embedding` already places them
+    clearly inside or outside the top_k are not reranked; only the uncertain band around the
+    cut-off is scored. The hybrid retrieval scores cannot be used for this, as fused scores only
+    reflect ranks. Adaptive results keep the retrieval order, reordered only inside the band, and
+    take the retrieval scores of their positions, so the output stays on one scale. With a
+    `batcher`, the documents of concurrent queries are scored in one cross-encoder pass.
+    """
+
+    def __init__(
+        self,
+        ranker: Any,
+        model: str,
+        cache: EmbeddingCache,
+        top_k: int = 5,
+        mode: str = "always",
+        band: float = 0.1,
+        stats: RerankStats = rerank_stats,
+        batcher: Optional[MicroBatcher] = None,
+    ):
+        if mode not in ("always", "adaptive"):
+            raise ValueError(f"Unknown rerank mode '{mode}', expected 'always' or 'adaptive'")
+        self.ranker = ranker
+        self.model = model
+        self.cache = cache
+        self.top_k = top_k
+        self.mode = mode
+        self.band = band
+        self.stats = stats
+        self.batcher = batcher
+
+    def warm_up(self) -> None:
+        if hasattr(self.ranker, "warm_up"):
+            self.ranker.warm_up()
+
+    @component.output_types(documents=List[Document])
+    def run(
+        self,
+        query: str,
+        documents: List[Document],
+        top_k: Optional[int] = None,
+        query_embedding: Optional[List[float]] = None,
+    ) -> Dict[str, Any]:
+        top_k = top_k or self.top_k
+        if not documents:
+            return {"documents": []}
+
+        if self.mode == "adaptive":
+            confident, uncertain = self._split(documents, top_k, query_embedding)
+            if uncertain is not None:
+                return {"documents": self._rerank_band(query, documents, confident, uncertain, top_k)}
+
+        start = time.perf_counter()
+        scores, scored, cache_hits = self._scores(query, documents)
+        reranked = sorted(
+            (replace(document, score=scores[document.id], embedding=None) for document in documents),
+            key=lambda document: document.score,
+            reverse=True,
+        )
+        self.stats.record("full", len(documents), scored, cache_hits, time.perf_counter() - start if scored else 0.0)
+        return {"documents": reranked[:top_k]}
+
+    def _rerank_band(
+        self, query: str, documents: List[Document], confident: List[Document], uncertain: List[Document], top_k: int
+    ) -> List[Document]:
+        """Confident documents in retrieval order, then the band in cross-encoder order"""
+        retrieval_order = {document.id: index for index, document in enumerate(documents)}
+        confident = sorted(confident, key=lambda document: retrieval_order[document.id])
+        band = sorted(uncertain, key=lambda document: retrieval_order[document.id])
+
+        # the order is settled when the band fits in the slots left after the confident documents
+        if len(band) <= top_k - len(confident):
+            self.stats.record("skipped", len(documents), 0, 0, 0.0)
+        else:
+            start = time.perf_counter()
+            scores, scored, cache_hits = self._scores(query, band)
+            band = sorted(band, key=lambda document: scores[document.id], reverse=True)
+            self.stats.record("partial", len(documents), scored, cache_hits, time.perf_counter() - start if scored else 0.0)
+
+        ranked = (confident + band)[:top_k]
+        positions = sorted((document.score for document in documents), reverse=True)
+        return [replace(document, score=score, embedding=None) for document, score in zip(ranked, positions)]
+
+    def _split(
+        self, documents: List[Document], top_k: int, query_embedding: Optional[List[float]]
+    ) -> Tuple[List[Document], Optional[List[Document]]]:
+        """Separate documents clearly inside the top_k by dense similarity from the band around its cut-off"""
+        if len(documents) <= top_k:
+            return list(documents), []
+        if query_embedding is None or any(
+            document.embedding is None or document.score is None for document in documents
+        ):
+            # without similarities every document is reranked
+            return [], None
+
+        embeddings = np.asarray([document.embedding for document in documents], dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query)
+        similarities = embeddings @ query / np.where(norms > 0, norms, 1.0)
+
+        ranked = sorted(zip(similarities.tolist(), documents), key=lambda pair: pair[0], reverse=True)
+        cut_off = (ranked[top_k - 1][0] + ranked[top_k][0]) / 2
+        margin = self.band * abs(ranked[0][0])
+        confident = [document for similarity, document in ranked if similarity > cut_off + margin]
+        uncertain = [document for similarity, document in ranked if abs(similarity - cut_off) <= margin]
+        return confident, uncertain
+
+    def _scores(self, query: str, documents: List[Document]) -> Tuple[Dict[str, float], int, int]:
+        """Cross-encoder score of every document, scoring only those not cached yet"""
+        normalized = normalize_text(query)
+        keys = {}
+        for document in documents:
+            content_hash = document.meta.get("content_hash") or hash_content(document.content or "")
+            keys[document.id] = self.cache.make_key(self.model, normalized, document.id, content_hash)
+
+        scores, missing = {}, []
+        for document in documents:
+            score = self.cache.get(keys[document.id])
+            if score is None:
+                missing.append(document)
+            else:
+                scores[document.id] = score
+
+        if missing and self.batcher:
+            for document, score in zip(missing, self.batcher((query, missing))):
+                scores[document.id] = score
+                self.cache.put(keys[document.id], score)
+        elif missing:
+            result = self.ranker.run(query=query, documents=missing, top_k=len(missing))
+            for document in result["documents"]:
+                scores[document.id] = document.score
+                self.cache.put(keys[document.id], document.score)
+            # the wrapped ranker may drop documents under its score threshold
+            for document in missing:
+                scores.setdefault(document.id, float("-inf"))
+
+        return scores, len(missing), len(documents) - len(missing)
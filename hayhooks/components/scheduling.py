@@ -0,0 +1,305 @@
+import asyncio
+import contextlib
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional
+
+from components.metrics import LATENCY_BUCKETS
+
+INTERACTIVE = "interactive" # query embedding and generation, someone is waiting for them
+BULK = "bulk" # document embedding while indexing
+CLASSES = (INTERACTIVE, BULK)
+
+
+class OllamaOverloaded(RuntimeError):
+    """Raised when a request to Ollama is shed instead of queued, or waited too long for a slot"""
+
+
+class _Waiter:
+    __slots__ = ("kind", "enqueued", "event", "future", "loop", "granted")
+
+    def __init__(self, kind: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.kind = kind
+        self.enqueued = time.perf_counter()
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+
+    def wake(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class OllamaScheduler:
+    """
+    Admission control in front of Ollama, shared by every Ollama-backed component of the process.
+
+    At most `max_concurrency` requests run at once, and at most `limits[class]` of each class.
+    Keeping the bulk limit below the total leaves slots free for interactive requests, which are
+    also served first whenever a slot frees up. Requests beyond a class's `queue_limits` are shed
+    right away, and queued requests give up after `queue_timeouts` seconds (None waits forever).
+    Both raise OllamaOverloaded.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        limits: Optional[Dict[str, int]] = None,
+        queue_limits: Optional[Dict[str, int]] = None,
+        queue_timeouts: Optional[Dict[str, Optional[float]]] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.limits = {INTERACTIVE: max_concurrency, BULK: max(1, max_concurrency - 1), **(limits or {})}
+        self.queue_limits = {INTERACTIVE: 32, BULK: 256, **(queue_limits or {})}
+        self.queue_timeouts = {INTERACTIVE: 120.0, BULK: None, **(queue_timeouts or {})}
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[_Waiter]] = {kind: deque() for kind in CLASSES}
+        self._active = {kind: 0 for kind in CLASSES}
+        self._counters = {kind: {"admitted": 0, "rejected": 0, "timed_out": 0} for kind in CLASSES}
+        self._wait_buckets = {kind: [0] * (len(LATENCY_BUCKETS) + 1) for kind in CLASSES}
+        self._wait_seconds = {kind: 0.0 for kind in CLASSES}
+
+    # ADMISSION
+
+    def _can_start(self, kind: str) -> bool:
+        return sum(self._active.values()) < self.max_concurrency and self._active[kind] < self.limits[kind]
+
+    def _admit(self, waiter: _Waiter) -> None:
+        waiter.granted = True
+        self._active[waiter.kind] += 1
+        self._counters[waiter.kind]["admitted"] += 1
+        waited = time.perf_counter() - waiter.enqueued
+        self._wait_buckets[waiter.kind][bisect_left(LATENCY_BUCKETS, waited)] += 1
+        self._wait_seconds[waiter.kind] += waited
+
+    def _enqueue(self, waiter: _Waiter) -> bool:
+        """Admit the waiter right away if it can start, else queue it; returns whether it was admitted"""
+        with self._lock:
+            # requests never overtake queued ones of their class, and bulk ones never overtake interactive ones
+            held_back = self._queues[waiter.kind] or (waiter.kind == BULK and self._queues[INTERACTIVE])
+            if not held_back and self._can_start(waiter.kind):
+                self._admit(waiter)
+                return True
+            if len(self._queues[waiter.kind]) >= self.queue_limits[waiter.kind]:
+                self._counters[waiter.kind]["rejected"] += 1
+                raise OllamaOverloaded(
+                    f"Ollama is overloaded: {len(self._queues[waiter.kind])} {waiter.kind} requests are already "
+                    "queued, try again later"
+                )
+            self._queues[waiter.kind].append(waiter)
+            return False
+
+    def _dispatch(self) -> None:
+        # called with the lock held whenever a slot frees up; interactive requests go first
+        for kind in CLASSES:
+            queue = self._queues[kind]
+            while queue and self._can_start(kind):
+                waiter = queue.popleft()
+                self._admit(waiter)
+                waiter.wake()
+
+    def _give_up(self, waiter: _Waiter, timed_out: bool) -> bool:
+        """Take a waiter out of its queue; returns False when it was admitted in the meantime"""
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._queues[waiter.kind].remove(waiter)
+            if timed_out:
+                self._counters[waiter.kind]["timed_out"] += 1
+            # a bulk request may have been held back behind this one
+            self._dispatch()
+            return True
+
+    def _timeout_error(self, kind: str) -> OllamaOverloaded:
+        return OllamaOverloaded(
+            f"Ollama is overloaded: {kind} request waited more than {self.queue_timeouts[kind]:g}s for a slot"
+        )
+
+    def acquire(self, kind: str) -> None:
+        waiter = _Waiter(kind)
+        if self._enqueue(waiter):
+            return
+        if not waiter.event.wait(self.queue_timeouts[kind]) and self._give_up(waiter, timed_out=True):
+            raise self._timeout_error(kind)
+
+    async def acquire_async(self, kind: str) -> None:
+        waiter = _Waiter(kind, loop=asyncio.get_running_loop())
+        if self._enqueue(waiter):
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeouts[kind])
+        except asyncio.TimeoutError:
+            if self._give_up(waiter, timed_out=True):
+                raise self._timeout_error(kind)
+        except asyncio.CancelledError:
+            if not self._give_up(waiter, timed_out=False):
+                self.release(kind)
+            raise
+
+    def release(self, kind: str) -> None:
+        with self._lock:
+            self._active[kind] -= 1
+            self._dispatch()
+
+    @contextlib.contextmanager
+    def slot(self, kind: str) -> Iterator[None]:
+        self.acquire(kind)
+        try:
+            yield
+        finally:
+            self.release(kind)
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self, kind: str) -> AsyncIterator[None]:
+        await self.acquire_async(kind)
+        try:
+            yield
+        finally:
+            self.release(kind)
+
+    # COMPONENTS
+
+    def schedule(self, component: Any, kind: str) -> Any:
+        """Route an Ollama component's requests, sync and async, through this scheduler as `kind`"""
+        component._client = _ScheduledClient(component._client, self, kind)
+        component._async_client = _ScheduledAsyncClient(component._async_client, self, kind)
+        return component
+
+    # METRICS
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                kind: {
+                    "active": self._active[kind],
+                    "queued": len(self._queues[kind]),
+                    "limit": self.limits[kind],
+                    **self._counters[kind],
+                    "wait_seconds": round(self._wait_seconds[kind], 3),
+                }
+                for kind in CLASSES
+            }
+
+    def render(self) -> str:
+        """Queue depth, running requests and wait time per class in the Prometheus text format"""
+        lines = []
+        with self._lock:
+            lines += [
+                "# HELP ollama_scheduler_queued Requests waiting for an Ollama slot.",
+                "# TYPE ollama_scheduler_queued gauge",
+            ]
+            lines += [f'ollama_scheduler_queued{{class="{kind}"}} {len(self._queues[kind])}' for kind in CLASSES]
+            lines += [
+                "# HELP ollama_scheduler_active Requests currently running against Ollama.",
+                "# TYPE ollama_scheduler_active gauge",
+            ]
+            lines += [f'ollama_scheduler_active{{class="{kind}"}} {self._active[kind]}' for kind in CLASSES]
+            lines += [
+                "# HELP ollama_scheduler_requests_total Requests admitted, shed or timed out while queued.",
+                "# TYPE ollama_scheduler_requests_total counter",
+            ]
+            for kind in CLASSES:
+                for outcome, count in self._counters[kind].items():
+                    lines.append(f'ollama_scheduler_requests_total{{class="{kind}",outcome="{outcome}"}} {count}')
+            lines += [
+                "# HELP ollama_scheduler_wait_seconds Time admitted requests waited for a slot.",
+                "# TYPE ollama_scheduler_wait_seconds histogram",
+            ]
+            for kind in CLASSES:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), self._wait_buckets[kind]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'ollama_scheduler_wait_seconds_bucket{{class="{kind}",le="{le}"}} {cumulative}')
+                lines.append(f'ollama_scheduler_wait_seconds_sum{{class="{kind}"}} {self._wait_seconds[kind]:.6f}')
+                lines.append(f'ollama_scheduler_wait_seconds_count{{class="{kind}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+
+class _ScheduledClient:
+    """ollama.Client whose embed and chat calls hold a scheduler slot, for the whole stream when streaming"""
+
+    def __init__(self, client: Any, scheduler: OllamaScheduler, kind: str):
+        self._client = client
+        self._scheduler = scheduler
+        self._kind = kind
+
+    def embed(self, *args, **kwargs) -> Any:
+        with self._scheduler.slot(self._kind):
+            return self._client.embed(*args, **kwargs)
+
+    def chat(self, *args, **kwargs) -> Any:
+        if not kwargs.get("stream"):
+            with self._scheduler.slot(self._kind):
+                return self._client.chat(*args, **kwargs)
+        return self._stream(self._client.chat(*args, **kwargs))
+
+    def _stream(self, chunks: Iterator[Any]) -> Iterator[Any]:
+        # the request is only sent once the stream is iterated
+        with self._scheduler.slot(self._kind):
+            yield from chunks
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+class _ScheduledAsyncClient:
+    """ollama.AsyncClient counterpart of _ScheduledClient"""
+
+    def __init__(self, client: Any, scheduler: OllamaScheduler, kind: str):
+        self._client = client
+        self._scheduler = scheduler
+        self._kind = kind
+
+    async def embed(self, *args, **kwargs) -> Any:
+        async with self._scheduler.slot_async(self._kind):
+            return await self._client.embed(*args, **kwargs)
+
+    async def chat(self, *args, **kwargs) -> Any:
+        if not kwargs.get("stream"):
+            async with self._scheduler.slot_async(self._kind):
+                return await self._client.chat(*args, **kwargs)
+        return self._stream(*args, **kwargs)
+
+    async def _stream(self, *args, **kwargs) -> AsyncIterator[Any]:
+        # the slot is only taken once the stream is iterated, and a stream closed early hands it back
+        async with self._scheduler.slot_async(self._kind):
+            async for chunk in await self._client.chat(*args, **kwargs):
+                yield chunk
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+def _timeout(name: str, default: str) -> Optional[float]:
+    seconds = float(os.getenv(name, default))
+    return seconds if seconds > 0 else None
+
+
+# one scheduler per process; OLLAMA_MAX_CONCURRENCY should match the server's OLLAMA_NUM_PARALLEL
+ollama_scheduler = OllamaScheduler(
+    max_concurrency=int(os.getenv("OLLAMA_MAX_CONCURRENCY", "4")),
+    limits={
+        INTERACTIVE: int(os.getenv("OLLAMA_INTERACTIVE_CONCURRENCY", "4")),
+        BULK: int(os.getenv("OLLAMA_BULK_CONCURRENCY", "3")),
+    },
+    queue_limits={
+        INTERACTIVE: int(os.getenv("OLLAMA_INTERACTIVE_QUEUE", "32")),
+        BULK: int(os.getenv("OLLAMA_BULK_QUEUE", "256")),
+    },
+    queue_timeouts={
+        INTERACTIVE: _timeout("OLLAMA_INTERACTIVE_QUEUE_TIMEOUT", "120"),
+        BULK: _timeout("OLLAMA_BULK_QUEUE_TIMEOUT", "0"), # 0 waits as long as it takes
+    },
+)
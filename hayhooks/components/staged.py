@@ -0,0 +1,197 @@
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from haystack import Document
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+StageRun = Callable[["IndexBatch"], Union["IndexBatch", Iterator["IndexBatch"]]]
+
+
+@dataclass
+class StreamedFile:
+    """A file converted and indexed as several batches, finished once every one of them is written"""
+
+    file_name: str
+    file_hash: str
+    parts: Optional[int] = None # known once the last part is converted
+    written: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def pending_hash(self) -> str:
+        # carried by the file's chunks until every part is written, so a half-written file is never taken as indexed
+        return f"{self.file_hash}:partial"
+
+    @property
+    def done(self) -> bool:
+        return self.parts is not None and self.written == self.parts
+
+    def part_written(self) -> bool:
+        """Count a written part; True for the one that completes the file"""
+        with self._lock:
+            self.written += 1
+            return self.done
+
+
+@dataclass
+class IndexBatch:
+    """A group of files travelling through the index stages together"""
+
+    file_paths: List[str]
+    file_hashes: Dict[str, str] = field(default_factory=dict)
+    documents: List[Document] = field(default_factory=list)
+    stale_ids: List[str] = field(default_factory=list) # chunks replaced by this batch, deleted once it is written
+    stats: Dict[str, int] = field(default_factory=dict)
+    stream: Optional[StreamedFile] = None # set when the batch is one part of a larger file
+    kept_ids: List[str] = field(default_factory=list) # stored chunks a part left unchanged, stamped when it is written
+    chunk_counts: Dict[str, int] = field(default_factory=dict) # chunks stored per file, once the file is written
+
+
+@dataclass
+class Stage:
+    """
+    One step of the assembly line, run by `workers` threads.
+
+    `run` returns the processed batch, or yields several batches, which reach the next stage as
+    they are produced. A stage whose components are not safe to share between threads gives a `factory` instead of
+    `run`: it is called for every worker thread, and returns that thread's own run function.
+    """
+
+    name: str
+    run: Optional[StageRun] = None
+    workers: int = 1
+    factory: Optional[Callable[[], StageRun]] = None
+
+
+class StagedIndexer:
+    """
+    Runs index stages as an assembly line over batches of files.
+
+    Each stage has its own worker threads and hands batches to the next stage through a bounded
+    queue, so converting batch N+1 overlaps with embedding batch N and writing batch N-1, and a
+    slow stage applies backpressure instead of letting finished batches pile up in memory.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 2):
+        self.stages = stages
+        self.queue_size = queue_size
+        # run functions built by the stage factories, handed to one worker thread at a time; built up
+        # front for one run, and added to when concurrent runs need more
+        self._idle: Dict[str, List[StageRun]] = {
+            stage.name: [stage.factory() for _ in range(stage.workers)] if stage.factory else []
+            for stage in stages
+        }
+        self._idle_lock = threading.Lock()
+
+    def _acquire(self, stage: Stage) -> StageRun:
+        if stage.factory is None:
+            return stage.run
+        with self._idle_lock:
+            if self._idle[stage.name]:
+                return self._idle[stage.name].pop()
+        return stage.factory()
+
+    def _release(self, stage: Stage, run: StageRun) -> None:
+        if stage.factory is not None:
+            with self._idle_lock:
+                self._idle[stage.name].append(run)
+
+    def run(self, batches: List[IndexBatch], on_batch_done: Optional[Callable[[str, IndexBatch], None]] = None) -> Dict[str, Any]:
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        lock = threading.Lock()
+        remaining = {stage.name: stage.workers for stage in self.stages}
+        busy_seconds = {stage.name: 0.0 for stage in self.stages}
+        completed, failed = [], []
+
+        def work(index: int, stage: Stage) -> None:
+            inbox, outbox = queues[index], queues[index + 1]
+            run, setup_error = None, None
+            try:
+                try:
+                    run = self._acquire(stage)
+                except Exception as error:
+                    # the worker still drains its inbox, failing every batch, so the stages before it never block
+                    logger.exception("Could not set up stage '%s'", stage.name)
+                    setup_error = error
+                while True:
+                    batch = inbox.get()
+                    if batch is _DONE:
+                        break
+                    start = time.perf_counter()
+                    try:
+                        if setup_error is not None:
+                            raise setup_error
+                        output = run(batch)
+                        # a generator is only resumed once the next stage took its previous batch
+                        for done in [output] if isinstance(output, IndexBatch) else output:
+                            if on_batch_done:
+                                on_batch_done(stage.name, done)
+                            with lock:
+                                busy_seconds[stage.name] += time.perf_counter() - start
+                            outbox.put(done)
+                            start = time.perf_counter()
+                    except Exception as error:
+                        logger.exception("Stage '%s' failed for %s", stage.name, batch.file_paths)
+                        with lock:
+                            failed.append({"files": batch.file_paths, "stage": stage.name, "error": str(error)})
+                    finally:
+                        with lock:
+                            busy_seconds[stage.name] += time.perf_counter() - start
+            finally:
+                if run is not None:
+                    self._release(stage, run)
+                # the last worker of a stage tells every worker of the next stage to stop, even if it died
+                with lock:
+                    remaining[stage.name] -= 1
+                    last = remaining[stage.name] == 0
+                if last:
+                    next_workers = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+                    for _ in range(next_workers):
+                        outbox.put(_DONE)
+
+        threads = [
+            threading.Thread(target=work, args=(index, stage), name=f"index-{stage.name}-{worker}", daemon=True)
+            for index, stage in enumerate(self.stages)
+            for worker in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        def feed() -> None:
+            for batch in batches:
+                queues[0].put(batch)
+            for _ in range(self.stages[0].workers):
+                queues[0].put(_DONE)
+
+        feeder = threading.Thread(target=feed, name="index-feed", daemon=True)
+        feeder.start()
+
+        while True:
+            batch = queues[-1].get()
+            if batch is _DONE:
+                break
+            completed.append(batch)
+
+        feeder.join()
+        for thread in threads:
+            thread.join()
+
+        return {"completed": completed, "failed": failed, "busy_seconds": busy_seconds}
+
+
+def make_batches(file_paths: List[str], file_hashes: Dict[str, str], batch_size: int) -> List[IndexBatch]:
+    """Group files into batches; `file_hashes` is keyed by file name like `meta.file_path`"""
+    batches = []
+    for start in range(0, len(file_paths), batch_size):
+        paths = file_paths[start:start + batch_size]
+        names = [os.path.basename(path) for path in paths]
+        batches.append(IndexBatch(file_paths=paths, file_hashes={name: file_hashes[name] for name in names}))
+    return batches
@@ -0,0 +1,181 @@
+import datetime
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from haystack_integrations.document_stores.qdrant import QdrantDocumentStore
+from haystack_integrations.document_stores.qdrant.converters import DENSE_VECTORS_NAME
+from qdrant_client import QdrantClient, models
+from qdrant_client.http.exceptions import UnexpectedResponse
+
+
+def get_qdrant_client(document_store: QdrantDocumentStore) -> QdrantClient:
+    """Return the client of a document store, creating its collection if needed"""
+    # the store only exposes its client privately; reusing it keeps in-memory stores consistent
+    document_store._initialize_client()
+    return document_store._client
+
+
+def ensure_payload_indexes(document_store: QdrantDocumentStore) -> None:
+    """Create the store's payload indexes on a collection that predates them"""
+    # the store only creates payload indexes together with a new collection
+    client = get_qdrant_client(document_store)
+    indexed = client.get_collection(document_store.index).payload_schema
+    for payload_index in document_store.payload_fields_to_index or []:
+        if payload_index["field_name"] not in indexed:
+            client.create_payload_index(
+                document_store.index,
+                field_name=payload_index["field_name"],
+                field_schema=payload_index["field_schema"],
+            )
+
+
+def apply_collection_config(document_store: QdrantDocumentStore) -> bool:
+    """Bring an existing collection's HNSW, quantization and on-disk settings in line with the store's"""
+    # like payload indexes, the store only applies these when it creates the collection
+    client = get_qdrant_client(document_store)
+    config = client.get_collection(document_store.index).config
+    hnsw = document_store.hnsw_config or {}
+    quantization = models.ScalarQuantization(**document_store.quantization_config) if document_store.quantization_config else None
+    dense = config.params.vectors[DENSE_VECTORS_NAME]
+
+    hnsw_changed = any(getattr(config.hnsw_config, name) != value for name, value in hnsw.items())
+    quantization_changed = config.quantization_config != quantization
+    on_disk_changed = bool(dense.on_disk) != document_store.on_disk
+    if not (hnsw_changed or quantization_changed or on_disk_changed):
+        return False
+
+    # Qdrant rebuilds the graph and the quantized vectors in the background
+    client.update_collection(
+        document_store.index,
+        hnsw_config=models.HnswConfigDiff(**hnsw) if hnsw_changed else None,
+        quantization_config=(quantization or models.Disabled.DISABLED) if quantization_changed else None,
+        vectors_config={DENSE_VECTORS_NAME: models.VectorParamsDiff(on_disk=document_store.on_disk)} if on_disk_changed else None,
+    )
+    return True
+
+
+def file_path_filter(file_paths: Iterable[str]) -> models.Filter:
+    """Match every chunk belonging to the given files"""
+    file_paths = list(file_paths)
+    if len(file_paths) == 1:
+        match = models.MatchValue(value=file_paths[0])
+    else:
+        match = models.MatchAny(any=file_paths)
+    return models.Filter(must=[models.FieldCondition(key="meta.file_path", match=match)])
+
+
+def file_type(file_path: str) -> str:
+    """Lowercase extension without the dot, stored as meta.file_type on every chunk of a file"""
+    return os.path.splitext(file_path)[1].lower().lstrip(".")
+
+
+def _timestamp(value: Union[str, float, int, None]) -> Optional[float]:
+    """Epoch seconds of an ISO 8601 date or datetime (UTC unless it has an offset), or of a number"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        moment = datetime.datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', expected an ISO 8601 date such as 2024-05-31")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
+
+
+@dataclass(frozen=True)
+class RetrievalScope:
+    """Files, file types and indexing time range a search is restricted to; empty fields do not restrict"""
+
+    file_paths: Tuple[str, ...] = ()
+    file_types: Tuple[str, ...] = ()
+    indexed_after: Optional[float] = None
+    indexed_before: Optional[float] = None
+
+    @classmethod
+    def from_request(
+        cls,
+        file_paths: Optional[List[str]] = None,
+        file_types: Optional[List[str]] = None,
+        indexed_after: Union[str, float, None] = None,
+        indexed_before: Union[str, float, None] = None,
+    ) -> "RetrievalScope":
+        # chunks store the file name, and file types without the dot
+        return cls(
+            file_paths=tuple(sorted({os.path.basename(path) for path in file_paths or [] if path})),
+            file_types=tuple(sorted({kind.lower().lstrip(".") for kind in file_types or [] if kind})),
+            indexed_after=_timestamp(indexed_after),
+            indexed_before=_timestamp(indexed_before),
+        )
+
+    def is_empty(self) -> bool:
+        return not (self.file_paths or self.file_types) and self.indexed_after is None and self.indexed_before is None
+
+    def key(self) -> str:
+        """Stable text form, so caches never mix results of different scopes"""
+        return "" if self.is_empty() else json.dumps(
+            [self.file_paths, self.file_types, self.indexed_after, self.indexed_before], separators=(",", ":")
+        )
+
+    def to_filter(self) -> Optional[models.Filter]:
+        """Qdrant filter on the keyword and range payload indexes, or None for an unrestricted search"""
+        conditions: List[Any] = []
+        if self.file_paths:
+            conditions += file_path_filter(self.file_paths).must
+        if self.file_types:
+            conditions.append(models.FieldCondition(key="meta.file_type", match=models.MatchAny(any=list(self.file_types))))
+        if self.indexed_after is not None or self.indexed_before is not None:
+            conditions.append(models.FieldCondition(
+                key="meta.indexed_at",
+                range=models.Range(gte=self.indexed_after, lt=self.indexed_before),
+            ))
+        return models.Filter(must=conditions) if conditions else None
+
+
+def count_points_per_file(client: QdrantClient, collection_name: str, file_paths: Iterable[str]) -> Dict[str, int]:
+    """Number of chunks stored for each file, from the keyword index on meta.file_path"""
+    file_paths = list(file_paths)
+    if not file_paths:
+        return {}
+    response = client.facet(
+        collection_name,
+        key="meta.file_path",
+        facet_filter=file_path_filter(file_paths),
+        limit=len(file_paths),
+        exact=True,
+    )
+    counts = {hit.value: hit.count for hit in response.hits}
+    return {file_path: counts.get(file_path, 0) for file_path in file_paths}
+
+
+# the index version lives in a payload-only side collection that Gradio also writes to
+_VERSION_POINT_ID = 0
+
+
+def _ensure_state_collection(client: QdrantClient, collection_name: str) -> None:
+    if not client.collection_exists(collection_name):
+        client.create_collection(collection_name, vectors_config={})
+
+
+def get_index_version(client: QdrantClient, collection_name: str) -> int:
+    """Current version of the indexed corpus, changed whenever documents are added or removed"""
+    try:
+        records = client.retrieve(collection_name, ids=[_VERSION_POINT_ID], with_payload=True)
+    except (UnexpectedResponse, ValueError):  # nothing was indexed or deleted yet
+        return 0
+    return records[0].payload.get("version", 0) if records else 0
+
+
+def bump_index_version(client: QdrantClient, collection_name: str) -> int:
+    # a timestamp needs no read-modify-write, so concurrent bumps cannot collide
+    version = time.time_ns()
+    _ensure_state_collection(client, collection_name)
+    client.upsert(
+        collection_name,
+        points=[models.PointStruct(id=_VERSION_POINT_ID, vector={}, payload={"version": version})],
+    )
+    return version
@@ -0,0 +1 @@
+# tests import the hayhooks modules the way app.py does, from this directory
@@ -1,42 +1,138 @@
 import logging
 import os
+import shutil
 from typing import List, Optional
 
-from components.pipelines import create_index_pipeline
+from components.catalogue import backfill_catalogue, backfill_file_metadata, ensure_catalogue_indexes
+from components.incremental import hash_file, is_file_unchanged
+from components.jobs import IndexJob, index_jobs
+from components.metrics import metrics_tracer
+from components.pipelines import (
+    create_document_store,
+    create_staged_indexer,
+    documents_dir,
+    embedding_name,
+    index_batch_size,
+    index_files_name,
+    index_state_name,
+    retrieval_profile,
+)
+from components.staged import IndexBatch, make_batches
+from components.store import apply_collection_config, bump_index_version, ensure_payload_indexes, get_qdrant_client
 from fastapi import UploadFile
 from haystack import tracing
-from haystack.tracing.logging_tracer import LoggingTracer
 
 from hayhooks import BasePipelineWrapper, log
 
 # LOGGING
 logging.basicConfig(format="%(levelname)s - %(name)s - %(message)s", level=logging.WARNING)
-logging.getLogger("haystack").setLevel(logging.DEBUG)
-tracing.tracer.is_content_tracing_enabled = False
-tracing.enable_tracing(LoggingTracer(tags_color_strings={"haystack.component.input": "\x1b[1;31m", "haystack.component.name": "\x1b[1;34m"}))
+logging.getLogger("components.metrics").setLevel(logging.INFO) # sampled component content
+tracing.enable_tracing(metrics_tracer)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 
 class PipelineWrapper(BasePipelineWrapper):
     def setup(self) -> None:
-        self.pipeline = create_index_pipeline()
+        self.document_store = create_document_store()
+        self.indexer = create_staged_indexer(self.document_store)
+        ensure_payload_indexes(self.document_store)
+        if apply_collection_config(self.document_store):
+            log.info(f"Updated the index settings to the '{retrieval_profile.name}' retrieval profile")
+        # indexes created before the catalogue existed get their entries rebuilt once
+        client = get_qdrant_client(self.document_store)
+        backfilled = backfill_catalogue(client, embedding_name, index_files_name)
+        if backfilled:
+            log.info(f"Added {backfilled} previously indexed files to the catalogue")
+        # catalogues created before the file listing was sorted by Qdrant lack its indexes
+        ensure_catalogue_indexes(client, index_files_name)
+        # chunks written before the query scope filters existed lack the fields they match on
+        stamped = backfill_file_metadata(client, embedding_name, index_files_name)
+        if stamped:
+            log.info(f"Added file types and indexing times to the chunks of {stamped} files")
 
-    def run_api(self, files: Optional[List[UploadFile]] = None) -> str:
+    def run_api(self, files: Optional[List[UploadFile]] = None) -> dict:
         if not files:
-            return "No files provided for indexing"
+            return {"message": "No files provided for indexing"}
         
         log.trace(f"Running pipeline with files: {[file.filename for file in files]}")
-        os.makedirs("documents", exist_ok=True)
+        os.makedirs(documents_dir, exist_ok=True)
         saved_file_paths = []
 
+        # uploads are spooled by the server, copy them to disk without reading them whole
         for file in files:
-            file_path = os.path.join("documents", file.filename)
+            file_path = os.path.join(documents_dir, os.path.basename(file.filename))
             file.file.seek(0)
-            file_content = file.file.read()
             with open(file_path, "wb") as buffer:
-                buffer.write(file_content)
+                shutil.copyfileobj(file.file, buffer, UPLOAD_CHUNK_SIZE)
             saved_file_paths.append(file_path)
-        
+
+        job = index_jobs.submit(
+            [os.path.basename(file_path) for file_path in saved_file_paths],
+            lambda job: self._index_files(saved_file_paths, job),
+        )
+        return {"message": "Indexing job queued", "job_id": job.id, "status": job.status}
+
+    def _mark_progress(self, job: IndexJob, stage: str, batch: IndexBatch) -> None:
+        # a large workbook is only done once its last part is written
+        if stage == "write" and batch.stream is not None and not batch.stream.done:
+            return
+        job.mark(list(batch.file_hashes), stage)
+
+    def _index_files(self, saved_file_paths: List[str], job: IndexJob) -> dict:
+        # "empty" files were read but left no chunks of their own, e.g. a blank file or a workbook without rows
+        files_stats = {"skipped": 0, "updated": 0, "empty": 0, "failed": 0}
+        chunks_stats = {"skipped": 0, "updated": 0, "deleted": 0, "duplicates": 0}
+
+        pending_paths, file_hashes = [], {}
         for file_path in saved_file_paths:
-            self.pipeline.run({"router": {"sources": [file_path]}})
-        
-        return "Files indexed successfully"
+            # converters store the file name as meta.file_path
+            file_name = os.path.basename(file_path)
+            file_hash = hash_file(file_path)
+            if is_file_unchanged(self.document_store, file_name, file_hash, index_files_name):
+                log.trace(f"Skipping unchanged file: {file_name}")
+                files_stats["skipped"] += 1
+                job.set_file_status(file_name, "skipped")
+                continue
+            pending_paths.append(file_path)
+            file_hashes[file_name] = file_hash
+
+        result = self.indexer.run(
+            make_batches(pending_paths, file_hashes, index_batch_size),
+            on_batch_done=lambda stage, batch: self._mark_progress(job, stage, batch),
+        )
+
+        # a large workbook travels as several batches, and counts once: as updated after its last part was
+        # written, or as failed if any part failed
+        updated, empty, failed = set(), set(), set()
+        for batch in result["completed"]:
+            if batch.stream is None or batch.stream.done:
+                updated.update(batch.file_hashes)
+                empty.update(name for name, count in batch.chunk_counts.items() if not count)
+            for file_path in batch.file_paths:
+                if os.path.basename(file_path) not in batch.file_hashes:
+                    failed.add(os.path.basename(file_path))
+            for key, value in batch.stats.items():
+                chunks_stats[key] += value
+        for failure in result["failed"]:
+            failed.update(os.path.basename(file_path) for file_path in failure["files"])
+        empty -= failed
+        for file_name in empty:
+            job.set_file_status(file_name, "empty")
+        for file_name in failed:
+            job.set_file_status(file_name, "failed")
+        files_stats["updated"] = len(updated - empty - failed)
+        files_stats["empty"] = len(empty)
+        files_stats["failed"] = len(failed)
+
+        # invalidates cached answers generated against the previous corpus
+        if chunks_stats["updated"] or chunks_stats["deleted"]:
+            bump_index_version(get_qdrant_client(self.document_store), index_state_name)
+
+        return {
+            "message": "Files indexed successfully" if not files_stats["failed"] else "Some files failed to index",
+            "files": files_stats,
+            "chunks": chunks_stats,
+            "errors": result["failed"],
+            "stage_seconds": {stage: round(seconds, 2) for stage, seconds in result["busy_seconds"].items()},
+        }
@@ -1,12 +1,27 @@
+import asyncio
 import logging
-from typing import Generator, List, Union
+import re
+from typing import AsyncGenerator, Generator, List, Optional, Tuple, Union
 
-from components.pipelines import create_query_pipeline
-from haystack import tracing
-from haystack.tracing.logging_tracer import LoggingTracer
+from components.caching import EmbeddingCache
+from components.metrics import metrics_tracer
+from components.pipelines import (
+    create_answer_cache,
+    create_async_generation_pipeline,
+    create_async_retrieval_pipeline,
+    create_document_store,
+    create_session_cache,
+    generation_pipeline_inputs,
+    index_state_name,
+    retrieval_pipeline_inputs,
+)
+from components.store import RetrievalScope, get_index_version, get_qdrant_client
+from haystack import Document, tracing
+from haystack.dataclasses import StreamingChunk
 
 from hayhooks import (
     BasePipelineWrapper,
+    async_streaming_generator,
     get_last_user_message,
     log,
     streaming_generator,
@@ -14,32 +29,237 @@ from hayhooks import (
 
 # LOGGING
 logging.basicConfig(format="%(levelname)s - %(name)s - %(message)s", level=logging.WARNING)
-logging.getLogger("haystack").setLevel(logging.DEBUG)
-tracing.tracer.is_content_tracing_enabled = True
-tracing.enable_tracing(LoggingTracer(tags_color_strings={"haystack.component.input": "\x1b[1;31m", "haystack.component.name": "\x1b[1;34m"}))
+logging.getLogger("components.metrics").setLevel(logging.INFO) # sampled component content
+tracing.enable_tracing(metrics_tracer)
 
 
 class PipelineWrapper(BasePipelineWrapper):
     def setup(self) -> None:
-        self.pipeline = create_query_pipeline()
+        self.document_store = create_document_store()
+        # retrieval and generation are separate pipelines, so a follow-up question can skip retrieval
+        # an AsyncPipeline also runs synchronously, so one instance serves both kinds of endpoints
+        self.retrieval_pipeline = create_async_retrieval_pipeline(self.document_store)
+        self.generation_pipeline = create_async_generation_pipeline()
+        self.answer_cache = create_answer_cache()
+        self.session_cache = create_session_cache()
 
-    def run_api(self, query: str) -> str:
+    def run_api(
+        self,
+        query: str,
+        file_paths: Optional[List[str]] = None,
+        file_types: Optional[List[str]] = None,
+        indexed_after: Optional[str] = None,
+        indexed_before: Optional[str] = None,
+    ) -> str:
+        """Synchronous run_api_async, whose docstring documents the endpoint"""
         log.trace(f"Running pipeline with prompt: {query}")
-        result = self.pipeline.run({
-                "dense_query_embedder": {"text": query},
-                "sparse_query_embedder": {"text": query},
-                "ranker": {"query": query},
-                "prompt_builder": {"query": query},
-            })
-        return result["generator"]["replies"][0]
+        scope = RetrievalScope.from_request(file_paths, file_types, indexed_after, indexed_before)
+        embedding, version = self._embed(query)
+        answer = self._lookup_answer(query, embedding, version, scope)
+        if answer is not None:
+            return answer
+
+        documents = self._retrieve(query, scope)
+        result = self.generation_pipeline.run(generation_pipeline_inputs(query, documents))
+        answer = result["generator"]["replies"][0].text
+        self._store_answer(embedding, answer, version, scope)
+        return answer
+
+    async def run_api_async(
+        self,
+        query: str,
+        file_paths: Optional[List[str]] = None,
+        file_types: Optional[List[str]] = None,
+        indexed_after: Optional[str] = None,
+        indexed_before: Optional[str] = None,
+    ) -> str:
+        """
+        Answer a query from the indexed documents.
+
+        Args:
+            query: The question to answer.
+            file_paths: Only search the chunks of these files.
+            file_types: Only search files with these extensions, e.g. ["pdf", "xlsx"].
+            indexed_after: Only search files indexed at or after this ISO 8601 date or datetime (UTC).
+            indexed_before: Only search files indexed before this ISO 8601 date or datetime (UTC).
+        """
+        log.trace(f"Running async pipeline with prompt: {query}")
+        scope = RetrievalScope.from_request(file_paths, file_types, indexed_after, indexed_before)
+        embedding, version = await self._embed_async(query)
+        answer = self._lookup_answer(query, embedding, version, scope)
+        if answer is not None:
+            return answer
+
+        documents = await self._retrieve_async(query, scope)
+        result = await self.generation_pipeline.run_async(generation_pipeline_inputs(query, documents))
+        answer = result["generator"]["replies"][0].text
+        self._store_answer(embedding, answer, version, scope)
+        return answer
 
     def run_chat_completion(self, model: str, messages: List[dict], body: dict) -> Union[str, Generator]:
         query = get_last_user_message(messages)
-        return streaming_generator(
-            pipeline=self.pipeline,
-            pipeline_run_args={
-                "dense_query_embedder": {"text": query},
-                "sparse_query_embedder": {"text": query},
-                "ranker": {"query": query},
-                "prompt_builder": {"query": query},
-            })
+        scope = self._scope(body)
+        session = self._session_key(messages, body, scope)
+        embedding, version = self._embed(query, session is not None)
+        answer = self._lookup_answer(query, embedding, version, scope)
+        if answer is not None:
+            return self._replay(answer)
+
+        documents = self._retrieve(query, scope, session, embedding, version)
+        chunks = streaming_generator(
+            pipeline=self.generation_pipeline,
+            pipeline_run_args=generation_pipeline_inputs(query, documents),
+        )
+        return self._record(chunks, embedding, version, scope) if self.answer_cache is not None else chunks
+
+    async def run_chat_completion_async(self, model: str, messages: List[dict], body: dict) -> Union[str, AsyncGenerator]:
+        query = get_last_user_message(messages)
+        scope = self._scope(body)
+        session = self._session_key(messages, body, scope)
+        embedding, version = await self._embed_async(query, session is not None)
+        answer = self._lookup_answer(query, embedding, version, scope)
+        if answer is not None:
+            return self._replay_async(answer)
+
+        documents = await self._retrieve_async(query, scope, session, embedding, version)
+        chunks = async_streaming_generator(
+            pipeline=self.generation_pipeline,
+            pipeline_run_args=generation_pipeline_inputs(query, documents),
+        )
+        return self._record_async(chunks, embedding, version, scope) if self.answer_cache is not None else chunks
+
+    # RETRIEVAL
+
+    def _embed(self, query: str, session: bool = False) -> Tuple[Optional[List[float]], int]:
+        """Query embedding and index version, computed only when the answer or session cache needs them"""
+        if self.answer_cache is None and not session:
+            return None, 0
+
+        # the dense embedding is cached, so the retrieval that may follow reuses it
+        embedding = self.retrieval_pipeline.get_component("dense_query_embedder").run(text=query)["embedding"]
+        version = get_index_version(get_qdrant_client(self.document_store), index_state_name)
+        return embedding, version
+
+    async def _embed_async(self, query: str, session: bool = False) -> Tuple[Optional[List[float]], int]:
+        if self.answer_cache is None and not session:
+            return None, 0
+
+        embedding = (await self.retrieval_pipeline.get_component("dense_query_embedder").run_async(text=query))["embedding"]
+        version = await asyncio.to_thread(get_index_version, get_qdrant_client(self.document_store), index_state_name)
+        return embedding, version
+
+    @staticmethod
+    def _scope(body: dict) -> RetrievalScope:
+        """Scope of a chat request, from its optional `filters` object with the run_api filter fields"""
+        filters = body.get("filters") or {}
+        return RetrievalScope.from_request(
+            file_paths=filters.get("file_paths"),
+            file_types=filters.get("file_types"),
+            indexed_after=filters.get("indexed_after"),
+            indexed_before=filters.get("indexed_before"),
+        )
+
+    def _session_key(self, messages: List[dict], body: dict, scope: RetrievalScope) -> Optional[str]:
+        """Identify a conversation by its client-supplied id, its first user message and its scope"""
+        if self.session_cache is None:
+            return None
+        first = next((message.get("content") or "" for message in messages if message.get("role") == "user"), "")
+        client = body.get("session_id") or body.get("user") or ""
+        # documents retrieved under another scope are never reused
+        return EmbeddingCache.make_key(str(client), str(first), scope.key())
+
+    def _retrieve(
+        self,
+        query: str,
+        scope: RetrievalScope,
+        session: Optional[str] = None,
+        embedding: Optional[List[float]] = None,
+        version: int = 0,
+    ) -> List[Document]:
+        documents = self._session_documents(query, session, embedding, version)
+        if documents is None:
+            inputs = retrieval_pipeline_inputs(query, scope.to_filter())
+            documents = self.retrieval_pipeline.run(inputs)["meta_ranker"]["documents"]
+        if session is not None:
+            self.session_cache.put(session, embedding, documents, version)
+        return documents
+
+    async def _retrieve_async(
+        self,
+        query: str,
+        scope: RetrievalScope,
+        session: Optional[str] = None,
+        embedding: Optional[List[float]] = None,
+        version: int = 0,
+    ) -> List[Document]:
+        documents = self._session_documents(query, session, embedding, version)
+        if documents is None:
+            result = await self.retrieval_pipeline.run_async(retrieval_pipeline_inputs(query, scope.to_filter()))
+            documents = result["meta_ranker"]["documents"]
+        if session is not None:
+            self.session_cache.put(session, embedding, documents, version)
+        return documents
+
+    def _session_documents(
+        self, query: str, session: Optional[str], embedding: Optional[List[float]], version: int
+    ) -> Optional[List[Document]]:
+        if session is None:
+            return None
+        documents = self.session_cache.lookup(session, embedding, version)
+        if documents is not None:
+            log.trace(f"Reusing the conversation's documents for prompt: {query}")
+        return documents
+
+    # ANSWER CACHE
+
+    def _lookup_answer(
+        self, query: str, embedding: Optional[List[float]], version: int, scope: RetrievalScope
+    ) -> Optional[str]:
+        if self.answer_cache is None:
+            return None
+        answer = self.answer_cache.lookup(embedding, version, scope.key())
+        if answer is not None:
+            log.trace(f"Answer cache hit for prompt: {query}")
+        return answer
+
+    def _store_answer(self, embedding: Optional[List[float]], answer: str, version: int, scope: RetrievalScope) -> None:
+        if self.answer_cache is not None:
+            self.answer_cache.put(embedding, answer, version, scope.key())
+
+    @staticmethod
+    def _replay(answer: str) -> Generator:
+        for piece in re.findall(r"\S+\s*|\s+", answer):
+            yield StreamingChunk(content=piece)
+
+    @staticmethod
+    async def _replay_async(answer: str) -> AsyncGenerator:
+        for piece in re.findall(r"\S+\s*|\s+", answer):
+            yield StreamingChunk(content=piece)
+
+    def _record(
+        self, chunks: Generator, embedding: Optional[List[float]], version: int, scope: RetrievalScope
+    ) -> Generator:
+        # only answers that streamed to completion are stored
+        parts = []
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, StreamingChunk):
+                    parts.append(chunk.content)
+                yield chunk
+        finally:
+            # a client that disconnected closes this generator; pass that on so the generation stops
+            chunks.close()
+        self.answer_cache.put(embedding, "".join(parts), version, scope.key())
+
+    async def _record_async(
+        self, chunks: AsyncGenerator, embedding: Optional[List[float]], version: int, scope: RetrievalScope
+    ) -> AsyncGenerator:
+        parts = []
+        try:
+            async for chunk in chunks:
+                if isinstance(chunk, StreamingChunk):
+                    parts.append(chunk.content)
+                yield chunk
+        finally:
+            await chunks.aclose()
+        self.answer_cache.put(embedding, "".join(parts), version, scope.key())
@@ -0,0 +1,83 @@
+import functools
+import threading
+from dataclasses import replace
+from typing import List
+
+import pytest
+import tiktoken
+from haystack import Document, component
+from haystack.components.preprocessors import DocumentSplitter
+
+from benchmarks.fakes import fake_embedding, fake_sparse_embedding
+from components import pipelines
+from components.store import get_qdrant_client
+
+
+class _ByteEncoding:
+    """tiktoken encoding stand-in with one token per UTF-8 byte, as the real encodings are downloaded on first use"""
+
+    n_vocab = 256
+
+    def encode(self, text: str, disallowed_special=()) -> List[int]:
+        return list(text.encode("utf-8"))
+
+    def decode(self, tokens: List[int]) -> str:
+        return bytes(tokens).decode("utf-8", errors="replace")
+
+    def decode_single_token_bytes(self, token: int) -> bytes:
+        return bytes([token])
+
+
+@component
+class _FakeDenseEmbedder:
+    @component.output_types(documents=List[Document])
+    def run(self, documents: List[Document]):
+        return {"documents": [replace(document, embedding=fake_embedding(document.content, pipelines.embedding_dim)) for document in documents]}
+
+
+@component
+class _FakeSparseEmbedder:
+    @component.output_types(documents=List[Document])
+    def run(self, documents: List[Document]):
+        return {"documents": [replace(document, sparse_embedding=fake_sparse_embedding(document.content)) for document in documents]}
+
+
+def _fake_embedding_stage(pipeline):
+    pipeline.add_component("dense_embedder", _FakeDenseEmbedder())
+    pipeline.add_component("sparse_embedder", _FakeSparseEmbedder())
+    pipeline.connect("dense_embedder.documents", "sparse_embedder.documents")
+
+
+@pytest.fixture
+def offline_pipelines(monkeypatch):
+    """The pipelines module with hashed embeddings and a line splitter, so indexing needs no models"""
+    monkeypatch.setattr(pipelines, "create_chunker", lambda: DocumentSplitter(split_by="line", split_length=1))
+    monkeypatch.setattr(pipelines, "add_embedding_stage", _fake_embedding_stage)
+    return pipelines
+
+
+@pytest.fixture
+def local_document_store():
+    """In-memory store for tests that index from several threads; unlike the server, local mode is not thread-safe"""
+    document_store = pipelines.create_document_store(location=":memory:")
+    local = get_qdrant_client(document_store)._client
+    lock = threading.RLock()
+
+    def locked(method):
+        @functools.wraps(method)
+        def run(*args, **kwargs):
+            with lock:
+                return method(*args, **kwargs)
+
+        return run
+
+    for name in dir(local):
+        if not name.startswith("_") and callable(getattr(local, name)):
+            setattr(local, name, locked(getattr(local, name)))
+    return document_store
+
+
+@pytest.fixture
+def byte_encoding(monkeypatch):
+    """Every tiktoken encoding counts one token per byte"""
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: _ByteEncoding())
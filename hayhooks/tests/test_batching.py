@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from haystack_integrations.components.embedders.ollama import OllamaTextEmbedder
+from fastembed.rerank.cross_encoder import TextCrossEncoder
+from haystack_integrations.components.rankers.fastembed import FastembedRanker
+
+from components.batching import BatchingStats, MicroBatcher
+
+
+def _batcher(function, **kwargs):
+    return MicroBatcher("test", function, stats=BatchingStats(), **kwargs)
+
+
+def _recording(function):
+    """A batch function that records every batch it was called with"""
+    batches = []
+
+    def run(items):
+        batches.append(list(items))
+        return function(items)
+
+    return run, batches
+
+
+def _call_concurrently(batcher, items):
+    results, threads = {}, []
+    for item in items:
+        thread = threading.Thread(target=lambda item=item: results.__setitem__(item, _outcome(batcher, item)), daemon=True)
+        threads.append(thread)
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def _outcome(batcher, item):
+    try:
+        return batcher(item)
+    except Exception as error:
+        return error
+
+
+def test_concurrent_calls_in_one_window_share_a_batch_and_get_their_own_results():
+    function, batches = _recording(lambda items: [item * 10 for item in items])
+    batcher = _batcher(function, window=0.2)
+
+    results = _call_concurrently(batcher, range(5))
+
+    assert results == {item: item * 10 for item in range(5)}
+    assert [sorted(batch) for batch in batches] == [[0, 1, 2, 3, 4]]
+
+
+def test_a_failing_batch_fails_every_caller():
+    def fail(items):
+        raise ValueError("model crashed")
+
+    results = _call_concurrently(_batcher(fail, window=0.2), range(3))
+
+    assert sorted(results) == [0, 1, 2]
+    assert all(isinstance(error, ValueError) and str(error) == "model crashed" for error in results.values())
+
+
+def test_a_full_batch_does_not_wait_for_the_window():
+    function, batches = _recording(lambda items: items)
+    batcher = _batcher(function, window=30, max_batch_size=3)
+
+    start = time.perf_counter()
+    assert _call_concurrently(batcher, range(3)) == {0: 0, 1: 1, 2: 2}
+
+    assert time.perf_counter() - start < 5
+    assert [sorted(batch) for batch in batches] == [[0, 1, 2]]
+
+
+def test_async_callers_are_batched_too():
+    function, batches = _recording(lambda items: [item.upper() for item in items])
+    batcher = _batcher(function, window=0.2)
+
+    async def run():
+        return await asyncio.gather(*(batcher.run_async(item) for item in ("a", "b", "c")))
+
+    assert asyncio.run(run()) == ["A", "B", "C"]
+    assert [sorted(batch) for batch in batches] == [["a", "b", "c"]]
+
+
+def test_results_of_the_wrong_length_fail_the_batch():
+    with pytest.raises(RuntimeError):
+        _batcher(lambda items: items[:-1], window=0.01)("item")
+
+
+def test_the_integration_members_the_batch_functions_use_exist():
+    # pinned in requirements.txt; an upgrade that renames them fails here rather than at query time
+    embedder = OllamaTextEmbedder(model="model")
+    ranker = FastembedRanker(model_name="model")
+
+    assert callable(embedder._client.embed)
+    assert ranker._model is None and callable(ranker._prepare_fastembed_input_docs)
+    assert callable(TextCrossEncoder.rerank_pairs)
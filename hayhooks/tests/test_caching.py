@@ -0,0 +1,135 @@
+import sqlite3
+import time
+from dataclasses import replace
+from typing import List
+
+from haystack import Document, component
+
+from components.caching import AnswerCache, CachedDocumentEmbedder, EmbeddingCache, SessionContextCache
+
+
+@component
+class _LengthEmbedder:
+    @component.output_types(documents=List[Document])
+    def run(self, documents: List[Document]):
+        return {"documents": [replace(document, embedding=[float(len(document.content))]) for document in documents]}
+
+
+def _stored_keys(path):
+    with sqlite3.connect(path) as db:
+        return sorted(key for (key,) in db.execute("SELECT key FROM entries"))
+
+
+def test_disk_store_keeps_the_newest_entries_up_to_max_size(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(max_size=3, path=path)
+
+    for index in range(5):
+        cache.put(f"key-{index}", [float(index)])
+
+    assert _stored_keys(path) == ["key-2", "key-3", "key-4"]
+    assert EmbeddingCache(max_size=3, path=path).get("key-4") == [4.0]
+
+
+def test_disk_store_drops_expired_entries_on_write(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(ttl=0.05, path=path)
+    cache.put("old", [1.0])
+    time.sleep(0.1)
+
+    cache.put("new", [2.0])
+
+    assert _stored_keys(path) == ["new"]
+
+
+def test_chunk_cache_on_disk_stays_bounded_while_indexing(tmp_path):
+    path = str(tmp_path / "chunks.sqlite")
+    embedder = CachedDocumentEmbedder(_LengthEmbedder(), model="length", cache=EmbeddingCache(max_size=4, path=path), batch_size=2)
+
+    for run in range(3):
+        embedder.run([Document(content=f"chunk {run}-{index}") for index in range(3)])
+
+    assert len(_stored_keys(path)) == 4
+
+
+def test_answer_cache_serves_close_queries_of_the_same_version_and_scope():
+    cache = AnswerCache(max_distance=0.05)
+    cache.put([1.0, 0.0], "answer", version=1, scope="a.txt")
+
+    assert cache.lookup([0.99, 0.05], version=1, scope="a.txt") == "answer"
+    assert cache.lookup([0.0, 1.0], version=1, scope="a.txt") is None
+    assert cache.lookup([1.0, 0.0], version=1, scope="") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 0, "size": 1}
+
+
+def test_answer_cache_drops_answers_of_an_older_index_version():
+    cache = AnswerCache()
+    cache.put([1.0, 0.0], "stale", version=1)
+
+    assert cache.lookup([1.0, 0.0], version=2) is None
+    assert cache.stats()["size"] == 0
+    assert cache.lookup([1.0, 0.0], version=1) is None
+
+
+def test_answer_cache_drops_expired_answers():
+    cache = AnswerCache(ttl=0.05)
+    cache.put([1.0, 0.0], "old", version=1)
+    time.sleep(0.1)
+
+    assert cache.lookup([1.0, 0.0], version=1) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_answer_cache_evicts_the_least_recently_used_answer():
+    cache = AnswerCache(max_size=2)
+    cache.put([1.0, 0.0], "first", version=1)
+    cache.put([0.0, 1.0], "second", version=1)
+    assert cache.lookup([1.0, 0.0], version=1) == "first"
+
+    cache.put([-1.0, 0.0], "third", version=1)
+
+    assert cache.lookup([0.0, 1.0], version=1) is None
+    assert cache.lookup([1.0, 0.0], version=1) == "first"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_answer_cache_ignores_empty_answers():
+    cache = AnswerCache()
+    cache.put([1.0, 0.0], "", version=1)
+
+    assert cache.stats()["size"] == 0
+
+
+def test_session_cache_reuses_documents_while_the_topic_holds():
+    cache = SessionContextCache(min_similarity=0.75)
+    documents = [Document(content="context")]
+    cache.put("session", [1.0, 0.0], documents, version=1)
+
+    assert cache.lookup("session", [0.9, 0.2], version=1) is documents
+    assert cache.lookup("session", [0.0, 1.0], version=1) is None
+    assert cache.lookup("other", [1.0, 0.0], version=1) is None
+    assert cache.stats() == {"reused": 1, "retrieved": 2, "evictions": 0, "size": 1}
+
+
+def test_session_cache_forgets_documents_of_an_older_index_version_or_past_the_ttl():
+    cache = SessionContextCache(ttl=0.05)
+    cache.put("changed", [1.0, 0.0], [Document(content="old")], version=1)
+    cache.put("idle", [1.0, 0.0], [Document(content="old")], version=2)
+
+    assert cache.lookup("changed", [1.0, 0.0], version=2) is None
+    time.sleep(0.1)
+    assert cache.lookup("idle", [1.0, 0.0], version=2) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_session_cache_evicts_the_least_recently_used_session():
+    cache = SessionContextCache(max_sessions=2)
+    for session in ("a", "b"):
+        cache.put(session, [1.0, 0.0], [Document(content=session)], version=1)
+    assert cache.lookup("a", [1.0, 0.0], version=1) is not None
+
+    cache.put("c", [1.0, 0.0], [Document(content="c")], version=1)
+
+    assert cache.lookup("b", [1.0, 0.0], version=1) is None
+    assert cache.lookup("a", [1.0, 0.0], version=1) is not None
+    assert cache.stats()["evictions"] == 1
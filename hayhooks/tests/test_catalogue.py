@@ -0,0 +1,38 @@
+import pytest
+from qdrant_client import QdrantClient
+
+from components.catalogue import list_catalogue, update_catalogue
+
+# the catalogue creates its sort indexes, which local mode does without
+pytestmark = pytest.mark.filterwarnings("ignore:Payload indexes have no effect in the local Qdrant")
+
+
+def _entry(index, size):
+    return {"file_name": f"file-{index}.txt", "file_hash": "hash", "chunk_count": index % 3, "size": size, "indexed_at": None}
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_pages_are_sorted_with_missing_values_last(descending):
+    client = QdrantClient(":memory:")
+    # sizes of backfilled entries are unknown
+    entries = [_entry(index, None if index % 4 == 0 else (index * 37) % 11) for index in range(12)]
+    update_catalogue(client, "index_files", entries)
+
+    pages = [list_catalogue(client, "index_files", offset, 5, "size", descending) for offset in (0, 5, 10)]
+
+    files = [entry for page in pages for entry in page["files"]]
+    assert [page["total"] for page in pages] == [12, 12, 12]
+    assert [len(page["files"]) for page in pages] == [5, 5, 2]
+    assert sorted(entry["file_name"] for entry in files) == sorted(entry["file_name"] for entry in entries)
+    sizes = [entry["size"] for entry in files]
+    assert sizes[:9] == sorted(sizes[:9], reverse=descending)
+    assert sizes[9:] == [None, None, None]
+
+
+def test_pages_are_sorted_by_file_name():
+    client = QdrantClient(":memory:")
+    update_catalogue(client, "index_files", [_entry(index, index) for index in range(12)])
+
+    page = list_catalogue(client, "index_files", offset=2, limit=3, sort_by="file_name", descending=True)
+
+    assert [entry["file_name"] for entry in page["files"]] == ["file-7.txt", "file-6.txt", "file-5.txt"]
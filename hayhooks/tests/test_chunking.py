@@ -0,0 +1,67 @@
+from haystack import Document
+
+from components.chunking import TokenChunker
+
+
+def _contents(chunks):
+    return [chunk.content for chunk in chunks]
+
+
+def test_chunks_end_at_the_best_boundary_that_fits(byte_encoding):
+    text = "One two three. Four five six.\n\nSeven eight."
+    chunker = TokenChunker(split_length=40)
+
+    chunks = chunker.run([Document(content=text)])["documents"]
+
+    # the paragraph break wins over the sentence end and the words closer to the limit
+    assert _contents(chunks) == ["One two three. Four five six.\n\n", "Seven eight."]
+    assert "".join(_contents(chunks)) == text
+
+
+def test_chunks_never_exceed_the_split_length(byte_encoding):
+    text = " ".join(f"word{index}" for index in range(50))
+    chunker = TokenChunker(split_length=32)
+
+    chunks = chunker.run([Document(content=text)])["documents"]
+
+    assert all(len(chunk.content.encode()) <= 32 for chunk in chunks)
+    assert all(not chunk.content.startswith(" ") for chunk in chunks[1:])
+    assert "".join(_contents(chunks)) == text
+
+
+def test_a_text_without_boundaries_is_cut_at_the_split_length(byte_encoding):
+    chunks = TokenChunker(split_length=4).run([Document(content="abcdefghij")])["documents"]
+
+    assert _contents(chunks) == ["abcd", "efgh", "ij"]
+
+
+def test_overlapping_chunks_share_tokens_and_still_move_forward(byte_encoding):
+    chunks = TokenChunker(split_length=4, split_overlap=2).run([Document(content="abcdefgh")])["documents"]
+
+    assert _contents(chunks) == ["abcd", "cdef", "efgh"]
+
+
+def test_chunk_offsets_follow_multibyte_characters(byte_encoding):
+    text = "héllo wörld ünïcode"
+    chunks = TokenChunker(split_length=8).run([Document(content=text)])["documents"]
+
+    for chunk in chunks:
+        start = chunk.meta["split_idx_start"]
+        assert text[start:start + len(chunk.content)] == chunk.content
+    assert "".join(_contents(chunks)) == text
+
+
+def test_chunks_carry_the_parent_meta_and_page_number(byte_encoding):
+    document = Document(content="first page\fsecond page", meta={"file_path": "a.pdf"})
+
+    chunks = TokenChunker(split_length=12).run([document])["documents"]
+
+    assert [chunk.meta["split_id"] for chunk in chunks] == list(range(len(chunks)))
+    assert all(chunk.meta["parent_id"] == document.id and chunk.meta["file_path"] == "a.pdf" for chunk in chunks)
+    assert chunks[0].meta["page_number"] == 1 and chunks[-1].meta["page_number"] == 2
+
+
+def test_empty_and_blank_documents_give_no_chunks(byte_encoding):
+    chunks = TokenChunker(split_length=8).run([Document(content=""), Document(content="   \n\n  ")])["documents"]
+
+    assert chunks == []
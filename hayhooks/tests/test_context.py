@@ -0,0 +1,52 @@
+from haystack import Document, Pipeline
+
+from components.context import ContextPacker
+from components.pipelines import add_generation_components
+
+# with the byte encoding, every character of these ASCII texts is one token
+TEMPLATE = "Answer from the context."
+QUERY = "When does the warranty expire?"
+
+
+def _overhead(file_path):
+    return len(f"Filename: {file_path} \nContent: \n\n")
+
+
+def test_the_context_budget_leaves_room_for_the_template_query_and_answer(byte_encoding):
+    packer = ContextPacker(context_window=300, answer_tokens=100, template=TEMPLATE)
+    budget = 300 - 100 - len(TEMPLATE) - len(QUERY)
+    first = Document(content="x" * (budget - _overhead("a.txt") - 10), meta={"file_path": "a.txt"})
+    # too long for the 10 tokens left, which are also below min_span_tokens
+    second = Document(content="The warranty expires after two years.", meta={"file_path": "b.txt"})
+
+    result = packer.run(documents=[first, second], query=QUERY)
+
+    assert [document.meta["file_path"] for document in result["documents"]] == ["a.txt"]
+    assert result["context_tokens"] == budget - 10
+    assert len(TEMPLATE) + len(QUERY) + result["context_tokens"] + packer.answer_tokens <= packer.context_window
+
+
+def test_an_oversized_document_is_cut_down_to_its_query_relevant_sentences(byte_encoding):
+    sentences = [
+        "The office is closed on public holidays.",
+        "The warranty expires two years after purchase.",
+        "Parking is available behind the building.",
+        "An extended warranty adds another year.",
+    ]
+    document = Document(content=" ".join(sentences), meta={"file_path": "terms.txt"})
+    budget = len(sentences[1]) + len(sentences[3]) + 4 + _overhead("terms.txt")
+    packer = ContextPacker(context_window=budget + len(QUERY), answer_tokens=0, min_span_tokens=10)
+
+    packed = packer.run(documents=[document], query=QUERY)["documents"]
+
+    assert [packed_document.content for packed_document in packed] == [f"{sentences[1]} ... {sentences[3]}"]
+    assert packed[0].meta["packed_from_tokens"] == len(document.content)
+    assert document.content == " ".join(sentences)
+
+
+def test_the_generator_stops_at_the_answer_budget_the_packer_reserves():
+    pipeline = Pipeline()
+    add_generation_components(pipeline)
+
+    answer_tokens = pipeline.get_component("context_packer").answer_tokens
+    assert pipeline.get_component("generator").generation_kwargs["num_predict"] == answer_tokens
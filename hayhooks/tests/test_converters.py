@@ -0,0 +1,90 @@
+import weakref
+
+import openpyxl
+from haystack import Document, Pipeline
+from haystack.components.preprocessors import DocumentCleaner
+
+from components import converters
+from components.catalogue import list_catalogue
+from components.incremental import hash_file, is_file_unchanged
+from components.pipelines import add_conversion_stage
+from components.staged import make_batches
+from components.store import get_qdrant_client
+
+
+def test_fast_path_output_is_cleaned_like_tika_output(tmp_path):
+    text = "Header line\n\n\n\nFirst   paragraph with  extra   spaces.\n   \n\nHeader line\n\nSecond paragraph.\n"
+    file_path = tmp_path / "notes.txt"
+    file_path.write_text(text, encoding="utf-8")
+    pipeline = Pipeline()
+    add_conversion_stage(pipeline)
+
+    documents = pipeline.run({"router": {"sources": [str(file_path)]}})["joiner"]["documents"]
+
+    expected = DocumentCleaner(remove_repeated_substrings=True).run([Document(content=text)])["documents"][0].content
+    assert [document.content for document in documents] == [expected]
+    assert documents[0].meta["file_path"] == "notes.txt"
+
+
+def _write_workbook(file_path, rows):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("data")
+    sheet.append(["id", "value"])
+    for row in rows:
+        sheet.append(row)
+    workbook.save(file_path)
+
+
+def test_large_workbooks_are_indexed_a_few_windows_at_a_time(offline_pipelines, local_document_store, monkeypatch, tmp_path):
+    live, peak = [0], [0]
+    window_document = converters._window_document
+
+    def tracked_window_document(*args):
+        document = window_document(*args)
+        live[0] += 1
+        peak[0] = max(peak[0], live[0])
+        weakref.finalize(document, lambda: live.__setitem__(0, live[0] - 1))
+        return document
+
+    monkeypatch.setattr(converters, "_window_document", tracked_window_document)
+    monkeypatch.setattr(offline_pipelines, "xlsx_window_rows", 2)
+    monkeypatch.setattr(offline_pipelines, "xlsx_batch_windows", 5)
+    monkeypatch.setattr(offline_pipelines, "index_queue_size", 1)
+    document_store = local_document_store
+    indexer = offline_pipelines.create_staged_indexer(document_store)
+    file_path = tmp_path / "large.xlsx"
+
+    for version in ("first", "second"):
+        _write_workbook(file_path, [[index, f"{version} {index}"] for index in range(400)])
+        file_hash = hash_file(str(file_path))
+        result = indexer.run(make_batches([str(file_path)], {"large.xlsx": file_hash}, 1))
+
+        assert result["failed"] == []
+        assert len(result["completed"]) == 40 # 200 windows in parts of 5
+        contents = {document.content.strip() for document in document_store.filter_documents()}
+        assert contents == {"id,value"} | {f'{index},{version} {index}' for index in range(400)}
+        assert is_file_unchanged(document_store, "large.xlsx", file_hash)
+
+    # the windows in the converter, the queues and the workers, out of 200
+    assert peak[0] <= 30
+    entries = list_catalogue(get_qdrant_client(document_store), offline_pipelines.index_files_name)["files"]
+    assert [(entry["file_name"], entry["chunk_count"]) for entry in entries] == [("large.xlsx", 401)]
+
+
+def test_fast_path_reads_and_converts_files_in_the_worker_processes(tmp_path):
+    (tmp_path / "page.html").write_text("<html><body><p>Hello <b>there</b></p><script>x()</script></body></html>", encoding="utf-8")
+    (tmp_path / "table.csv").write_text("a;b\n1;2\n", encoding="utf-8")
+    converter = converters.FastPathConverter(workers=1, stats=converters.ConversionStats())
+    converters._reset_executor()
+    try:
+        # a single file goes through the pool too
+        single = converter.run(sources=[str(tmp_path / "page.html")])["documents"]
+        assert converters._executor is not None
+
+        documents = converter.run(sources=[str(tmp_path / "table.csv"), str(tmp_path / "missing.txt")])["documents"]
+    finally:
+        converters._reset_executor()
+
+    assert [document.content.strip() for document in single] == ["Hello there"]
+    # the missing file is skipped, the other one still converted
+    assert [(document.meta["file_path"], document.content) for document in documents] == [("table.csv", "a | b\n1 | 2")]
@@ -0,0 +1,113 @@
+from haystack import Document, Pipeline
+
+from components.catalogue import list_catalogue
+from components.dedup import NearDuplicateFilter
+from components.incremental import IncrementalChunkFilter, hash_content, hash_file, is_file_unchanged
+from components.pipelines import add_writing_stage, create_document_store
+from components.staged import make_batches
+from components.store import get_qdrant_client
+
+
+def _chunks(file_path, contents):
+    return [Document(content=content, meta={"file_path": file_path}) for content in contents]
+
+
+def _stored_contents(document_store):
+    return sorted(document.content for document in document_store.filter_documents())
+
+
+def _index(document_store, incremental_filter, writing_pipeline, file_path, contents):
+    result = incremental_filter.run(_chunks(file_path, contents), file_hashes={file_path: hash_content(" ".join(contents))})
+    writing_pipeline.run({"writer": {"documents": result["documents"]}, "stale_remover": {"stale_ids": result["stale_ids"]}})
+    return result
+
+
+def test_stale_chunks_are_kept_until_the_new_ones_are_written():
+    document_store = create_document_store(location=":memory:")
+    incremental_filter = IncrementalChunkFilter(document_store=document_store)
+    writing_pipeline = Pipeline()
+    add_writing_stage(writing_pipeline, document_store)
+    _index(document_store, incremental_filter, writing_pipeline, "a.txt", ["one", "two"])
+
+    result = incremental_filter.run(_chunks("a.txt", ["one", "three"]), file_hashes={"a.txt": "changed"})
+
+    assert [document.content for document in result["documents"]] == ["three"]
+    assert result["stats"] == {"skipped": 1, "updated": 1, "deleted": 1}
+    # embedding or writing may still fail, so the old chunk must still be there
+    assert _stored_contents(document_store) == ["one", "two"]
+
+    writing_pipeline.run({"writer": {"documents": result["documents"]}, "stale_remover": {"stale_ids": result["stale_ids"]}})
+
+    assert _stored_contents(document_store) == ["one", "three"]
+
+
+def test_chunks_of_an_emptied_file_are_removed():
+    document_store = create_document_store(location=":memory:")
+    incremental_filter = IncrementalChunkFilter(document_store=document_store)
+    writing_pipeline = Pipeline()
+    add_writing_stage(writing_pipeline, document_store)
+    _index(document_store, incremental_filter, writing_pipeline, "a.txt", ["one", "two"])
+    _index(document_store, incremental_filter, writing_pipeline, "b.txt", ["other"])
+
+    result = _index(document_store, incremental_filter, writing_pipeline, "a.txt", [])
+
+    assert result["stats"]["deleted"] == 2
+    assert _stored_contents(document_store) == ["other"]
+
+
+def test_input_documents_are_not_mutated():
+    document_store = create_document_store(location=":memory:")
+    incremental_filter = IncrementalChunkFilter(document_store=document_store)
+    chunks = _chunks("a.txt", ["one"])
+    original_id = chunks[0].id
+
+    result = incremental_filter.run(chunks, file_hashes={"a.txt": "hash"})
+
+    assert chunks[0].id == original_id
+    assert "file_hash" not in chunks[0].meta
+    assert result["documents"][0].meta["file_hash"] == "hash"
+
+
+def test_staged_indexer_replaces_the_chunks_of_a_changed_file(offline_pipelines, tmp_path):
+    document_store = create_document_store(location=":memory:")
+    indexer = offline_pipelines.create_staged_indexer(document_store)
+    file_path = tmp_path / "notes.txt"
+
+    for text in ("one\ntwo", "one\nthree"):
+        file_path.write_text(text, encoding="utf-8")
+        result = indexer.run(make_batches([str(file_path)], {"notes.txt": hash_file(str(file_path))}, 1))
+        assert result["failed"] == []
+
+    assert [content.strip() for content in _stored_contents(document_store)] == ["one", "three"]
+
+
+def test_a_file_whose_chunks_are_all_skipped_as_duplicates_is_still_indexed(offline_pipelines, monkeypatch, tmp_path):
+    monkeypatch.setattr(offline_pipelines, "dedup_mode", "skip")
+    document_store = create_document_store(location=":memory:")
+    indexer = offline_pipelines.create_staged_indexer(document_store)
+    text = "the quarterly report covers revenue costs and hiring plans"
+    file_hashes = {}
+    for name in ("original.txt", "copy.txt"):
+        (tmp_path / name).write_text(text, encoding="utf-8")
+        file_hashes[name] = hash_file(str(tmp_path / name))
+        indexer.run(make_batches([str(tmp_path / name)], file_hashes, 1))
+
+    client = get_qdrant_client(document_store)
+    entries = list_catalogue(client, offline_pipelines.index_files_name)["files"]
+    assert sorted((entry["file_name"], entry["chunk_count"]) for entry in entries) == [("copy.txt", 0), ("original.txt", 1)]
+    assert is_file_unchanged(document_store, "copy.txt", file_hashes["copy.txt"], offline_pipelines.index_files_name)
+    assert not is_file_unchanged(document_store, "copy.txt", "other hash", offline_pipelines.index_files_name)
+
+
+def test_near_duplicate_filter_does_not_mutate_its_input():
+    document_store = create_document_store(location=":memory:")
+    documents = [
+        Document(content="one two three four five", meta={"file_path": "a.txt", "duplicate_of": "old"}),
+        Document(content="one two three four five", meta={"file_path": "b.txt"}),
+    ]
+
+    result = NearDuplicateFilter(document_store=document_store, mode="link").run(documents)["documents"]
+
+    assert [document.meta for document in documents] == [{"file_path": "a.txt", "duplicate_of": "old"}, {"file_path": "b.txt"}]
+    assert "duplicate_of" not in result[0].meta
+    assert result[1].meta["duplicate_of"] == result[0].id
@@ -0,0 +1,45 @@
+import importlib.util
+import os
+
+import openpyxl
+import pytest
+from haystack import tracing
+
+from components.jobs import IndexJob
+
+WRAPPER_PATH = os.path.join(os.path.dirname(__file__), "..", "pipelines", "index", "pipeline_wrapper.py")
+
+
+@pytest.fixture
+def wrapper_module():
+    spec = importlib.util.spec_from_file_location("index_pipeline_wrapper", WRAPPER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # the wrapper turns on the metrics tracer for the whole process when it is loaded
+    tracing.disable_tracing()
+    return module
+
+
+def test_files_that_produce_nothing_are_empty_not_failed(wrapper_module, offline_pipelines, local_document_store, tmp_path):
+    (tmp_path / "notes.txt").write_text("some notes", encoding="utf-8")
+    (tmp_path / "blank.txt").write_text("", encoding="utf-8")
+    openpyxl.Workbook().save(tmp_path / "no-rows.xlsx")
+    (tmp_path / "broken.xlsx").write_bytes(b"not a workbook")
+    file_paths = [str(tmp_path / name) for name in ("notes.txt", "blank.txt", "no-rows.xlsx", "broken.xlsx")]
+
+    wrapper = wrapper_module.PipelineWrapper()
+    wrapper.document_store = local_document_store
+    wrapper.indexer = offline_pipelines.create_staged_indexer(local_document_store)
+    job = IndexJob([os.path.basename(file_path) for file_path in file_paths])
+
+    result = wrapper._index_files(file_paths, job)
+
+    assert result["files"] == {"skipped": 0, "updated": 1, "empty": 2, "failed": 1}
+    assert {name: progress["status"] for name, progress in job.files.items()} == {
+        "notes.txt": "done",
+        "blank.txt": "empty",
+        "no-rows.xlsx": "empty",
+        "broken.xlsx": "failed",
+    }
+    # empty files are catalogued, so the next run skips them
+    assert wrapper._index_files(file_paths[:3], IndexJob([]))["files"]["skipped"] == 3
@@ -0,0 +1,81 @@
+from typing import List
+
+from haystack import component
+from haystack_integrations.components.embedders.fastembed import (
+    FastembedSparseDocumentEmbedder,
+    FastembedSparseTextEmbedder,
+)
+from haystack_integrations.components.embedders.fastembed.embedding_backend import fastembed_backend
+
+from components.batching import fastembed_sparse_embed_batch
+from components.models import ModelRegistry
+
+
+class _Backend:
+    loaded = 0
+
+    def __init__(self, **kwargs):
+        _Backend.loaded += 1
+
+    def embed(self, texts: List[str], **kwargs):
+        return [f"sparse:{text}" for text in texts]
+
+
+@component
+class _Embedder:
+    """Sparse text embedder stand-in counting its warm-ups"""
+
+    def __init__(self):
+        self.embedding_backend = None
+        self.parallel = None
+        self.warm_ups = 0
+
+    def warm_up(self):
+        self.warm_ups += 1
+        self.embedding_backend = _Backend()
+
+    @component.output_types(sparse_embedding=str)
+    def run(self, text: str):
+        return {"sparse_embedding": f"sparse:{text}"}
+
+
+def test_shares_with_the_same_key_create_and_load_the_model_once():
+    registry, created = ModelRegistry(), []
+
+    def create():
+        created.append(_Embedder())
+        return created[-1]
+
+    first = registry.share("sparse", create)
+    second = registry.share("sparse", create)
+    first.warm_up()
+    second.warm_up()
+
+    assert first is second
+    assert len(created) == 1 and created[0].warm_ups == 1
+
+
+def test_the_batch_function_waits_for_the_registry_instead_of_loading_again():
+    shared = ModelRegistry().share("sparse", _Embedder)
+
+    embed = fastembed_sparse_embed_batch(shared)
+
+    assert embed(["a", "b"]) == [{"sparse_embedding": "sparse:a"}, {"sparse_embedding": "sparse:b"}]
+    assert embed(["c"]) == [{"sparse_embedding": "sparse:c"}]
+    assert shared.component.warm_ups == 1
+
+
+def test_sparse_document_and_query_embedders_load_one_backend(monkeypatch):
+    # what the index and query pipelines rely on for their separate registry keys
+    monkeypatch.setattr(fastembed_backend, "_FastembedSparseEmbeddingBackend", _Backend)
+    monkeypatch.setattr(fastembed_backend._FastembedSparseEmbeddingBackendFactory, "_instances", {})
+    monkeypatch.setattr(_Backend, "loaded", 0)
+    registry = ModelRegistry()
+
+    documents = registry.share("sparse-documents", lambda: FastembedSparseDocumentEmbedder(model="bm25"))
+    queries = registry.share("sparse-queries", lambda: FastembedSparseTextEmbedder(model="bm25"))
+    documents.warm_up()
+    queries.warm_up()
+
+    assert _Backend.loaded == 1
+    assert documents.component.embedding_backend is queries.component.embedding_backend
@@ -0,0 +1,70 @@
+from dataclasses import replace
+from typing import Dict, List
+
+from haystack import Document, component
+
+from components.caching import EmbeddingCache
+from components.reranking import CachedRanker, RerankStats
+
+
+@component
+class _FixedRanker:
+    """Cross-encoder stand-in scoring documents from a table, recording what it was asked to score"""
+
+    def __init__(self, scores: Dict[str, float]):
+        self.scores = scores
+        self.scored: List[str] = []
+
+    @component.output_types(documents=List[Document])
+    def run(self, query: str, documents: List[Document], top_k: int = 10):
+        self.scored += [document.id for document in documents]
+        return {"documents": [replace(document, score=self.scores[document.id]) for document in documents]}
+
+
+def _retrieved(similarities):
+    """Documents in retrieval order with fused, rank-only scores, and embeddings at the given cosine similarity to [1, 0]"""
+    return [
+        Document(id=f"doc-{index}", content=f"passage {index}", score=1 / (61 + index), embedding=[similarity, (1 - similarity ** 2) ** 0.5])
+        for index, similarity in enumerate(similarities)
+    ]
+
+
+def _ranker(scores, band=0.1):
+    ranker = _FixedRanker(scores)
+    cached = CachedRanker(ranker, model="test", cache=EmbeddingCache(), top_k=2, mode="adaptive", band=band, stats=RerankStats())
+    return cached, ranker
+
+
+def test_adaptive_mode_skips_reranking_when_dense_similarities_separate_the_top_k():
+    documents = _retrieved([0.9, 0.85, 0.2, 0.1])
+    cached, ranker = _ranker({})
+
+    result = cached.run(query="question", documents=documents, query_embedding=[1.0, 0.0])["documents"]
+
+    assert ranker.scored == []
+    assert [document.id for document in result] == ["doc-0", "doc-1"]
+    assert [document.score for document in result] == [documents[0].score, documents[1].score]
+
+
+def test_adaptive_mode_reorders_only_the_band_and_keeps_one_score_scale():
+    # doc-0 is clearly in, doc-3 clearly out; doc-1 and doc-2 sit around the cut-off
+    documents = _retrieved([0.95, 0.6, 0.58, 0.1])
+    cached, ranker = _ranker({"doc-1": 0.1, "doc-2": 0.9}, band=0.05)
+
+    result = cached.run(query="question", documents=documents, query_embedding=[1.0, 0.0])["documents"]
+
+    assert sorted(ranker.scored) == ["doc-1", "doc-2"]
+    assert [document.id for document in result] == ["doc-0", "doc-2"]
+    # retrieval scores of the positions, never a cross-encoder score next to a fused one
+    assert [document.score for document in result] == [documents[0].score, documents[1].score]
+    assert all(document.embedding is None for document in result)
+
+
+def test_adaptive_mode_reranks_everything_without_a_query_embedding():
+    documents = _retrieved([0.9, 0.85, 0.2, 0.1])
+    cached, ranker = _ranker({"doc-0": 0.1, "doc-1": 0.2, "doc-2": 0.9, "doc-3": 0.3})
+
+    result = cached.run(query="question", documents=documents)["documents"]
+
+    assert sorted(ranker.scored) == ["doc-0", "doc-1", "doc-2", "doc-3"]
+    assert [(document.id, document.score) for document in result] == [("doc-2", 0.9), ("doc-3", 0.3)]
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from components.scheduling import BULK, INTERACTIVE, OllamaOverloaded, OllamaScheduler
+
+
+def _queued(scheduler, kind, count, timeout=5):
+    """Wait until `count` requests of a class are queued"""
+    deadline = time.monotonic() + timeout
+    while scheduler.stats()[kind]["queued"] < count:
+        assert time.monotonic() < deadline, f"{count} {kind} requests were never queued"
+        time.sleep(0.005)
+
+
+def _acquire_in_thread(scheduler, kind, admitted):
+    def run():
+        scheduler.acquire(kind)
+        admitted.append(kind)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+class _StreamingClient:
+    """ollama.AsyncClient stand-in whose streamed chat yields a few chunks"""
+
+    def __init__(self):
+        self.requests = 0
+
+    async def chat(self, *args, stream=False, **kwargs):
+        self.requests += 1
+
+        async def chunks():
+            for index in range(3):
+                yield index
+
+        return chunks() if stream else "answer"
+
+
+class _Generator:
+    def __init__(self, client):
+        self._client = None
+        self._async_client = client
+
+
+def test_interactive_requests_are_admitted_before_queued_bulk_requests():
+    scheduler = OllamaScheduler(max_concurrency=1, limits={BULK: 1})
+    scheduler.acquire(INTERACTIVE)
+    admitted = []
+
+    bulk = _acquire_in_thread(scheduler, BULK, admitted)
+    _queued(scheduler, BULK, 1)
+    interactive = _acquire_in_thread(scheduler, INTERACTIVE, admitted)
+    _queued(scheduler, INTERACTIVE, 1)
+
+    scheduler.release(INTERACTIVE)
+    interactive.join(5)
+    scheduler.release(INTERACTIVE)
+    bulk.join(5)
+
+    assert admitted == [INTERACTIVE, BULK]
+
+
+def test_requests_beyond_the_queue_limit_are_shed():
+    scheduler = OllamaScheduler(max_concurrency=1, queue_limits={INTERACTIVE: 1})
+    scheduler.acquire(INTERACTIVE)
+    waiting = _acquire_in_thread(scheduler, INTERACTIVE, [])
+    _queued(scheduler, INTERACTIVE, 1)
+
+    with pytest.raises(OllamaOverloaded):
+        scheduler.acquire(INTERACTIVE)
+
+    assert scheduler.stats()[INTERACTIVE]["rejected"] == 1
+    scheduler.release(INTERACTIVE)
+    waiting.join(5)
+    scheduler.release(INTERACTIVE)
+    assert scheduler.stats()[INTERACTIVE]["active"] == 0
+
+
+def test_queued_requests_give_up_after_their_timeout():
+    scheduler = OllamaScheduler(max_concurrency=1, queue_timeouts={INTERACTIVE: 0.05})
+    scheduler.acquire(INTERACTIVE)
+
+    with pytest.raises(OllamaOverloaded):
+        scheduler.acquire(INTERACTIVE)
+    with pytest.raises(OllamaOverloaded):
+        asyncio.run(scheduler.acquire_async(INTERACTIVE))
+
+    stats = scheduler.stats()[INTERACTIVE]
+    assert (stats["timed_out"], stats["queued"], stats["active"]) == (2, 0, 1)
+
+
+def test_a_stream_takes_its_slot_when_iterated_and_returns_it_when_closed_early():
+    scheduler = OllamaScheduler(max_concurrency=1)
+    client = _StreamingClient()
+    scheduled = scheduler.schedule(_Generator(client), INTERACTIVE)._async_client
+
+    async def run():
+        # a stream that is never iterated never sends its request nor holds a slot
+        await scheduled.chat(model="model", messages=[], stream=True)
+        assert (client.requests, scheduler.stats()[INTERACTIVE]["active"]) == (0, 0)
+
+        stream = await scheduled.chat(model="model", messages=[], stream=True)
+        assert await stream.__anext__() == 0
+        assert scheduler.stats()[INTERACTIVE]["active"] == 1
+        await stream.aclose()
+        assert scheduler.stats()[INTERACTIVE]["active"] == 0
+
+        assert [chunk async for chunk in await scheduled.chat(model="model", messages=[], stream=True)] == [0, 1, 2]
+        assert await scheduled.chat(model="model", messages=[]) == "answer"
+
+    asyncio.run(run())
+    assert scheduler.stats()[INTERACTIVE]["active"] == 0
@@ -0,0 +1,137 @@
+import threading
+import time
+
+import pytest
+
+from components.staged import IndexBatch, Stage, StagedIndexer
+
+
+def _run(indexer, batches, on_batch_done=None, timeout=10):
+    """Run the indexer on a thread, failing the test instead of hanging when it never finishes"""
+    results = []
+    thread = threading.Thread(target=lambda: results.append(indexer.run(batches, on_batch_done)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "the staged indexer did not finish"
+    return results[0]
+
+
+def _batches(count):
+    return [IndexBatch(file_paths=[f"file-{index}.txt"]) for index in range(count)]
+
+
+def _fail_on(file_path):
+    def run(batch):
+        if file_path in batch.file_paths:
+            raise RuntimeError(f"cannot process {file_path}")
+        return batch
+
+    return run
+
+
+def test_runs_every_batch_through_every_stage():
+    seen = []
+    indexer = StagedIndexer([Stage("first", lambda batch: batch, workers=2), Stage("second", lambda batch: batch)])
+
+    result = _run(indexer, _batches(5), on_batch_done=lambda stage, batch: seen.append((stage, batch.file_paths[0])))
+
+    assert sorted(batch.file_paths[0] for batch in result["completed"]) == [f"file-{index}.txt" for index in range(5)]
+    assert result["failed"] == []
+    assert len(seen) == 10
+
+
+def test_stage_failure_skips_the_batch():
+    indexer = StagedIndexer([Stage("convert", _fail_on("file-1.txt")), Stage("write", lambda batch: batch, workers=2)])
+
+    result = _run(indexer, _batches(3))
+
+    assert sorted(batch.file_paths[0] for batch in result["completed"]) == ["file-0.txt", "file-2.txt"]
+    assert result["failed"] == [{"files": ["file-1.txt"], "stage": "convert", "error": "cannot process file-1.txt"}]
+
+
+def test_callback_failure_fails_the_batch_without_stopping_the_indexer():
+    def on_batch_done(stage, batch):
+        if stage == "write" and batch.file_paths == ["file-2.txt"]:
+            raise RuntimeError("cannot record progress")
+
+    indexer = StagedIndexer([Stage("convert", _fail_on("file-0.txt")), Stage("write", lambda batch: batch)])
+
+    result = _run(indexer, _batches(4), on_batch_done=on_batch_done)
+
+    assert sorted(batch.file_paths[0] for batch in result["completed"]) == ["file-1.txt", "file-3.txt"]
+    assert sorted((failure["stage"], failure["files"][0]) for failure in result["failed"]) == [
+        ("convert", "file-0.txt"),
+        ("write", "file-2.txt"),
+    ]
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_worker_dying_still_stops_the_next_stage():
+    def run(batch):
+        raise KeyboardInterrupt # not an Exception, so the worker thread dies
+
+    indexer = StagedIndexer([Stage("convert", run), Stage("write", lambda batch: batch)])
+
+    result = _run(indexer, _batches(1))
+
+    assert result["completed"] == []
+
+
+def test_factory_stages_give_every_worker_thread_its_own_instance():
+    created, used = [], {}
+    lock = threading.Lock()
+
+    def factory():
+        instance = object()
+        created.append(instance)
+
+        def run(batch):
+            with lock:
+                used.setdefault(id(instance), set()).add(threading.current_thread().name)
+            time.sleep(0.01)
+            return batch
+
+        return run
+
+    indexer = StagedIndexer([Stage("convert", workers=3, factory=factory), Stage("write", lambda batch: batch)])
+
+    result = _run(indexer, _batches(12))
+
+    assert len(result["completed"]) == 12
+    assert len(created) == 3
+    assert all(len(threads) == 1 for threads in used.values())
+
+
+def test_failing_factory_fails_the_batches_without_blocking():
+    calls = []
+
+    def factory():
+        calls.append(None)
+        if len(calls) > 1: # the instance built up front works, the one a second run needs does not
+            raise RuntimeError("cannot load the model")
+        return lambda batch: batch
+
+    indexer = StagedIndexer([Stage("convert", workers=1, factory=factory), Stage("write", lambda batch: batch)])
+    indexer._idle["convert"].clear() # as if a concurrent run held the only instance
+
+    result = _run(indexer, _batches(5))
+
+    assert result["completed"] == []
+    assert len(result["failed"]) == 5
+    assert {failure["error"] for failure in result["failed"]} == {"cannot load the model"}
+
+
+def test_a_stage_can_split_a_batch_into_several():
+    def split(batch):
+        for part in range(3):
+            yield IndexBatch(file_paths=[f"{batch.file_paths[0]}#{part}"])
+
+    seen = []
+    indexer = StagedIndexer([Stage("split", split), Stage("second", lambda batch: batch)])
+
+    result = _run(indexer, _batches(2), on_batch_done=lambda stage, batch: seen.append(stage))
+
+    assert sorted(batch.file_paths[0] for batch in result["completed"]) == [
+        f"file-{index}.txt#{part}" for index in range(2) for part in range(3)
+    ]
+    assert seen.count("split") == seen.count("second") == 6
@@ -0,0 +1,75 @@
+import datetime
+
+import pytest
+from haystack import Document
+
+from benchmarks.fakes import fake_embedding
+from components import pipelines
+from components.store import RetrievalScope, get_qdrant_client
+
+
+def test_scope_from_request_normalises_file_names_and_types():
+    scope = RetrievalScope.from_request(
+        file_paths=["docs/b.pdf", "a.txt", "other/a.txt", ""],
+        file_types=[".PDF", "txt", "pdf", None],
+    )
+
+    assert scope.file_paths == ("a.txt", "b.pdf")
+    assert scope.file_types == ("pdf", "txt")
+
+
+def test_scope_from_request_parses_dates_as_utc():
+    scope = RetrievalScope.from_request(indexed_after="2024-05-31", indexed_before="2024-06-01T02:00:00+02:00")
+
+    assert scope.indexed_after == datetime.datetime(2024, 5, 31, tzinfo=datetime.timezone.utc).timestamp()
+    assert scope.indexed_before == datetime.datetime(2024, 6, 1, tzinfo=datetime.timezone.utc).timestamp()
+    assert RetrievalScope.from_request(indexed_after=1700000000).indexed_after == 1700000000.0
+
+
+def test_scope_from_request_rejects_invalid_dates():
+    with pytest.raises(ValueError, match="Invalid date"):
+        RetrievalScope.from_request(indexed_after="last tuesday")
+
+
+def test_empty_scope_has_no_key_and_no_filter():
+    scope = RetrievalScope.from_request(file_paths=[], file_types=[""], indexed_after="")
+
+    assert scope.is_empty()
+    assert scope.key() == ""
+    assert scope.to_filter() is None
+
+
+def test_scope_key_is_the_same_for_equivalent_requests():
+    first = RetrievalScope.from_request(file_paths=["b.pdf", "a.txt"], file_types=["PDF"])
+    second = RetrievalScope.from_request(file_paths=["dir/a.txt", "b.pdf", "b.pdf"], file_types=[".pdf"])
+
+    assert first.key() == second.key() != ""
+    assert first.key() != RetrievalScope.from_request(file_paths=["a.txt"]).key()
+
+
+def test_scope_filter_selects_matching_chunks():
+    document_store = pipelines.create_document_store(location=":memory:")
+    chunks = [
+        ("a.txt", 100.0),
+        ("b.pdf", 200.0),
+        ("c.pdf", 300.0),
+        ("d.docx", 400.0),
+    ]
+    document_store.write_documents([
+        Document(
+            content=file_path,
+            embedding=fake_embedding(file_path, pipelines.embedding_dim),
+            meta={"file_path": file_path, "file_type": file_path.rsplit(".", 1)[1], "indexed_at": indexed_at},
+        )
+        for file_path, indexed_at in chunks
+    ])
+    client = get_qdrant_client(document_store)
+
+    def matching(scope):
+        records, _ = client.scroll(document_store.index, scroll_filter=scope.to_filter(), with_payload=True, limit=10)
+        return sorted(record.payload["meta"]["file_path"] for record in records)
+
+    assert matching(RetrievalScope.from_request(file_paths=["a.txt", "d.docx"])) == ["a.txt", "d.docx"]
+    assert matching(RetrievalScope.from_request(file_types=["pdf"])) == ["b.pdf", "c.pdf"]
+    assert matching(RetrievalScope.from_request(indexed_after=200, indexed_before=400)) == ["b.pdf", "c.pdf"]
+    assert matching(RetrievalScope.from_request(file_types=["pdf", "docx"], indexed_after=250)) == ["c.pdf", "d.docx"]
@@ -0,0 +1,212 @@
+"""
+Export the indexed corpus to a directory, or import it into a Qdrant collection.
+
+A snapshot is a directory of flat arrays that are read back memory-mapped, so neither command
+holds more than a few batches in memory:
+
+    manifest.json                       point count, vector sizes and the file formats below
+    ids.u8                              16-byte point UUIDs
+    dense.f32                           dense vectors, one row of `dense_dim` floats per point
+    sparse_indptr.i64                   CSR row offsets into the next two files
+    sparse_indices.u32, sparse_values.f32
+    content.bin, content_offsets.i64    UTF-8 chunk content and its row offsets
+    payload.bin, payload_offsets.i64    JSON payload without the content and its row offsets
+
+Run from the hayhooks directory, with QDRANT_URL pointing at the server:
+
+    python -m tools.snapshot export /backups/index
+    python -m tools.snapshot import /backups/index --workers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Any, Deque, Dict, List
+
+import numpy as np
+from haystack_integrations.document_stores.qdrant.converters import DENSE_VECTORS_NAME, SPARSE_VECTORS_NAME
+from qdrant_client import QdrantClient, models
+from qdrant_client.local.qdrant_local import QdrantLocal
+
+from components.catalogue import backfill_catalogue
+from components.pipelines import create_document_store, embedding_name, index_files_name, index_state_name
+from components.store import bump_index_version, ensure_payload_indexes, get_qdrant_client
+
+FORMAT_VERSION = 1
+FILES = {
+    "ids": ("ids.u8", np.uint8),
+    "dense": ("dense.f32", np.float32),
+    "sparse_indptr": ("sparse_indptr.i64", np.int64),
+    "sparse_indices": ("sparse_indices.u32", np.uint32),
+    "sparse_values": ("sparse_values.f32", np.float32),
+    "content": ("content.bin", np.uint8),
+    "content_offsets": ("content_offsets.i64", np.int64),
+    "payload": ("payload.bin", np.uint8),
+    "payload_offsets": ("payload_offsets.i64", np.int64),
+}
+
+
+def _write(file: Any, values: Any, dtype: Any) -> None:
+    np.asarray(values, dtype=dtype).tofile(file)
+
+
+def export_collection(client: QdrantClient, collection_name: str, directory: str, batch_size: int = 1024) -> Dict[str, Any]:
+    """Stream every point of a collection into a snapshot directory"""
+    os.makedirs(directory, exist_ok=True)
+    dense_dim = client.get_collection(collection_name).config.params.vectors[DENSE_VECTORS_NAME].size
+    start = time.perf_counter()
+    count = sparse_count = content_size = payload_size = 0
+
+    with ExitStack() as stack:
+        files = {name: stack.enter_context(open(os.path.join(directory, path), "wb")) for name, (path, _) in FILES.items()}
+        for offsets in ("sparse_indptr", "content_offsets", "payload_offsets"):
+            _write(files[offsets], [0], np.int64)
+
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name, limit=batch_size, offset=offset, with_payload=True, with_vectors=True
+            )
+            for point in points:
+                payload = dict(point.payload or {})
+                content = (payload.pop("content", None) or "").encode("utf-8")
+                encoded_payload = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                vectors = point.vector if isinstance(point.vector, dict) else {}
+                dense = vectors.get(DENSE_VECTORS_NAME) or [0.0] * dense_dim
+                sparse = vectors.get(SPARSE_VECTORS_NAME)
+                indices, values = (sparse.indices, sparse.values) if sparse is not None else ([], [])
+
+                files["ids"].write(uuid.UUID(str(point.id)).bytes)
+                _write(files["dense"], dense, np.float32)
+                _write(files["sparse_indices"], indices, np.uint32)
+                _write(files["sparse_values"], values, np.float32)
+                files["content"].write(content)
+                files["payload"].write(encoded_payload)
+                sparse_count += len(indices)
+                content_size += len(content)
+                payload_size += len(encoded_payload)
+                _write(files["sparse_indptr"], [sparse_count], np.int64)
+                _write(files["content_offsets"], [content_size], np.int64)
+                _write(files["payload_offsets"], [payload_size], np.int64)
+                count += 1
+            if offset is None:
+                break
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "collection": collection_name,
+        "points": count,
+        "dense_dim": dense_dim,
+        "sparse_values": sparse_count,
+        "files": {name: {"path": path, "dtype": np.dtype(dtype).str} for name, (path, dtype) in FILES.items()},
+        "exported_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    return {"points": count, "seconds": round(time.perf_counter() - start, 2)}
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot directory"""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as file:
+            self.manifest = json.load(file)
+        if self.manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format version: {self.manifest['format_version']}")
+        self.count = self.manifest["points"]
+        self.arrays = {}
+        for name, spec in self.manifest["files"].items():
+            path = os.path.join(directory, spec["path"])
+            # numpy cannot map an empty file
+            self.arrays[name] = (
+                np.memmap(path, dtype=spec["dtype"], mode="r") if os.path.getsize(path) else np.empty(0, spec["dtype"])
+            )
+        self.arrays["ids"] = self.arrays["ids"].reshape(-1, 16)
+        self.arrays["dense"] = self.arrays["dense"].reshape(-1, self.manifest["dense_dim"])
+
+    def points(self, start: int, stop: int) -> List[models.PointStruct]:
+        arrays = self.arrays
+        points = []
+        for row in range(start, stop):
+            sparse = slice(arrays["sparse_indptr"][row], arrays["sparse_indptr"][row + 1])
+            content = bytes(arrays["content"][arrays["content_offsets"][row]:arrays["content_offsets"][row + 1]])
+            payload = bytes(arrays["payload"][arrays["payload_offsets"][row]:arrays["payload_offsets"][row + 1]])
+            points.append(models.PointStruct(
+                id=str(uuid.UUID(bytes=bytes(arrays["ids"][row]))),
+                vector={
+                    DENSE_VECTORS_NAME: arrays["dense"][row].tolist(),
+                    SPARSE_VECTORS_NAME: models.SparseVector(
+                        indices=arrays["sparse_indices"][sparse].tolist(),
+                        values=arrays["sparse_values"][sparse].tolist(),
+                    ),
+                },
+                payload={"content": content.decode("utf-8"), **json.loads(payload)},
+            ))
+        return points
+
+
+def import_snapshot(
+    client: QdrantClient, collection_name: str, directory: str, batch_size: int = 512, workers: int = 4
+) -> Dict[str, Any]:
+    """Upsert a snapshot into an existing collection, with `workers` batches in flight"""
+    snapshot = Snapshot(directory)
+    start = time.perf_counter()
+    if isinstance(client._client, QdrantLocal):
+        workers = 1 # local mode collections are not thread-safe
+
+    # building the HNSW graph once at the end is cheaper than keeping it current during the import
+    optimizers = client.get_collection(collection_name).config.optimizer_config
+    client.update_collection(collection_name, optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0))
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot-import") as executor:
+            pending: Deque[Future] = deque()
+            for first in range(0, snapshot.count, batch_size):
+                # only a bounded number of batches is materialised at any time
+                while len(pending) >= workers * 2:
+                    pending.popleft().result()
+                points = snapshot.points(first, min(first + batch_size, snapshot.count))
+                pending.append(executor.submit(client.upsert, collection_name, points=points, wait=True))
+            while pending:
+                pending.popleft().result()
+    finally:
+        client.update_collection(
+            collection_name,
+            # 20000 is Qdrant's default when the collection did not set one
+            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=optimizers.indexing_threshold or 20000),
+        )
+
+    return {"points": snapshot.count, "seconds": round(time.perf_counter() - start, 2)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("directory", help="snapshot directory")
+    parser.add_argument("--batch-size", type=int, default=512, help="points per scroll or upsert request")
+    parser.add_argument("--workers", type=int, default=4, help="upsert requests in flight while importing")
+    args = parser.parse_args()
+
+    document_store = create_document_store()
+    client = get_qdrant_client(document_store)
+    if args.command == "export":
+        result = export_collection(client, embedding_name, args.directory, batch_size=args.batch_size)
+    else:
+        ensure_payload_indexes(document_store)
+        result = import_snapshot(client, embedding_name, args.directory, batch_size=args.batch_size, workers=args.workers)
+        result["catalogued_files"] = backfill_catalogue(client, embedding_name, index_files_name)
+        # answers cached against the previous contents are no longer valid
+        bump_index_version(client, index_state_name)
+
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())